@@ -0,0 +1,358 @@
+from collections import deque
+from dotenv import load_dotenv
+from fastapi.responses import ORJSONResponse
+from pymongo import monitoring
+from typing import Deque, Dict, List, Optional, Tuple
+import asyncio
+import math
+import os
+import threading
+import time
+
+from metrics import METRICS_ENABLED, ADMISSION_IN_FLIGHT, ADMISSION_QUEUE_DEPTH, ADMISSION_SHED, ADMISSION_WAIT
+
+# Load environment variables from .env file
+load_dotenv()
+
+# -----------------------------
+# Configuration Constants
+# -----------------------------
+ADMISSION_ENABLED = os.getenv("ADMISSION_ENABLED", "true").lower() == "true"
+# Database-bound requests in flight per worker; defaults to the connection pool size
+ADMISSION_MAX_CONCURRENCY = int(os.getenv("ADMISSION_MAX_CONCURRENCY") or os.getenv("MONGO_MAX_POOL_SIZE", "100"))
+ADMISSION_QUEUE_SIZE = int(os.getenv("ADMISSION_QUEUE_SIZE", "100"))  # Requests allowed to wait per route class (times its share)
+ADMISSION_MAX_WAIT_SECONDS = float(os.getenv("ADMISSION_MAX_WAIT_SECONDS", "1"))  # Longest a request may wait for a slot
+SERVICE_TIME_SMOOTHING = 0.1  # Weight of the latest request in each class's average service time
+INITIAL_SERVICE_TIME = 0.01  # Assumed service time (seconds) before a class has any
+
+# Route classes in priority order, with their share of ADMISSION_MAX_CONCURRENCY
+# and of ADMISSION_QUEUE_SIZE. A class never holds more than its share of slots,
+# and freed slots go to the waiting requests of earlier classes first.
+ROUTE_CLASSES = [
+    ("point", 1.0),   # Single-employee reads and batch lookups
+    ("write", 0.5),   # Creates, updates and deletes
+    ("list", 0.5),    # Listings and exports
+    ("heavy", 0.25),  # Searches, salary aggregates and bulk inserts
+]
+
+# Routes under admission control, by (method, route template). Others are not
+# limited here: login and imports have their own queues, the change feed its
+# own subscriber limit, and diagnostics must answer during overload.
+ROUTE_CLASS_OF = {
+    ("GET", "/employees/{employee_id}"): "point",
+    ("GET", "/employees/batch"): "point",
+    ("POST", "/employees/batch"): "point",
+    ("POST", "/employees/"): "write",
+    ("PUT", "/employees/{employee_id}"): "write",
+    ("DELETE", "/employees/{employee_id}"): "write",
+    ("GET", "/employees/"): "list",
+    ("GET", "/employees/search"): "heavy",
+    ("GET", "/employees/search/ranked"): "heavy",
+    ("GET", "/employees/avg-salary"): "heavy",
+    ("GET", "/employees/analytics"): "heavy",
+    ("POST", "/employees/bulk"): "heavy",
+}
+
+class Overloaded(Exception):
+    """
+    Raised when a request is shed: its class's queue is full ("queue_full"),
+    its estimated wait exceeds the deadline ("deadline") or it waited that long ("timeout").
+    """
+
+    def __init__(self, reason: str, retry_after: float):
+        super().__init__(reason)
+        self.reason = reason
+        self.retry_after = retry_after
+
+# -----------------------------
+# Pool Saturation
+# -----------------------------
+
+class PoolSaturation(monitoring.ConnectionPoolListener):
+    """
+    Counts this process's checked-out MongoDB connections per server, so
+    admission can tell when every pooled connection is busy and further
+    requests would only queue inside the driver.
+    Called by the driver, possibly from its worker threads.
+    """
+
+    def __init__(self, max_pool_size: int):
+        self.max_pool_size = max_pool_size
+        self.checked_out: Dict[tuple, int] = {}  # address -> connections in use
+        self.lock = threading.Lock()
+
+    def saturated(self) -> bool:
+        return any(count >= self.max_pool_size for count in self.checked_out.values())
+
+    def connection_checked_out(self, event):
+        with self.lock:
+            self.checked_out[event.address] = self.checked_out.get(event.address, 0) + 1
+
+    def connection_checked_in(self, event):
+        with self.lock:
+            self.checked_out[event.address] = self.checked_out.get(event.address, 0) - 1
+
+    def pool_closed(self, event):
+        with self.lock:
+            self.checked_out.pop(event.address, None)
+
+    def pool_created(self, event):
+        pass
+
+    def pool_ready(self, event):
+        pass
+
+    def pool_cleared(self, event):
+        pass
+
+    def connection_created(self, event):
+        pass
+
+    def connection_ready(self, event):
+        pass
+
+    def connection_closed(self, event):
+        pass
+
+    def connection_check_out_started(self, event):
+        pass
+
+    def connection_check_out_failed(self, event):
+        pass
+
+# Shared by this process's MongoDB client (see database.client_options)
+pool_saturation = PoolSaturation(int(os.getenv("MONGO_MAX_POOL_SIZE", "100")))
+
+# -----------------------------
+# Admission Controller
+# -----------------------------
+
+class RouteClass:
+    """
+    Slots in use and wait queue of one route class.
+    """
+
+    def __init__(self, name: str, priority: int, limit: int, queue_size: int):
+        self.name = name
+        self.priority = priority
+        self.limit = limit
+        self.queue_size = queue_size
+        self.in_flight = 0
+        self.waiters: Deque[asyncio.Future] = deque()
+        self.service_time = INITIAL_SERVICE_TIME
+        self.admitted = 0
+        self.shed: Dict[str, int] = {}  # reason -> count
+        self.in_flight_gauge = ADMISSION_IN_FLIGHT.labels(name)
+        self.queue_gauge = ADMISSION_QUEUE_DEPTH.labels(name)
+        self.wait_histogram = ADMISSION_WAIT.labels(name)
+
+class AdmissionController:
+    """
+    Bounds how many requests of each route class run at once per worker.
+    A request starts right away if its class and the worker have a free slot
+    and no request of its class or an earlier one is waiting. Otherwise it
+    waits in its class's bounded queue, unless the queue is full or the
+    estimated wait (queued requests ahead times the class's average service
+    time, spread over its slots) exceeds ADMISSION_MAX_WAIT_SECONDS; those
+    are shed at once instead of piling up on a slow database.
+    While every pooled MongoDB connection is busy, only the first class
+    starts new requests; the others wait for the pool to drain.
+    """
+
+    def __init__(self, capacity: int = ADMISSION_MAX_CONCURRENCY, queue_size: int = ADMISSION_QUEUE_SIZE,
+                 max_wait: float = ADMISSION_MAX_WAIT_SECONDS, pool: Optional[PoolSaturation] = pool_saturation):
+        self.pool = pool
+        self.in_flight = 0
+        self.classes = [RouteClass(name, priority, 1, 1) for priority, (name, _) in enumerate(ROUTE_CLASSES)]
+        self.by_name = {route_class.name: route_class for route_class in self.classes}
+        self.configure(capacity, queue_size, max_wait)
+
+    def configure(self, capacity: int, queue_size: int, max_wait: float):
+        """
+        Sets the worker's slots, the queue size and the deadline; class limits follow their shares.
+        """
+        self.capacity = capacity
+        self.max_wait = max_wait
+        for route_class, (_, share) in zip(self.classes, ROUTE_CLASSES):
+            route_class.limit = max(1, math.ceil(share * capacity))
+            route_class.queue_size = max(1, math.ceil(share * queue_size))
+
+    def can_start(self, route_class: RouteClass) -> bool:
+        if route_class.in_flight >= route_class.limit or self.in_flight >= self.capacity:
+            return False
+        return route_class.priority == 0 or self.pool is None or not self.pool.saturated()
+
+    def queued_ahead(self, route_class: RouteClass) -> int:
+        return sum(len(other.waiters) for other in self.classes[:route_class.priority + 1])
+
+    def estimated_wait(self, route_class: RouteClass) -> float:
+        return (self.queued_ahead(route_class) + 1) * route_class.service_time / route_class.limit
+
+    def start(self, route_class: RouteClass):
+        route_class.in_flight += 1
+        route_class.admitted += 1
+        self.in_flight += 1
+        if METRICS_ENABLED:
+            route_class.in_flight_gauge.inc()
+
+    def shed(self, route_class: RouteClass, reason: str, retry_after: float) -> Overloaded:
+        route_class.shed[reason] = route_class.shed.get(reason, 0) + 1
+        if METRICS_ENABLED:
+            ADMISSION_SHED.labels(route_class.name, reason).inc()
+        return Overloaded(reason, retry_after)
+
+    async def acquire(self, route_class: RouteClass):
+        """
+        Takes a slot for a request, waiting for one if needed. Raises Overloaded when shed.
+        """
+        if self.in_flight < self.capacity and any(other.waiters for other in self.classes):
+            self.dispatch()  # The pool may have drained since the last release
+        if self.can_start(route_class) and not self.queued_ahead(route_class):
+            self.start(route_class)
+            if METRICS_ENABLED:
+                route_class.wait_histogram.observe(0.0)
+            return
+        if len(route_class.waiters) >= route_class.queue_size:
+            raise self.shed(route_class, "queue_full", self.estimated_wait(route_class))
+        estimate = self.estimated_wait(route_class)
+        if estimate > self.max_wait:
+            raise self.shed(route_class, "deadline", estimate)
+
+        waiter = asyncio.get_running_loop().create_future()
+        route_class.waiters.append(waiter)
+        if METRICS_ENABLED:
+            route_class.queue_gauge.inc()
+        started = time.perf_counter()
+        try:
+            await asyncio.wait_for(waiter, timeout=self.max_wait)
+        except asyncio.TimeoutError:
+            route_class.waiters.remove(waiter)
+            raise self.shed(route_class, "timeout", self.estimated_wait(route_class))
+        except asyncio.CancelledError:
+            if waiter.done() and not waiter.cancelled():
+                self.release(route_class)  # Granted just as the client went away
+            elif waiter in route_class.waiters:
+                route_class.waiters.remove(waiter)
+            raise
+        finally:
+            if METRICS_ENABLED:
+                route_class.queue_gauge.dec()
+        if METRICS_ENABLED:
+            route_class.wait_histogram.observe(time.perf_counter() - started)
+
+    def release(self, route_class: RouteClass, elapsed: Optional[float] = None):
+        """
+        Frees a request's slot and hands free slots to waiting requests, earlier classes first.
+        'elapsed' (seconds the request held its slot) updates the class's average service time.
+        """
+        route_class.in_flight -= 1
+        self.in_flight -= 1
+        if METRICS_ENABLED:
+            route_class.in_flight_gauge.dec()
+        if elapsed is not None:
+            route_class.service_time += SERVICE_TIME_SMOOTHING * (elapsed - route_class.service_time)
+        self.dispatch()
+
+    def dispatch(self):
+        for route_class in self.classes:
+            while route_class.waiters and self.can_start(route_class):
+                waiter = route_class.waiters.popleft()
+                if not waiter.done():
+                    self.start(route_class)
+                    waiter.set_result(None)
+
+    def stats(self) -> dict:
+        return {
+            "capacity": self.capacity,
+            "in_flight": self.in_flight,
+            "pool_saturated": self.pool is not None and self.pool.saturated(),
+            "classes": {
+                route_class.name: {
+                    "limit": route_class.limit,
+                    "in_flight": route_class.in_flight,
+                    "queued": len(route_class.waiters),
+                    "queue_size": route_class.queue_size,
+                    "service_time_ms": round(route_class.service_time * 1000, 3),
+                    "admitted": route_class.admitted,
+                    "shed": dict(route_class.shed),
+                }
+                for route_class in self.classes
+            },
+        }
+
+# Shared admission controller for this worker
+admission_controller = AdmissionController()
+
+# -----------------------------
+# ASGI Middleware
+# -----------------------------
+
+class AdmissionMiddleware:
+    """
+    Pure ASGI middleware that admits requests to the routes in ROUTE_CLASS_OF
+    through the controller and answers shed ones with 503 and Retry-After.
+    A slot is held until the response is fully sent, so streamed listings
+    count for as long as they read from the database.
+    """
+
+    def __init__(self, app, router, controller: AdmissionController = admission_controller):
+        self.app = app
+        self.router = router
+        self.controller = controller
+        self.routes: Optional[List[Tuple[object, object, frozenset, Optional[RouteClass]]]] = None
+
+    def classify(self, scope) -> Tuple[object, Optional[RouteClass]]:
+        """
+        Finds the route the router will pick for a request (the first whose path
+        and method match), and its class. Routes are read on first use, after
+        every router has been included.
+        """
+        if self.routes is None:
+            self.routes = [
+                (route, route.path_regex, frozenset(getattr(route, "methods", None) or ()), self.class_of(route))
+                for route in self.router.routes if hasattr(route, "path_regex")
+            ]
+        path = scope["path"]
+        root_path = scope.get("root_path", "")
+        if root_path and path.startswith(root_path + "/"):
+            path = path[len(root_path):]
+        method = scope["method"]
+        for route, path_regex, methods, route_class in self.routes:
+            if method in methods and path_regex.match(path):
+                return route, route_class
+        return None, None
+
+    def class_of(self, route) -> Optional[RouteClass]:
+        for method in getattr(route, "methods", None) or ():
+            name = ROUTE_CLASS_OF.get((method, route.path))
+            if name is not None:
+                return self.controller.by_name[name]
+        return None
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        route, route_class = self.classify(scope)
+        if route_class is None:
+            await self.app(scope, receive, send)
+            return
+
+        try:
+            await self.controller.acquire(route_class)
+        except Overloaded as e:
+            scope["route"] = route  # Lets the metrics middleware label the 503 with its route
+            response = ORJSONResponse(
+                {"detail": f"Server is overloaded ({e.reason}), try again shortly"},
+                status_code=503,
+                headers={"Retry-After": str(max(1, math.ceil(e.retry_after)))},
+            )
+            await response(scope, receive, send)
+            return
+
+        started = time.perf_counter()
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            self.controller.release(route_class, time.perf_counter() - started)
@@ -1,3 +1,4 @@
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, timedelta, timezone
 from typing import Optional
 from jose import JWTError, jwt
@@ -5,6 +6,7 @@ from passlib.context import CryptContext
 from fastapi import Depends, HTTPException, status
 from fastapi.security import OAuth2PasswordBearer
 from dotenv import load_dotenv
+import asyncio
 import os
 
 # Load environment variables from .env file
@@ -17,6 +19,11 @@ SECRET_KEY = os.getenv("SECRET_KEY", "changeme")  # Default for dev; change in p
 ALGORITHM = "HS256"
 ACCESS_TOKEN_EXPIRE_MINUTES = 60  # Token expiration time
 
+# Password verification pool (bcrypt is CPU-bound and must stay off the event loop)
+PASSWORD_VERIFY_WORKERS = int(os.getenv("PASSWORD_VERIFY_WORKERS", "2"))  # Concurrent bcrypt checks
+PASSWORD_VERIFY_QUEUE_SIZE = int(os.getenv("PASSWORD_VERIFY_QUEUE_SIZE", "32"))  # Logins allowed to wait for a worker
+PASSWORD_VERIFY_QUEUE_TIMEOUT = float(os.getenv("PASSWORD_VERIFY_QUEUE_TIMEOUT", "2"))  # Seconds a login may wait
+
 # -----------------------------
 # Password Hashing Context
 # -----------------------------
@@ -25,13 +32,23 @@ pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
 # OAuth2 Scheme for FastAPI dependency
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="/token")
 
+# Worker threads for bcrypt (created on first use); bcrypt releases the GIL while hashing
+password_executor: Optional[ThreadPoolExecutor] = None
+password_slots = asyncio.Semaphore(PASSWORD_VERIFY_WORKERS)
+password_waiting = 0  # Logins currently queued for a worker
+
 # -----------------------------
 # Dummy User Database (for demo purposes)
 # -----------------------------
+
+# Precomputed bcrypt hash of "adminpass", so importing this module never runs bcrypt.
+# Override with ADMIN_PASSWORD_HASH (e.g. generated with pwd_context.hash()).
+DEFAULT_ADMIN_PASSWORD_HASH = "$2b$12$zS1WZKVbrIcDyHJdZ/.0Nei72jD/kL4cRqv6kYwyNitKMUz5WYDr2"
+
 fake_users_db = {
     "admin": {
         "username": "admin",
-        "hashed_password": pwd_context.hash("adminpass")  # Hashed using passlib
+        "hashed_password": os.getenv("ADMIN_PASSWORD_HASH") or DEFAULT_ADMIN_PASSWORD_HASH
     }
 }
 
@@ -45,23 +62,80 @@ def verify_password(plain_password: str, hashed_password: str) -> bool:
     """
     return pwd_context.verify(plain_password, hashed_password)
 
-def authenticate_user(username: str, password: str):
+def get_password_executor() -> ThreadPoolExecutor:
+    """
+    Returns the password worker pool, creating it on first use.
+    """
+    global password_executor
+    if password_executor is None:
+        password_executor = ThreadPoolExecutor(max_workers=PASSWORD_VERIFY_WORKERS, thread_name_prefix="bcrypt")
+    return password_executor
+
+async def verify_password_async(plain_password: str, hashed_password: str) -> bool:
+    """
+    Runs verify_password in the bounded worker pool.
+    Raises HTTP 429 when the wait queue is full and HTTP 503 when no
+    worker frees up within PASSWORD_VERIFY_QUEUE_TIMEOUT seconds.
+    """
+    global password_waiting
+
+    if password_slots.locked() and password_waiting >= PASSWORD_VERIFY_QUEUE_SIZE:
+        raise HTTPException(
+            status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+            detail="Too many concurrent login attempts",
+            headers={"Retry-After": "1"},
+        )
+
+    password_waiting += 1
+    try:
+        await asyncio.wait_for(password_slots.acquire(), timeout=PASSWORD_VERIFY_QUEUE_TIMEOUT)
+    except asyncio.TimeoutError:
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="Login service is busy, try again shortly",
+            headers={"Retry-After": "1"},
+        )
+    finally:
+        password_waiting -= 1
+
+    try:
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(get_password_executor(), verify_password, plain_password, hashed_password)
+    finally:
+        password_slots.release()
+
+async def authenticate_user(username: str, password: str):
     """
     Authenticates a user from the fake database.
+    Password verification runs in the worker pool, so the event loop keeps serving other requests.
     Returns user dict if valid, otherwise False.
     """
     user = fake_users_db.get(username)
-    if not user or not verify_password(password, user["hashed_password"]):
+    if not user or not await verify_password_async(password, user["hashed_password"]):
         return False
     return {"username": username}
 
+def shutdown_password_pool():
+    """
+    Stops the password worker threads on application shutdown.
+    """
+    global password_executor
+    if password_executor is not None:
+        password_executor.shutdown(wait=False, cancel_futures=True)
+        password_executor = None
+
 def create_access_token(data: dict, expires_delta: Optional[timedelta] = None):
     """
     Creates a JWT access token with optional expiration.
+    The subject is taken from 'sub', falling back to 'username'; raises ValueError
+    if neither is given, since get_current_user() would reject such a token.
     """
+    subject = data.get("sub") or data.get("username")
+    if subject is None:
+        raise ValueError("Access token needs a 'sub' or 'username'")
     to_encode = data.copy()
     expire = datetime.now(timezone.utc) + (expires_delta or timedelta(minutes=ACCESS_TOKEN_EXPIRE_MINUTES))
-    to_encode.update({"exp": expire, "sub": data.get("username")})
+    to_encode.update({"exp": expire, "sub": subject})
     return jwt.encode(to_encode, SECRET_KEY, algorithm=ALGORITHM)
 
 # -----------------------------
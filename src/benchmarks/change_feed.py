@@ -0,0 +1,232 @@
+"""
+Verifies the employee change feed end to end and measures delivery latency.
+
+Needs a running server, since change streams never complete: start one on a
+single-node replica set (see "Change Feed" in the README), or with
+STORAGE_BACKEND=memory for the in-process feed. Opens --subscribers streams
+(half of them filtered to one department), creates, moves and deletes
+--employees employees through the API, and checks that every stream got
+exactly the events it should, in order. One more stream disconnects after the
+creates and reconnects with Last-Event-ID after the moves; it must replay the
+moves it missed. Exits with status 1 if any check fails.
+
+    cd src
+    python -m benchmarks.change_feed --url http://localhost:8000 --subscribers 20 --employees 200
+"""
+import argparse
+import asyncio
+import sys
+import time
+import uuid
+from typing import Dict, List, Optional, Tuple
+
+import httpx
+import orjson
+
+from benchmarks.common import summarize_latencies, print_table
+
+# -----------------------------
+# Stream Clients
+# -----------------------------
+
+class Subscriber:
+    """
+    One SSE client: the events it received for this run's employees, as
+    (type, employee_id), with their arrival times and the last event ID.
+    """
+
+    def __init__(self, kind: str, department: Optional[str] = None):
+        self.kind = kind
+        self.department = department
+        self.events: List[Tuple[str, str]] = []
+        self.arrivals: List[float] = []
+        self.resets = 0
+        self.last_id: Optional[str] = None
+        self.ready = asyncio.Event()
+        self.task: Optional[asyncio.Task] = None
+
+    def receive(self, fields: Dict[str, str], prefix: str):
+        if "id" in fields:
+            self.last_id = fields["id"]
+        event = orjson.loads(fields["data"])
+        if event["type"] == "reset":
+            self.resets += 1
+        elif (event.get("employee_id") or "").startswith(prefix):
+            self.events.append((event["type"], event["employee_id"]))
+            self.arrivals.append(time.perf_counter())
+
+async def listen(client: httpx.AsyncClient, subscriber: Subscriber, prefix: str):
+    """
+    Reads one stream until cancelled, resuming after the subscriber's last event ID if it has one.
+    The subscriber is ready once the server's opening 'retry' message arrives.
+    """
+    params = {"department": subscriber.department} if subscriber.department else {}
+    headers = {"Last-Event-ID": subscriber.last_id} if subscriber.last_id else {}
+    subscriber.ready.clear()
+    async with client.stream("GET", "/employees/changes", params=params, headers=headers, timeout=None) as response:
+        response.raise_for_status()
+        fields: Dict[str, str] = {}
+        async for line in response.aiter_lines():
+            if line:
+                if not line.startswith(":"):
+                    name, _, value = line.partition(":")
+                    fields[name] = value[1:] if value.startswith(" ") else value
+                continue
+            if "data" in fields:
+                subscriber.receive(fields, prefix)
+            elif "retry" in fields:
+                subscriber.ready.set()
+            fields = {}
+
+async def start(client: httpx.AsyncClient, subscriber: Subscriber, prefix: str):
+    subscriber.task = asyncio.create_task(listen(client, subscriber, prefix))
+    await asyncio.wait_for(subscriber.ready.wait(), timeout=15)
+
+async def stop(subscriber: Subscriber):
+    subscriber.task.cancel()
+    try:
+        await subscriber.task
+    except asyncio.CancelledError:
+        pass
+
+# -----------------------------
+# Writes
+# -----------------------------
+
+async def run_writes(client: httpx.AsyncClient, requests: List[Tuple[str, str, Optional[dict], Tuple[str, str]]],
+                     concurrency: int, started: Dict[Tuple[str, str], float]):
+    """
+    Sends (method, path, body, event key) requests, 'concurrency' at a time,
+    noting when each started so delivery latency includes the write itself.
+    """
+    pending = iter(requests)
+
+    async def worker():
+        for method, path, body, key in pending:
+            started[key] = time.perf_counter()
+            response = await client.request(method, path, json=body)
+            response.raise_for_status()
+
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+
+async def wait_for_events(subscribers: List[Subscriber], expected: Dict[Subscriber, int], timeout: float):
+    deadline = time.perf_counter() + timeout
+    while time.perf_counter() < deadline and any(len(s.events) < expected[s] for s in subscribers):
+        await asyncio.sleep(0.05)
+
+# -----------------------------
+# Checks
+# -----------------------------
+
+def expected_for(department: Optional[str], reference: List[Tuple[str, str]], departments: Dict[Tuple[str, str], tuple]) -> List[Tuple[str, str]]:
+    """
+    Filters the unfiltered event order the way the server does for a department:
+    events in the department, moves out of it, and deletes of unknown department.
+    """
+    if department is None:
+        return reference
+    return [
+        key for key in reference
+        if departments[key][0] is None or department in departments[key]
+    ]
+
+def check(subscriber: Subscriber, expected: List[Tuple[str, str]], started: Dict[Tuple[str, str], float]) -> dict:
+    received = subscriber.events
+    latencies = [arrival - started[key] for key, arrival in zip(received, subscriber.arrivals) if key in started]
+    return {
+        "stream": subscriber.kind,
+        "expected": len(expected),
+        "received": len(received),
+        "missing": len(set(expected) - set(received)),
+        "duplicates": len(received) - len(set(received)),
+        "in_order": received == expected,
+        "resets": subscriber.resets,
+        **summarize_latencies(latencies),
+    }
+
+# -----------------------------
+# Entry Point
+# -----------------------------
+
+async def main(args) -> bool:
+    run = uuid.uuid4().hex[:8]
+    prefix = f"cf-{run}-"
+    first, second = f"FeedA-{run}", f"FeedB-{run}"
+    limits = httpx.Limits(max_connections=args.subscribers + args.concurrency + 8)
+    async with httpx.AsyncClient(base_url=args.url, limits=limits, timeout=30) as client:
+        login = await client.post("/token", data={"username": args.username, "password": args.password})
+        login.raise_for_status()
+        client.headers["Authorization"] = f"Bearer {login.json()['access_token']}"
+
+        subscribers = [Subscriber("all" if n % 2 == 0 else "department", None if n % 2 == 0 else first)
+                       for n in range(args.subscribers)]
+        resumed = Subscriber("resumed")
+        for subscriber in [*subscribers, resumed]:
+            await start(client, subscriber, prefix)
+
+        ids = [f"{prefix}{n:06d}" for n in range(args.employees)]
+        home = {employee_id: first if n % 2 == 0 else second for n, employee_id in enumerate(ids)}
+        away = {employee_id: second if home[employee_id] == first else first for employee_id in ids}
+        creates = [("POST", "/employees/", {
+            "employee_id": employee_id, "name": f"Feed Check {employee_id}", "department": home[employee_id],
+            "salary": 50000, "joining_date": "2024-01-01", "skills": ["Python"],
+        }, ("create", employee_id)) for employee_id in ids]
+        moves = [("PUT", f"/employees/{employee_id}", {"department": away[employee_id]}, ("update", employee_id)) for employee_id in ids]
+        deletes = [("DELETE", f"/employees/{employee_id}", None, ("delete", employee_id)) for employee_id in ids]
+        # Departments each event belongs to, as (department, previous department)
+        departments = {
+            **{("create", employee_id): (home[employee_id],) for employee_id in ids},
+            **{("update", employee_id): (away[employee_id], home[employee_id]) for employee_id in ids},
+            **{("delete", employee_id): (away[employee_id],) for employee_id in ids},
+        }
+
+        started: Dict[Tuple[str, str], float] = {}
+        began = time.perf_counter()
+        await run_writes(client, creates, args.concurrency, started)
+        await wait_for_events([resumed], {resumed: len(ids)}, args.timeout)
+        await stop(resumed)
+        await run_writes(client, moves, args.concurrency, started)
+        await start(client, resumed, prefix)
+        await run_writes(client, deletes, args.concurrency, started)
+        elapsed = time.perf_counter() - began
+
+        # The first stream is unfiltered; its order is what the others are checked against
+        await wait_for_events(subscribers[:1], {subscribers[0]: 3 * len(ids)}, args.timeout)
+        reference = subscribers[0].events
+        if not args.pre_images:
+            # Deletes without pre-images carry no department and reach every stream
+            departments.update({("delete", employee_id): (None,) for employee_id in ids})
+        targets = {subscriber: len(expected_for(subscriber.department, reference, departments))
+                   for subscriber in [*subscribers, resumed]}
+        await wait_for_events([*subscribers, resumed], targets, args.timeout)
+        for subscriber in [*subscribers, resumed]:
+            await stop(subscriber)
+
+    rows = [check(subscriber, expected_for(subscriber.department, reference, departments), started)
+            for subscriber in [*subscribers, resumed]]
+    writes = sorted(set(key for _, _, _, key in creates + moves + deletes))
+    complete = sorted(reference) == writes
+    print(f"{3 * len(ids)} writes in {elapsed:.2f}s at concurrency {args.concurrency}, "
+          f"{len(subscribers) + 1} streams; reference stream {'complete' if complete else 'INCOMPLETE'}")
+    print_table(rows, ["stream", "expected", "received", "missing", "duplicates", "in_order", "resets",
+                       "p50_ms", "p95_ms", "p99_ms", "max_ms"])
+    passed = complete and all(row["missing"] == 0 and row["duplicates"] == 0 and row["in_order"] and row["resets"] == 0
+                              for row in rows)
+    print("PASS" if passed else "FAIL")
+    return passed
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="End-to-end check of the employee change feed")
+    parser.add_argument("--url", default="http://localhost:8000")
+    parser.add_argument("--username", default="admin")
+    parser.add_argument("--password", default="adminpass")
+    parser.add_argument("--subscribers", type=int, default=10, help="Streams open during the run, at least 1 (plus one that resumes)")
+    parser.add_argument("--employees", type=int, default=100, help="Employees created, moved and deleted")
+    parser.add_argument("--concurrency", type=int, default=4, help="Writes in flight at once")
+    parser.add_argument("--timeout", type=float, default=15.0, help="Seconds to wait for events to arrive")
+    parser.add_argument("--no-pre-images", dest="pre_images", action="store_false",
+                        help="Expect deletes without a department (collection without change stream pre-images)")
+    arguments = parser.parse_args()
+    if arguments.subscribers < 1:
+        parser.error("--subscribers must be at least 1")
+    sys.exit(0 if asyncio.run(main(arguments)) else 1)
@@ -0,0 +1,36 @@
+from typing import List
+
+# -----------------------------
+# Latency Statistics
+# -----------------------------
+
+def percentile(samples: List[float], fraction: float) -> float:
+    """
+    Returns the nearest-rank percentile of 'samples' (fraction in 0..1).
+    """
+    if not samples:
+        return 0.0
+    ordered = sorted(samples)
+    rank = min(len(ordered) - 1, max(0, round(fraction * len(ordered)) - 1))
+    return ordered[rank]
+
+def summarize_latencies(samples: List[float]) -> dict:
+    """
+    Summarizes latencies in seconds as count and p50/p95/p99/max in milliseconds.
+    """
+    return {
+        "count": len(samples),
+        "p50_ms": round(percentile(samples, 0.50) * 1000, 3),
+        "p95_ms": round(percentile(samples, 0.95) * 1000, 3),
+        "p99_ms": round(percentile(samples, 0.99) * 1000, 3),
+        "max_ms": round(max(samples) * 1000, 3) if samples else 0.0,
+    }
+
+def print_table(rows: List[dict], columns: List[str]):
+    """
+    Prints result rows as an aligned text table.
+    """
+    widths = {column: max(len(column), *(len(str(row.get(column, ""))) for row in rows)) for column in columns}
+    print("  ".join(column.ljust(widths[column]) for column in columns))
+    for row in rows:
+        print("  ".join(str(row.get(column, "")).ljust(widths[column]) for column in columns))
@@ -0,0 +1,356 @@
+"""
+Load-tests every employee route plus /token and reports throughput and
+p50/p95/p99 latency per scenario.
+
+Scenarios vary the inputs that drive cost: pagination depth (page and
+cursor), department size, skill-search selectivity, ranked-search
+expansion and field selection.
+A deterministic dataset (--employees, --seed) is loaded through the bulk
+endpoint first. By default the app runs in-process on the memory storage
+backend, which measures the API layer alone; --backend mongo uses MONGO_URL
+(point it at a scratch mongod) and --url drives an already running server.
+
+    cd src
+    python -m benchmarks.endpoints --employees 10000 --concurrency 16
+    python -m benchmarks.endpoints --output results.json
+    python -m benchmarks.endpoints --baseline results.json --fail-on-regression
+"""
+import argparse
+import asyncio
+import itertools
+import json
+import os
+import platform
+import random
+import sys
+import time
+from contextlib import AsyncExitStack
+from datetime import date, datetime, timedelta
+
+import httpx
+
+import crud
+from benchmarks.common import summarize_latencies, print_table
+
+# -----------------------------
+# Dataset
+# -----------------------------
+
+ID_PREFIX = "BENCH-"
+
+# Marker skills carried by a fixed share of employees, for search selectivity
+SELECTIVITY_SKILLS = {"sel50pct": 2, "sel10pct": 10, "sel1pct": 100, "sel01pct": 1000}  # skill -> every Nth employee
+
+FILLER_SKILLS = ["Python", "Go", "SQL", "Docker", "Kubernetes", "React", "Machine Learning", "Rust", "Java", "AWS"]
+
+def department_name(rank: int) -> str:
+    return f"bench-dept-{rank}"
+
+def build_dataset(employees: int, departments: int, seed: int) -> list:
+    """
+    Generates the benchmark employees deterministically.
+    Department sizes halve with each rank (bench-dept-0 holds about half),
+    so listings can be measured at very different sizes.
+    """
+    rng = random.Random(seed)
+    weights = [2 ** -rank for rank in range(departments)]
+    start = date(2015, 1, 1)
+    rows = []
+    for i in range(employees):
+        skills = rng.sample(FILLER_SKILLS, 3)
+        skills += [skill for skill, every in SELECTIVITY_SKILLS.items() if i % every == 0]
+        rows.append({
+            "employee_id": f"{ID_PREFIX}{i:07d}",
+            "name": f"Bench Employee {i}",
+            "department": department_name(rng.choices(range(departments), weights)[0]),
+            "salary": float(rng.randint(30_000, 200_000)),
+            "joining_date": (start + timedelta(days=rng.randrange(3650))).isoformat(),
+            "skills": skills,
+        })
+    return rows
+
+def newest_first(rows: list) -> list:
+    """
+    Orders dataset rows the way newest-first listings return them.
+    """
+    return sorted(rows, key=lambda row: (row["joining_date"], row["employee_id"]), reverse=True)
+
+def cursor_at(rows: list, depth: int) -> str:
+    """
+    Builds the cursor that continues a newest-first listing after row 'depth'.
+    """
+    row = rows[min(depth, len(rows) - 1)]
+    return crud.encode_cursor({"joining_date": datetime.fromisoformat(row["joining_date"]), "employee_id": row["employee_id"]})
+
+# -----------------------------
+# Scenarios
+# -----------------------------
+# Each scenario maps (context, request number) to httpx request arguments,
+# or to None once it has nothing left to do (e.g. no employees left to delete).
+
+def random_id(ctx) -> str:
+    return ctx["rng"].choice(ctx["ids"])
+
+def new_row(ctx, kind: str, i: int) -> dict:
+    row = dict(ctx["rng"].choice(ctx["rows"]))
+    row["employee_id"] = f"{ID_PREFIX}{kind}-{ctx['run_id']}-{i}"
+    return row
+
+def create_request(ctx, i):
+    row = new_row(ctx, "new", i)
+    ctx["created"].append(row["employee_id"])
+    return {"method": "POST", "url": "/employees/", "json": row, "headers": ctx["auth"]}
+
+def bulk_request(ctx, i):
+    rows = [new_row(ctx, "bulk", i * 100 + j) for j in range(100)]
+    ctx["created"].extend(row["employee_id"] for row in rows)
+    return {"method": "POST", "url": "/employees/bulk", "json": rows, "headers": ctx["auth"]}
+
+def update_request(ctx, i):
+    salary = float(ctx["rng"].randint(30_000, 200_000))
+    return {"method": "PUT", "url": f"/employees/{random_id(ctx)}", "json": {"salary": salary}, "headers": ctx["auth"]}
+
+def batch_request(ctx, i):
+    ids = ctx["rng"].sample(ctx["ids"], min(20, len(ctx["ids"])))
+    return {"method": "GET", "url": "/employees/batch", "params": {"ids": ",".join(ids)}}
+
+def delete_request(ctx, i):
+    if not ctx["created"]:
+        return None
+    return {"method": "DELETE", "url": f"/employees/{ctx['created'].pop()}", "headers": ctx["auth"]}
+
+def get(url: str, **kwargs):
+    return lambda ctx, i: {"method": "GET", "url": url, **kwargs}
+
+def build_scenarios(ctx) -> list:
+    """
+    Lists the scenarios in run order: reads first, then writes (which change the data).
+    """
+    rows = ctx["sorted_rows"]
+    pages = max(1, len(rows) // 20)
+    departments = ctx["departments"]
+    ndjson = {"Accept": "application/x-ndjson"}
+    return [
+        ("token", lambda ctx, i: {"method": "POST", "url": "/token", "data": ctx["login"]}),
+        ("get_employee", lambda ctx, i: {"method": "GET", "url": f"/employees/{random_id(ctx)}"}),
+        ("get_employee_fields", lambda ctx, i: {"method": "GET", "url": f"/employees/{random_id(ctx)}", "params": {"fields": "employee_id,name,salary"}}),
+        ("get_employee_304", lambda ctx, i: {"method": "GET", "url": f"/employees/{random_id(ctx)}", "headers": {"If-None-Match": "*"}}),
+        ("get_batch_20", batch_request),
+        ("page_first", get("/employees/", params={"page": 1, "limit": 20})),
+        ("page_middle", get("/employees/", params={"page": max(1, pages // 2), "limit": 20})),
+        ("page_last", get("/employees/", params={"page": pages, "limit": 20})),
+        ("page_estimate_total", get("/employees/", params={"page": 1, "limit": 20, "total": "estimate"})),
+        ("cursor_first", get("/employees/", params={"cursor": "", "limit": 20})),
+        ("cursor_middle", get("/employees/", params={"cursor": cursor_at(rows, len(rows) // 2), "limit": 20})),
+        ("cursor_last", get("/employees/", params={"cursor": cursor_at(rows, len(rows) - 21), "limit": 20})),
+        ("department_large", get("/employees/", params={"department": department_name(0)})),
+        ("department_medium", get("/employees/", params={"department": department_name(min(3, departments - 1))})),
+        ("department_small", get("/employees/", params={"department": department_name(departments - 1)})),
+        ("department_large_fields", get("/employees/", params={"department": department_name(0), "fields": "employee_id,salary"})),
+        ("department_large_ndjson", get("/employees/", params={"department": department_name(0)}, headers=ndjson)),
+        ("avg_salary", get("/employees/avg-salary")),
+        ("analytics", get("/employees/analytics")),
+        ("analytics_department", get("/employees/analytics", params={"department": department_name(0), "joined_from": "2020-01-01"})),
+        ("search_50pct", get("/employees/search", params={"skill": "sel50pct"})),
+        ("search_10pct", get("/employees/search", params={"skill": "sel10pct"})),
+        ("search_1pct", get("/employees/search", params={"skill": "sel1pct"})),
+        ("search_01pct", get("/employees/search", params={"skill": "sel01pct"})),
+        ("search_50pct_paged", get("/employees/search", params={"skill": "sel50pct", "limit": 20, "page": 5})),
+        ("search_all_terms", get("/employees/search", params=[("skill", "sel50pct"), ("skill", "sel10pct"), ("match", "all")])),
+        ("ranked_common", get("/employees/search/ranked", params={"q": "bench employee"})),
+        ("ranked_prefix", get("/employees/search/ranked", params={"q": "employee sel1"})),
+        ("ranked_typo", get("/employees/search/ranked", params={"q": "sel01pvt"})),
+        ("create", create_request),
+        ("bulk_100", bulk_request),
+        ("update", update_request),
+        ("delete", delete_request),
+    ]
+
+# -----------------------------
+# Load Generation
+# -----------------------------
+
+async def run_scenario(client: httpx.AsyncClient, make_request, ctx, args) -> dict:
+    """
+    Runs one scenario closed-loop: 'concurrency' workers each send the next
+    request as soon as the previous one completes, for 'duration' seconds.
+    The first 'warmup' requests are not recorded.
+    """
+    counter = itertools.count()
+    for _ in range(args.warmup):
+        request = make_request(ctx, next(counter))
+        if request is None:
+            break
+        await client.request(**request)
+
+    latencies = []
+    statuses = {}
+
+    async def worker(deadline: float):
+        while time.perf_counter() < deadline:
+            request = make_request(ctx, next(counter))
+            if request is None:
+                return
+            started = time.perf_counter()
+            response = await client.request(**request)
+            latencies.append(time.perf_counter() - started)
+            statuses[response.status_code] = statuses.get(response.status_code, 0) + 1
+
+    started = time.perf_counter()
+    await asyncio.gather(*(worker(started + args.duration) for _ in range(args.concurrency)))
+    elapsed = time.perf_counter() - started
+
+    return {
+        "rps": round(len(latencies) / elapsed, 1) if elapsed else 0.0,
+        **summarize_latencies(latencies),
+        "errors": sum(count for status, count in statuses.items() if status >= 400),
+        "statuses": {str(status): count for status, count in sorted(statuses.items())},
+    }
+
+async def load_dataset(client: httpx.AsyncClient, rows: list, headers: dict):
+    """
+    Inserts the dataset through the bulk endpoint; rows left by an earlier run count as duplicates.
+    """
+    for start in range(0, len(rows), 1000):
+        response = await client.post("/employees/bulk", json=rows[start:start + 1000], headers=headers)
+        response.raise_for_status()
+
+async def login(client: httpx.AsyncClient, form: dict) -> dict:
+    response = await client.post("/token", data=form)
+    response.raise_for_status()
+    return {"Authorization": f"Bearer {response.json()['access_token']}"}
+
+# -----------------------------
+# Baseline Comparison
+# -----------------------------
+
+COMPARABLE_SETTINGS = ("target", "employees", "departments", "seed", "concurrency", "cache")
+
+def compare_to_baseline(results: dict, baseline: dict, threshold: float) -> list:
+    """
+    Annotates each result with its change against the baseline run.
+    A scenario regresses when p50 or p99 grows, or throughput drops, by more than 'threshold'.
+    Returns the names of the regressed scenarios.
+    """
+    regressed = []
+    for name, row in results.items():
+        base = baseline["results"].get(name)
+        if base is None:
+            row["vs_baseline"] = "new"
+            continue
+
+        def change(metric):
+            return row[metric] / base[metric] - 1 if base[metric] else 0.0
+
+        p50, p99, rps = change("p50_ms"), change("p99_ms"), change("rps")
+        row["vs_baseline"] = f"p50 {p50:+.0%} p99 {p99:+.0%} rps {rps:+.0%}"
+        if p50 > threshold or p99 > threshold or rps < -threshold:
+            row["vs_baseline"] += " REGRESSED"
+            regressed.append(name)
+    return regressed
+
+# -----------------------------
+# Entry Point
+# -----------------------------
+
+async def open_client(args, stack: AsyncExitStack) -> httpx.AsyncClient:
+    """
+    Returns a client for a running server (--url) or for the app started in-process.
+    """
+    if args.url:
+        return await stack.enter_async_context(httpx.AsyncClient(base_url=args.url, timeout=60))
+
+    import storage
+    storage.STORAGE_BACKEND = args.backend
+    from main import app, lifespan
+    from cache import read_cache
+    read_cache.enabled = read_cache.enabled and not args.no_cache
+    await stack.enter_async_context(lifespan(app))
+    transport = httpx.ASGITransport(app=app)
+    return await stack.enter_async_context(httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=60))
+
+async def main(args):
+    rows = build_dataset(args.employees, args.departments, args.seed)
+    form = {"username": args.username, "password": args.password}
+    ctx = {
+        "rng": random.Random(args.seed),
+        "rows": rows,
+        "sorted_rows": newest_first(rows),
+        "ids": [row["employee_id"] for row in rows],
+        "departments": args.departments,
+        "login": form,
+        "created": [],
+        "run_id": int(time.time()),
+    }
+
+    async with AsyncExitStack() as stack:
+        client = await open_client(args, stack)
+        ctx["auth"] = await login(client, form)
+        loaded = time.perf_counter()
+        await load_dataset(client, rows, ctx["auth"])
+        print(f"Loaded {len(rows)} employees in {time.perf_counter() - loaded:.1f}s")
+
+        results = {}
+        for name, make_request in build_scenarios(ctx):
+            if args.only and not any(name.startswith(prefix) for prefix in args.only):
+                continue
+            results[name] = await run_scenario(client, make_request, ctx, args)
+            print(f"  {name}: {results[name]['rps']} req/s, p99 {results[name]['p99_ms']} ms", file=sys.stderr)
+
+    settings = {
+        "target": args.url or args.backend,
+        "employees": args.employees,
+        "departments": args.departments,
+        "seed": args.seed,
+        "concurrency": args.concurrency,
+        "duration_s": args.duration,
+        "cache": not args.no_cache,
+        "python": platform.python_version(),
+        "cpus": os.cpu_count(),
+        "timestamp": datetime.now().isoformat(timespec="seconds"),
+    }
+
+    regressed = []
+    if args.baseline:
+        with open(args.baseline, encoding="utf-8") as baseline_file:
+            baseline = json.load(baseline_file)
+        differing = [key for key in COMPARABLE_SETTINGS if baseline["settings"].get(key) != settings[key]]
+        if differing:
+            print(f"Warning: baseline was recorded with different settings: {', '.join(differing)}")
+        regressed = compare_to_baseline(results, baseline, args.threshold)
+
+    print(f"{settings['target']}, {args.employees} employees, {args.concurrency} in flight, {args.duration}s per scenario")
+    columns = ["scenario", "rps", "p50_ms", "p95_ms", "p99_ms", "max_ms", "errors"]
+    if args.baseline:
+        columns.append("vs_baseline")
+    print_table([{"scenario": name, **row} for name, row in results.items()], columns)
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as output_file:
+            json.dump({"settings": settings, "results": results}, output_file, indent=2)
+        print(f"Saved results to {args.output}")
+
+    if regressed:
+        print(f"{len(regressed)} scenarios regressed by more than {args.threshold:.0%}: {', '.join(regressed)}")
+        if args.fail_on_regression:
+            raise SystemExit(1)
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Per-endpoint throughput and latency benchmark")
+    parser.add_argument("--backend", choices=["memory", "mongo"], default="memory", help="Storage backend for the in-process app")
+    parser.add_argument("--url", help="Benchmark a running server instead, e.g. http://127.0.0.1:8000")
+    parser.add_argument("--employees", type=int, default=10000, help="Dataset size")
+    parser.add_argument("--departments", type=int, default=8, help="Departments; sizes halve from one to the next")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--concurrency", type=int, default=8, help="Requests in flight per scenario")
+    parser.add_argument("--duration", type=float, default=2.0, help="Seconds per scenario")
+    parser.add_argument("--warmup", type=int, default=5, help="Unrecorded requests before each scenario")
+    parser.add_argument("--only", nargs="+", help="Run only scenarios starting with these prefixes")
+    parser.add_argument("--no-cache", action="store_true", help="Disable the read cache (in-process only)")
+    parser.add_argument("--username", default="admin")
+    parser.add_argument("--password", default="adminpass")
+    parser.add_argument("--output", help="Write results as JSON to this file")
+    parser.add_argument("--baseline", help="Compare against results saved earlier with --output")
+    parser.add_argument("--threshold", type=float, default=0.2, help="Relative change that counts as a regression")
+    parser.add_argument("--fail-on-regression", action="store_true", help="Exit non-zero if any scenario regressed")
+    asyncio.run(main(parser.parse_args()))
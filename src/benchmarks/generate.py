@@ -0,0 +1,386 @@
+"""
+Generates a large synthetic employees dataset and loads it into MongoDB.
+
+Distributions are configurable and seeded: department sizes follow a Zipf
+skew, each department has its own salary band, joining dates lean towards
+recent years and skills are drawn from a vocabulary with Zipf popularity.
+The same seed and options always produce the same documents.
+
+Documents are loaded with concurrent unordered insert_many batches, spread
+over --processes worker processes and optionally paced to --rate documents
+per second. Employee IDs are derived from the row number, so an interrupted
+load can simply be run again: batches that are already stored are skipped,
+partially stored ones are completed, and the unique employee_id index drops
+any duplicates. The department salary aggregates are rebuilt at the end.
+
+    cd src
+    python -m benchmarks.generate --employees 1000000
+    python -m benchmarks.generate --employees 10000000 --processes 4 --concurrency 8
+    python -m benchmarks.generate --employees 100000 --rate 20000 --seed 7
+"""
+import argparse
+import asyncio
+import math
+import multiprocessing
+import random
+import time
+from datetime import date, datetime, timedelta
+from itertools import accumulate
+from multiprocessing.connection import wait
+
+from pymongo.errors import BulkWriteError
+
+import crud
+import database
+import storage
+from storage.mongo import DUPLICATE_KEY_ERROR
+
+# -----------------------------
+# Vocabulary
+# -----------------------------
+
+DEPARTMENTS = [
+    "Engineering", "Sales", "Customer Support", "Operations", "Marketing", "Finance",
+    "Data Science", "Product", "HR", "Design", "IT", "Legal", "Research", "Quality Assurance",
+    "Security", "Facilities",
+]
+
+SKILLS = [
+    "Python", "Communication", "SQL", "Git", "Java", "JavaScript", "Docker", "Excel", "AWS",
+    "Project Management", "Kubernetes", "React", "Machine Learning", "Linux", "Negotiation",
+    "CRM", "Go", "Data Visualization", "Statistics", "Salesforce", "TypeScript", "REST APIs",
+    "C++", "Recruitment", "SEO", "Content Writing", "Terraform", "Agile", "Node.js", "Rust",
+    "Accounting", "Figma", "Spark", "Payroll", "Public Speaking", "TensorFlow", "Kafka",
+    "Compliance", "Google Analytics", "Microservices",
+]
+
+FIRST_NAMES = [
+    "Aarav", "Olivia", "Liam", "Priya", "Noah", "Emma", "Mateo", "Aisha", "Lucas", "Mei",
+    "Ethan", "Sofia", "Arjun", "Chloe", "Kenji", "Amara", "Diego", "Zara", "Omar", "Hannah",
+]
+
+LAST_NAMES = [
+    "Sharma", "Smith", "Garcia", "Chen", "Okafor", "Müller", "Rossi", "Tanaka", "Silva", "Khan",
+    "Johnson", "Nguyen", "Kowalski", "Haddad", "Brown", "Ivanova", "Patel", "Lopez", "Kim", "Dubois",
+]
+
+def department_names(count: int) -> list:
+    return DEPARTMENTS[:count] + [f"Department {rank}" for rank in range(len(DEPARTMENTS), count)]
+
+def skill_names(count: int) -> list:
+    # One word each, so the long tail does not share a search token
+    return SKILLS[:count] + [f"Skill{rank}" for rank in range(len(SKILLS), count)]
+
+def zipf_cum_weights(count: int, exponent: float) -> list:
+    """
+    Cumulative Zipf weights for ranks 0..count-1, for random.choices().
+    """
+    return list(accumulate(1 / (rank + 1) ** exponent for rank in range(count)))
+
+# -----------------------------
+# Dataset Profile
+# -----------------------------
+
+def build_profile(args) -> dict:
+    """
+    Precomputes everything the generator needs from the options, once:
+    department weights and salary bands, skill weights and index tokens,
+    and the joining dates. The profile is sent to every worker process.
+    """
+    rng = random.Random(f"{args.seed}:profile")
+    departments = department_names(args.departments)
+    skills = skill_names(args.skills)
+
+    # Each department gets a median salary spread evenly in log space across the range
+    low, high = math.log(args.salary_min * 1.5), math.log(args.salary_max / 2)
+    bands = []
+    for _ in departments:
+        median = math.exp(rng.uniform(low, high))
+        bands.append((median, max(args.salary_min, median * 0.6), min(args.salary_max, median * 1.8)))
+
+    start, end = date.fromisoformat(args.start_date), date.fromisoformat(args.end_date)
+    dates = [datetime.combine(start + timedelta(days=day), datetime.min.time()) for day in range((end - start).days + 1)]
+
+    return {
+        "seed": args.seed,
+        "employees": args.employees,
+        "batch_size": args.batch_size,
+        "id_prefix": args.id_prefix,
+        "id_width": max(7, len(str(args.employees - 1))),
+        "departments": departments,
+        "department_weights": zipf_cum_weights(len(departments), args.department_skew),
+        "salary_bands": bands,
+        "salary_spread": args.salary_spread,
+        "dates": dates,
+        "hiring_growth": args.hiring_growth,
+        "skills": skills,
+        "skill_weights": zipf_cum_weights(len(skills), args.skill_zipf),
+        "skill_tokens": [set(crud.skill_tokens([skill])) for skill in skills],
+        "skills_per_employee": (args.skills_min, min(args.skills_max, len(skills))),
+    }
+
+def batch_count(profile: dict) -> int:
+    return -(-profile["employees"] // profile["batch_size"])
+
+def batch_ids(profile: dict, batch: int) -> list:
+    """
+    Returns the employee IDs of one batch; fixed-width, so they sort in row order.
+    """
+    first = batch * profile["batch_size"]
+    last = min(first + profile["batch_size"], profile["employees"])
+    return [f"{profile['id_prefix']}{row:0{profile['id_width']}d}" for row in range(first, last)]
+
+def generate_batch(profile: dict, batch: int) -> list:
+    """
+    Generates one batch of employee documents, in the shape the API stores.
+    Every batch has its own seeded generator, so batches can be produced in
+    any order, by any process, and still come out identical.
+    """
+    rng = random.Random(f"{profile['seed']}:{batch}")
+    ids = batch_ids(profile, batch)
+    count = len(ids)
+
+    # Draw whole columns at once; random.choices() is much cheaper per item with a large k
+    departments = rng.choices(range(len(profile["departments"])), cum_weights=profile["department_weights"], k=count)
+    first_names = rng.choices(FIRST_NAMES, k=count)
+    last_names = rng.choices(LAST_NAMES, k=count)
+    fewest, most = profile["skills_per_employee"]
+    skill_draws = rng.choices(range(len(profile["skills"])), cum_weights=profile["skill_weights"], k=count * most)
+
+    dates = profile["dates"]
+    last_date = len(dates) - 1
+    inverse_growth = 1 / profile["hiring_growth"]
+    bands, spread = profile["salary_bands"], profile["salary_spread"]
+    skills, skill_tokens = profile["skills"], profile["skill_tokens"]
+    skill_count = len(skills)
+    labels = profile["departments"]
+
+    documents = []
+    for row, (employee_id, department) in enumerate(zip(ids, departments)):
+        median, low, high = bands[department]
+        salary = float(round(min(high, max(low, median * math.exp(rng.gauss(0, spread)))), -2))
+
+        # Popular skills can be drawn twice; top up the rare short sets with uniformly drawn skills
+        wanted = fewest + int(rng.random() * (most - fewest + 1))
+        picked = set(skill_draws[row * most:row * most + wanted])
+        while len(picked) < wanted:
+            picked.add(int(rng.random() * skill_count))
+        picked = sorted(picked)
+        name = f"{first_names[row]} {last_names[row]}"
+
+        documents.append({
+            "employee_id": employee_id,
+            "name": name,
+            "name_tokens": crud.name_tokens(name),
+            "department": labels[department],
+            "salary": salary,
+            # u ** (1 / growth) leans towards the end of the range: hiring grows over time
+            "joining_date": dates[int(rng.random() ** inverse_growth * last_date)],
+            "skills": [skills[skill] for skill in picked],
+            "skill_tokens": sorted(set().union(*[skill_tokens[skill] for skill in picked])),
+            "version": 1,
+        })
+    return documents
+
+# -----------------------------
+# Loader
+# -----------------------------
+
+async def stored_in_range(ids: list) -> int:
+    """
+    Counts the stored employees of one batch; served by the unique employee_id index.
+    """
+    return await database.employees_collection.count_documents({"employee_id": {"$gte": ids[0], "$lte": ids[-1]}})
+
+async def insert_batch(profile: dict, batch: int, resuming: bool) -> tuple:
+    """
+    Stores one batch. Returns (inserted, already stored).
+    When resuming, a complete batch is skipped without generating it and a
+    partial one is re-sent unordered, so only its missing rows are written.
+    """
+    if resuming:
+        ids = batch_ids(profile, batch)
+        stored = await stored_in_range(ids)
+        if stored == len(ids):
+            return 0, stored
+
+    documents = generate_batch(profile, batch)
+    try:
+        result = await database.employees_collection.insert_many(documents, ordered=False)
+        return len(result.inserted_ids), 0
+    except BulkWriteError as e:
+        errors = e.details.get("writeErrors", [])
+        if any(error.get("code") != DUPLICATE_KEY_ERROR for error in errors):
+            raise
+        return e.details["nInserted"], len(errors)
+
+async def load(profile: dict, worker: int, workers: int, concurrency: int, rate: float, resuming: bool,
+               inserted, skipped):
+    """
+    Loads every batch assigned to this worker (batch % workers == worker) with
+    up to 'concurrency' insert_many calls in flight, paced to 'rate' documents
+    per second (0 for no limit). Progress is added to the shared counters.
+    """
+    database.connect()
+    slots = asyncio.Semaphore(concurrency)
+    pending = set()
+    failure = None
+
+    async def run(batch):
+        nonlocal failure
+        try:
+            added, existing = await insert_batch(profile, batch, resuming)
+            with inserted.get_lock():
+                inserted.value += added
+            with skipped.get_lock():
+                skipped.value += existing
+        except Exception as e:
+            failure = failure or e
+        finally:
+            slots.release()
+
+    started = time.monotonic()
+    sent = 0
+    try:
+        for batch in range(worker, batch_count(profile), workers):
+            if failure is not None:
+                break
+            if rate:
+                delay = started + sent / rate - time.monotonic()
+                if delay > 0:
+                    await asyncio.sleep(delay)
+            await slots.acquire()
+            task = asyncio.create_task(run(batch))
+            pending.add(task)
+            task.add_done_callback(pending.discard)
+            sent += min(profile["batch_size"], profile["employees"] - batch * profile["batch_size"])
+        if pending:
+            await asyncio.wait(pending)
+    finally:
+        database.close()
+    if failure is not None:
+        raise failure
+
+def worker_main(profile: dict, worker: int, workers: int, concurrency: int, rate: float, resuming: bool,
+                inserted, skipped):
+    """
+    Entry point of a loader process; each process has its own MongoDB client.
+    """
+    asyncio.run(load(profile, worker, workers, concurrency, rate, resuming, inserted, skipped))
+
+# -----------------------------
+# Setup and Teardown
+# -----------------------------
+
+async def prepare(profile: dict) -> bool:
+    """
+    Creates the unique employee_id index (resuming relies on it) and checks
+    whether rows of this dataset are already stored. Returns True if so.
+    Secondary indexes are left alone: loading without them and building them
+    afterwards ('manage.py indexes apply') is considerably faster.
+    """
+    storage.open_store()
+    try:
+        await database.create_indexes(critical_only=True)
+        first, last = batch_ids(profile, 0)[0], batch_ids(profile, batch_count(profile) - 1)[-1]
+        return await database.employees_collection.find_one(
+            {"employee_id": {"$gte": first, "$lte": last}}, {"_id": 1}
+        ) is not None
+    finally:
+        storage.close_store()
+
+async def finish() -> int:
+    """
+    Rebuilds the department salary aggregates for the loaded data.
+    """
+    storage.open_store()
+    try:
+        return await crud.rebuild_department_stats()
+    finally:
+        storage.close_store()
+
+def report_progress(total: int, inserted: int, skipped: int, started: float):
+    elapsed = time.monotonic() - started
+    done = inserted + skipped
+    rate = inserted / elapsed if elapsed else 0.0
+    print(f"  {done:,}/{total:,} ({100 * done / total:.1f}%)  inserted {inserted:,}  already stored {skipped:,}"
+          f"  {rate:,.0f} docs/s  {elapsed:.0f}s")
+
+# -----------------------------
+# Command Line Interface
+# -----------------------------
+
+def build_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--employees", type=int, default=100_000)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--id-prefix", default="GEN-", help="Employee ID prefix; also scopes resuming")
+
+    distribution = parser.add_argument_group("distributions")
+    distribution.add_argument("--departments", type=int, default=12)
+    distribution.add_argument("--department-skew", type=float, default=1.0, help="Zipf exponent of department sizes (0 = even)")
+    distribution.add_argument("--salary-min", type=float, default=30_000)
+    distribution.add_argument("--salary-max", type=float, default=300_000)
+    distribution.add_argument("--salary-spread", type=float, default=0.25, help="Log-normal sigma within a department's band")
+    distribution.add_argument("--start-date", default="2010-01-01")
+    distribution.add_argument("--end-date", default=date.today().isoformat())
+    distribution.add_argument("--hiring-growth", type=float, default=2.0, help="1 spreads joining dates evenly; higher favours recent years")
+    distribution.add_argument("--skills", type=int, default=200, help="Skill vocabulary size")
+    distribution.add_argument("--skill-zipf", type=float, default=1.1, help="Zipf exponent of skill popularity")
+    distribution.add_argument("--skills-min", type=int, default=2)
+    distribution.add_argument("--skills-max", type=int, default=6)
+
+    loading = parser.add_argument_group("loading")
+    loading.add_argument("--batch-size", type=int, default=1000, help="Documents per insert_many")
+    loading.add_argument("--concurrency", type=int, default=4, help="insert_many calls in flight per process")
+    loading.add_argument("--processes", type=int, default=1, help="Loader processes (generation is CPU-bound)")
+    loading.add_argument("--rate", type=float, default=0, help="Target documents per second overall (0 = unlimited)")
+    loading.add_argument("--progress-interval", type=float, default=5.0)
+    loading.add_argument("--skip-stats", action="store_true", help="Do not rebuild the department aggregates afterwards")
+    return parser
+
+def main():
+    args = build_parser().parse_args()
+    if storage.STORAGE_BACKEND != "mongo":
+        raise SystemExit("The generator loads MongoDB; set STORAGE_BACKEND=mongo")
+    if not 1 <= args.skills_min <= args.skills_max:
+        raise SystemExit("--skills-min must be between 1 and --skills-max")
+    if args.employees < 1 or args.batch_size < 1:
+        raise SystemExit("--employees and --batch-size must be positive")
+
+    profile = build_profile(args)
+    resuming = asyncio.run(prepare(profile))
+    print(f"{'Resuming' if resuming else 'Generating'} {args.employees:,} employees "
+          f"(seed {args.seed}, {args.processes} processes x {args.concurrency} batches in flight)")
+
+    inserted, skipped = multiprocessing.Value("q", 0), multiprocessing.Value("q", 0)
+    workers = [
+        multiprocessing.Process(target=worker_main, args=(
+            profile, worker, args.processes, args.concurrency, args.rate / args.processes, resuming, inserted, skipped,
+        ))
+        for worker in range(args.processes)
+    ]
+    started = time.monotonic()
+    for process in workers:
+        process.start()
+    try:
+        while any(process.is_alive() for process in workers):
+            # Wakes early when a process exits, so the final report is not delayed
+            wait([process.sentinel for process in workers if process.is_alive()], timeout=args.progress_interval)
+            report_progress(args.employees, inserted.value, skipped.value, started)
+    except KeyboardInterrupt:
+        for process in workers:
+            process.terminate()
+        raise SystemExit("Interrupted; run the same command again to resume")
+
+    if any(process.exitcode for process in workers):
+        raise SystemExit("A loader process failed; run the same command again to resume")
+
+    elapsed = time.monotonic() - started
+    print(f"Inserted {inserted.value:,} employees in {elapsed:.1f}s ({inserted.value / elapsed:,.0f} docs/s); "
+          f"{skipped.value:,} were already stored")
+    if not args.skip_stats:
+        print(f"Rebuilt salary aggregates for {asyncio.run(finish())} departments")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,93 @@
+"""
+Measures read latency while a burst of /token logins runs concurrently.
+
+Runs the app in-process through httpx's ASGI transport, so no server or
+network is involved. The default read path needs no database; point
+--read-path at an employee route to include MongoDB.
+
+    cd src
+    python -m benchmarks.login_storm --logins 16 --duration 5
+    python -m benchmarks.login_storm --blocking   # Old behavior: bcrypt on the event loop
+"""
+import argparse
+import asyncio
+import time
+
+import httpx
+
+import auth
+from main import app
+from benchmarks.common import summarize_latencies, print_table
+
+# -----------------------------
+# Load Generators
+# -----------------------------
+
+async def read_loop(client: httpx.AsyncClient, path: str, rate: float, deadline: float, latencies: list):
+    """
+    Issues reads on a fixed schedule ('rate' per second) until the deadline.
+    Latency is measured from the scheduled start, so time spent waiting for a
+    blocked event loop counts against the read instead of being hidden.
+    """
+    interval = 1 / rate
+    scheduled = time.perf_counter()
+    while scheduled < deadline:
+        await asyncio.sleep(max(0.0, scheduled - time.perf_counter()))
+        await client.get(path)
+        latencies.append(time.perf_counter() - scheduled)
+        scheduled += interval
+
+async def login_loop(client: httpx.AsyncClient, deadline: float, statuses: dict):
+    """
+    Logs in back to back until the deadline, counting response statuses.
+    """
+    form = {"username": "admin", "password": "adminpass"}
+    while time.perf_counter() < deadline:
+        response = await client.post("/token", data=form)
+        statuses[response.status_code] = statuses.get(response.status_code, 0) + 1
+
+async def run_phase(args, logins: int) -> dict:
+    """
+    Runs readers (and optionally login workers) for one measurement window.
+    """
+    latencies = []
+    statuses = {}
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        deadline = time.perf_counter() + args.duration
+        tasks = [read_loop(client, args.read_path, args.rate, deadline, latencies) for _ in range(args.readers)]
+        tasks += [login_loop(client, deadline, statuses) for _ in range(logins)]
+        await asyncio.gather(*tasks)
+    return {**summarize_latencies(latencies), "logins": sum(statuses.values()), "login_statuses": statuses}
+
+# -----------------------------
+# Entry Point
+# -----------------------------
+
+async def main(args):
+    if args.blocking:
+        # Reproduce the old behavior: bcrypt runs directly on the event loop
+        async def verify_inline(plain_password, hashed_password):
+            return auth.verify_password(plain_password, hashed_password)
+        auth.verify_password_async = verify_inline
+
+    baseline = await run_phase(args, logins=0)
+    storm = await run_phase(args, logins=args.logins)
+    auth.shutdown_password_pool()
+
+    print(f"Read path {args.read_path}, {args.readers} readers at {args.rate}/s, {args.duration}s per phase, "
+          f"{'blocking' if args.blocking else 'pooled'} bcrypt ({auth.PASSWORD_VERIFY_WORKERS} workers)")
+    print_table(
+        [{"phase": "baseline", **baseline}, {"phase": f"{args.logins} logins", **storm}],
+        ["phase", "count", "p50_ms", "p95_ms", "p99_ms", "max_ms", "logins", "login_statuses"],
+    )
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Read latency during a concurrent login storm")
+    parser.add_argument("--read-path", default="/cache/stats")
+    parser.add_argument("--readers", type=int, default=4)
+    parser.add_argument("--rate", type=float, default=100.0, help="Reads per second per reader")
+    parser.add_argument("--logins", type=int, default=16, help="Concurrent login workers")
+    parser.add_argument("--duration", type=float, default=5.0, help="Seconds per phase")
+    parser.add_argument("--blocking", action="store_true", help="Verify passwords on the event loop for comparison")
+    asyncio.run(main(parser.parse_args()))
@@ -0,0 +1,157 @@
+"""
+Measures point-read latency while expensive requests overload a slow database,
+with and without admission control.
+
+Runs the app in-process through httpx's ASGI transport on the memory backend,
+with the read cache off. Store calls are slowed down and pass through a
+simulated connection pool (--pool-size connections, --db-latency per call,
+--heavy-cost times that for search and aggregate calls), which admission sees
+as its pool saturation signal. Point readers issue GET /employees/{id} on a
+fixed schedule while --heavy clients loop over search and avg-salary,
+backing off for Retry-After when shed.
+
+    cd src
+    python -m benchmarks.overload --heavy 64 --duration 5
+"""
+import argparse
+import asyncio
+import random
+import time
+
+import httpx
+
+import storage
+from benchmarks.common import summarize_latencies, print_table
+
+# Store calls slowed down by the simulated database, and their cost in units of --db-latency
+STORE_COSTS = {"find_one": 1, "find_many": 1, "find_by_skill_tokens": None, "count": None, "list_salary_stats": None}
+
+# -----------------------------
+# Simulated Database
+# -----------------------------
+
+class SimulatedPool:
+    """
+    A connection pool of fixed size in front of the store; saturated when every connection is in use.
+    """
+
+    def __init__(self, size: int):
+        self.slots = asyncio.Semaphore(size)
+
+    def saturated(self) -> bool:
+        return self.slots.locked()
+
+def slow_down(store, pool: SimulatedPool, latency: float, heavy_cost: float):
+    """
+    Wraps the store's methods so each call holds a pooled connection for its cost.
+    """
+    for name, cost in STORE_COSTS.items():
+        method = getattr(store, name)
+        delay = latency * (cost or heavy_cost)
+
+        async def call(*args, _method=method, _delay=delay, **kwargs):
+            async with pool.slots:
+                await asyncio.sleep(_delay)
+                return await _method(*args, **kwargs)
+
+        setattr(store, name, call)
+
+# -----------------------------
+# Load Generators
+# -----------------------------
+
+async def read_loop(client: httpx.AsyncClient, ids: list, rate: float, deadline: float, latencies: list, statuses: dict):
+    """
+    Reads random employees on a fixed schedule ('rate' per second) until the deadline.
+    Latency is measured from the scheduled start, so queueing counts against the read.
+    """
+    interval = 1 / rate
+    scheduled = time.perf_counter()
+    pending = []
+
+    async def read(started: float):
+        response = await client.get(f"/employees/{random.choice(ids)}")
+        statuses[response.status_code] = statuses.get(response.status_code, 0) + 1
+        if response.status_code == 200:
+            latencies.append(time.perf_counter() - started)
+
+    while scheduled < deadline:
+        await asyncio.sleep(max(0.0, scheduled - time.perf_counter()))
+        pending.append(asyncio.create_task(read(scheduled)))  # Open loop: slow reads do not delay the next
+        scheduled += interval
+    await asyncio.gather(*pending)
+
+async def heavy_loop(client: httpx.AsyncClient, deadline: float, statuses: dict):
+    """
+    Alternates skill search and average salary back to back until the deadline,
+    waiting for Retry-After (capped at 1s) when shed.
+    """
+    paths = ["/employees/search?skill=Python", "/employees/avg-salary"]
+    turn = 0
+    while time.perf_counter() < deadline:
+        response = await client.get(paths[turn % len(paths)])
+        turn += 1
+        statuses[response.status_code] = statuses.get(response.status_code, 0) + 1
+        if response.status_code == 503:
+            await asyncio.sleep(min(1.0, float(response.headers.get("retry-after", "1"))))
+
+async def run_phase(client: httpx.AsyncClient, args, ids: list) -> dict:
+    latencies = []
+    read_statuses = {}
+    heavy_statuses = {}
+    deadline = time.perf_counter() + args.duration
+    tasks = [read_loop(client, ids, args.rate, deadline, latencies, read_statuses) for _ in range(args.readers)]
+    tasks += [heavy_loop(client, deadline, heavy_statuses) for _ in range(args.heavy)]
+    await asyncio.gather(*tasks)
+    return {**summarize_latencies(latencies), "reads": read_statuses, "heavy": heavy_statuses}
+
+# -----------------------------
+# Entry Point
+# -----------------------------
+
+async def main(args):
+    storage.STORAGE_BACKEND = "memory"
+    import admission
+    from cache import read_cache
+    from main import app, lifespan
+    read_cache.enabled = False
+
+    async with lifespan(app):
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=120) as client:
+            login = await client.post("/token", data={"username": "admin", "password": "adminpass"})
+            client.headers["Authorization"] = f"Bearer {login.json()['access_token']}"
+            ids = [f"OVERLOAD-{n}" for n in range(args.employees)]
+            rows = [{"employee_id": employee_id, "name": f"Load Test {n}", "department": f"dept-{n % 10}", "salary": 50000 + n,
+                     "joining_date": "2020-01-01", "skills": ["Python", "SQL"]} for n, employee_id in enumerate(ids)]
+            await client.post("/employees/bulk", json=rows)
+
+            pool = SimulatedPool(args.pool_size)
+            slow_down(storage.store, pool, args.db_latency / 1000, args.heavy_cost)
+            controller = admission.admission_controller
+            controller.pool = pool
+
+            results = []
+            for phase, enabled in (("no admission", False), ("admission", True)):
+                # Without admission, limits are set beyond any load instead of removing the middleware
+                capacity = args.pool_size if enabled else 10 ** 9
+                controller.configure(capacity, args.queue_size if enabled else 10 ** 9, args.max_wait)
+                results.append({"phase": phase, **await run_phase(client, args, ids)})
+
+    print(f"{args.readers} readers at {args.rate}/s, {args.heavy} heavy clients, pool of {args.pool_size}, "
+          f"{args.db_latency} ms per call (heavy x{args.heavy_cost}), {args.duration}s per phase")
+    print_table(results, ["phase", "count", "p50_ms", "p95_ms", "p99_ms", "max_ms", "reads", "heavy"])
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Point-read latency under overload, with and without admission control")
+    parser.add_argument("--employees", type=int, default=1000)
+    parser.add_argument("--readers", type=int, default=4)
+    parser.add_argument("--rate", type=float, default=50.0, help="Reads per second per reader")
+    parser.add_argument("--heavy", type=int, default=64, help="Concurrent clients running expensive requests")
+    parser.add_argument("--pool-size", type=int, default=10, help="Simulated connections (and admission slots)")
+    parser.add_argument("--db-latency", type=float, default=5.0, help="Milliseconds per simulated store call")
+    parser.add_argument("--heavy-cost", type=float, default=10.0, help="Cost of a search or aggregate call, in store calls")
+    parser.add_argument("--queue-size", type=int, default=40, help="Admission queue size (heavy gets a quarter)")
+    parser.add_argument("--max-wait", type=float, default=0.5, help="Admission deadline in seconds")
+    parser.add_argument("--duration", type=float, default=5.0, help="Seconds per phase")
+    asyncio.run(main(parser.parse_args()))
@@ -0,0 +1,139 @@
+"""
+Compares serialization cost per 1,000 employee rows:
+the default path (employee_helper + jsonable_encoder + JSONResponse, plus
+response_model validation for single reads) against the fast path
+(projected documents converted in place + orjson).
+
+Also checks that both paths produce identical bytes.
+
+    cd src
+    python -m benchmarks.serialization --rows 1000 --repeat 50
+"""
+import argparse
+import copy
+import random
+import timeit
+from datetime import datetime, timedelta
+
+from bson import ObjectId
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse
+from pydantic import TypeAdapter
+
+import crud
+from models import Employee
+from routes.employees import fast_json, EMPLOYEE_FIELDS
+from benchmarks.common import print_table
+
+# -----------------------------
+# Synthetic Documents
+# -----------------------------
+
+SKILLS = ["Python", "MongoDB", "APIs", "Docker", "Kubernetes", "SQL", "Machine Learning", "Go", "React"]
+
+def make_document(index: int) -> dict:
+    """
+    Builds a stored employee document as MongoDB returns it without a projection.
+    """
+    skills = random.sample(SKILLS, 4)
+    name = f"Employee {index}"
+    return {
+        "_id": ObjectId(),
+        "employee_id": f"E{index:07d}",
+        "name": name,
+        "name_tokens": crud.name_tokens(name),
+        "department": random.choice(["Engineering", "Sales", "HR", "Marketing"]),
+        "salary": float(random.randint(40, 200) * 1000),
+        "joining_date": datetime(2015, 1, 1) + timedelta(days=random.randint(0, 3650)),
+        "skills": skills,
+        "skill_tokens": crud.skill_tokens(skills),
+        "version": 1,
+    }
+
+def project(document: dict) -> dict:
+    """
+    Applies EMPLOYEE_PROJECTION the way MongoDB would.
+    """
+    return {field: document[field] for field in crud.EMPLOYEE_PROJECTION if field != "_id" and field in document}
+
+# -----------------------------
+# Serialization Paths
+# -----------------------------
+
+def default_list(documents):
+    """
+    Today's list path: helper dict per row, jsonable_encoder, json.dumps.
+    """
+    return JSONResponse(jsonable_encoder([crud.employee_helper(doc) for doc in documents])).body
+
+def fast_list(documents):
+    """
+    Fast list path: in-place conversion of projected rows, orjson.
+    """
+    return fast_json([crud.employee_from_projection(doc) for doc in documents]).body
+
+employee_adapter = TypeAdapter(Employee)
+
+def default_single(documents):
+    """
+    Today's single-read path: response_model validation per row.
+    """
+    return [JSONResponse(jsonable_encoder(employee_adapter.dump_python(employee_adapter.validate_python(crud.employee_helper(doc)), mode="json"))).body
+            for doc in documents]
+
+def fast_single(documents):
+    """
+    Fast single-read path: field subset, orjson.
+    """
+    bodies = []
+    for doc in documents:
+        employee = crud.employee_from_projection(doc)
+        bodies.append(fast_json({field: employee[field] for field in EMPLOYEE_FIELDS}).body)
+    return bodies
+
+# -----------------------------
+# Entry Point
+# -----------------------------
+
+def time_per_thousand(function, make_input, rows: int, repeat: int) -> float:
+    """
+    Returns the best-of-'repeat' milliseconds per 1,000 rows.
+    Inputs are rebuilt outside the timed region since the fast path converts in place.
+    """
+    timings = []
+    for _ in range(repeat):
+        documents = make_input()
+        timings.append(timeit.timeit(lambda: function(documents), number=1))
+    return min(timings) * 1000 * 1000 / rows
+
+def main(args):
+    random.seed(args.seed)
+    stored = [make_document(i) for i in range(args.rows)]
+
+    full = lambda: copy.deepcopy(stored)
+    projected = lambda: [project(doc) for doc in stored]
+
+    # Wire compatibility: both paths must produce the same bytes
+    assert default_list(full()) == fast_list(projected()), "list output differs"
+    assert default_single(full()) == fast_single(projected()), "single output differs"
+
+    rows = []
+    for name, default, fast in (("list", default_list, fast_list), ("single", default_single, fast_single)):
+        default_ms = time_per_thousand(default, full, args.rows, args.repeat)
+        fast_ms = time_per_thousand(fast, projected, args.rows, args.repeat)
+        rows.append({
+            "path": name,
+            "default_ms_per_1k": round(default_ms, 3),
+            "fast_ms_per_1k": round(fast_ms, 3),
+            "speedup": f"{default_ms / fast_ms:.1f}x",
+        })
+
+    print(f"{args.rows} rows, best of {args.repeat}; outputs byte-identical")
+    print_table(rows, ["path", "default_ms_per_1k", "fast_ms_per_1k", "speedup"])
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Serialization cost per 1,000 rows")
+    parser.add_argument("--rows", type=int, default=1000)
+    parser.add_argument("--repeat", type=int, default=20)
+    parser.add_argument("--seed", type=int, default=7)
+    main(parser.parse_args())
@@ -0,0 +1,89 @@
+"""
+Measures cold start: the time to import the app and to run its startup lifespan.
+
+Each run is a fresh interpreter, so nothing is shared between samples.
+The lifespan phase talks to MongoDB at MONGO_URL; pass --import-only
+to measure just the import when no database is available.
+
+    cd src
+    python -m benchmarks.startup --runs 5
+    python -m benchmarks.startup --mode blocking   # Compare STARTUP_DDL modes
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+import time
+
+from benchmarks.common import percentile, print_table
+
+# -----------------------------
+# Child Process (one sample)
+# -----------------------------
+
+def measure_once(import_only: bool) -> dict:
+    """
+    Imports the app and enters its lifespan, timing each phase.
+    Runs inside a fresh interpreter started by the parent.
+    """
+    import asyncio
+
+    started = time.perf_counter()
+    import main
+    imported = time.perf_counter()
+
+    result = {"import_s": imported - started}
+    if not import_only:
+        async def start_and_stop():
+            entered = time.perf_counter()
+            async with main.lifespan(main.app):
+                result["lifespan_s"] = time.perf_counter() - entered
+        asyncio.run(start_and_stop())
+    return result
+
+# -----------------------------
+# Parent Process
+# -----------------------------
+
+def run_sample(args) -> dict:
+    """
+    Starts a fresh interpreter for one sample and returns its timings.
+    """
+    command = [sys.executable, "-m", "benchmarks.startup", "--child"]
+    if args.import_only:
+        command.append("--import-only")
+    env = {**os.environ, "STARTUP_DDL": args.mode}
+    output = subprocess.run(command, env=env, capture_output=True, text=True, check=True).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+def main(args):
+    samples = [run_sample(args) for _ in range(args.runs)]
+
+    rows = []
+    for phase in ("import_s", "lifespan_s"):
+        values = [sample[phase] for sample in samples if phase in sample]
+        if values:
+            rows.append({
+                "phase": phase[:-2],
+                "p50_ms": round(percentile(values, 0.5) * 1000, 1),
+                "max_ms": round(max(values) * 1000, 1),
+            })
+    totals = [sum(sample.values()) for sample in samples]
+    rows.append({"phase": "total", "p50_ms": round(percentile(totals, 0.5) * 1000, 1), "max_ms": round(max(totals) * 1000, 1)})
+
+    print(f"STARTUP_DDL={args.mode}, {args.runs} runs")
+    print_table(rows, ["phase", "p50_ms", "max_ms"])
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Cold start benchmark")
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--mode", default="deferred", choices=["deferred", "blocking", "skip"], help="STARTUP_DDL mode")
+    parser.add_argument("--import-only", action="store_true", help="Skip the lifespan (no database needed)")
+    parser.add_argument("--child", action="store_true", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        print(json.dumps(measure_once(args.import_only)))
+    else:
+        main(args)
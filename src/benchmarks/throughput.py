@@ -0,0 +1,120 @@
+"""
+Measures requests per second against serve.py at increasing worker counts,
+to show how throughput scales across cores.
+
+Load comes from several client processes so the generator is not the
+bottleneck. The default path needs MongoDB at MONGO_URL; use --path
+/cache/stats to measure the framework alone.
+
+    cd src
+    python -m benchmarks.throughput --workers 1 2 4 --duration 10
+"""
+import argparse
+import asyncio
+import multiprocessing
+import os
+import subprocess
+import sys
+import time
+
+import httpx
+
+from benchmarks.common import summarize_latencies, print_table
+
+# -----------------------------
+# Load Generator Processes
+# -----------------------------
+
+async def drive(url: str, concurrency: int, duration: float) -> list:
+    """
+    Keeps 'concurrency' requests in flight for 'duration' seconds.
+    Returns the latency of every successful request.
+    """
+    latencies = []
+    deadline = time.perf_counter() + duration
+    limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+    async with httpx.AsyncClient(limits=limits, timeout=30) as client:
+        async def worker():
+            while time.perf_counter() < deadline:
+                started = time.perf_counter()
+                response = await client.get(url)
+                if response.status_code < 400:
+                    latencies.append(time.perf_counter() - started)
+        await asyncio.gather(*(worker() for _ in range(concurrency)))
+    return latencies
+
+def client_process(url: str, concurrency: int, duration: float, results):
+    """
+    Entry point of one load generator process.
+    """
+    results.put(asyncio.run(drive(url, concurrency, duration)))
+
+# -----------------------------
+# Server Management
+# -----------------------------
+
+def start_server(workers: int, port: int) -> subprocess.Popen:
+    """
+    Starts serve.py with 'workers' processes and waits until it answers.
+    """
+    env = {**os.environ, "STARTUP_DDL": os.getenv("STARTUP_DDL", "skip")}
+    server = subprocess.Popen(
+        [sys.executable, "serve.py", "--workers", str(workers), "--port", str(port), "--host", "127.0.0.1"],
+        env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+    )
+    for _ in range(200):
+        try:
+            httpx.get(f"http://127.0.0.1:{port}/docs", timeout=1)
+            return server
+        except httpx.TransportError:
+            time.sleep(0.1)
+    server.terminate()
+    raise RuntimeError("Server did not start")
+
+def measure(args, workers: int) -> dict:
+    """
+    Runs the load generators against a server with 'workers' processes.
+    """
+    server = start_server(workers, args.port)
+    try:
+        url = f"http://127.0.0.1:{args.port}{args.path}"
+        asyncio.run(drive(url, args.concurrency, 1.0))  # Warm up caches and connection pools
+
+        results = multiprocessing.Queue()
+        clients = [
+            multiprocessing.Process(target=client_process, args=(url, args.concurrency, args.duration, results))
+            for _ in range(args.clients)
+        ]
+        for process in clients:
+            process.start()
+        latencies = [latency for _ in clients for latency in results.get()]
+        for process in clients:
+            process.join()
+    finally:
+        server.terminate()
+        server.wait()
+
+    return {"workers": workers, "rps": round(len(latencies) / args.duration, 1), **summarize_latencies(latencies)}
+
+# -----------------------------
+# Entry Point
+# -----------------------------
+
+def main(args):
+    rows = [measure(args, workers) for workers in args.workers]
+    base = rows[0]["rps"] / rows[0]["workers"] if rows[0]["rps"] else 0
+    for row in rows:
+        row["scaling"] = f"{row['rps'] / (base * row['workers']):.0%}" if base else "-"
+
+    print(f"GET {args.path}, {args.clients} client processes x {args.concurrency} in flight, {args.duration}s per run, {os.cpu_count()} CPUs")
+    print_table(rows, ["workers", "rps", "scaling", "p50_ms", "p95_ms", "p99_ms"])
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Throughput scaling across worker processes")
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4])
+    parser.add_argument("--path", default="/employees/avg-salary")
+    parser.add_argument("--clients", type=int, default=2, help="Load generator processes")
+    parser.add_argument("--concurrency", type=int, default=32, help="In-flight requests per client process")
+    parser.add_argument("--duration", type=float, default=10.0, help="Seconds per run")
+    parser.add_argument("--port", type=int, default=8765)
+    main(parser.parse_args())
@@ -0,0 +1,193 @@
+from collections import OrderedDict
+from dotenv import load_dotenv
+from functools import partial
+from typing import Optional
+import asyncio
+import os
+import time
+
+# Load environment variables from .env file
+load_dotenv()
+
+# -----------------------------
+# Configuration Constants
+# -----------------------------
+CACHE_ENABLED = os.getenv("CACHE_ENABLED", "true").lower() in ("1", "true", "yes")
+CACHE_MAX_ENTRIES = int(os.getenv("CACHE_MAX_ENTRIES", "10000"))  # LRU bound on cached entries
+CACHE_TTL_SECONDS = float(os.getenv("CACHE_TTL_SECONDS", "30"))  # Bounds staleness from writes made by other processes
+CACHE_MAX_LIST_SIZE = int(os.getenv("CACHE_MAX_LIST_SIZE", "1000"))  # Larger list results are never cached
+CACHE_COALESCE_LOADS = os.getenv("CACHE_COALESCE_LOADS", "true").lower() in ("1", "true", "yes")  # Share concurrent loads of a key
+
+# Returned by lookup() when a key is not cached
+MISSING = object()
+
+# -----------------------------
+# Read Cache
+# -----------------------------
+
+class ReadCache:
+    """
+    Bounded in-process LRU cache with a per-entry TTL.
+    Writes in this process invalidate exact keys; the TTL bounds how long
+    writes made by other processes can go unnoticed.
+    Concurrent misses on the same key share one load (see share_load()),
+    even when caching itself is disabled.
+    """
+
+    def __init__(self, max_entries: int = CACHE_MAX_ENTRIES, ttl_seconds: float = CACHE_TTL_SECONDS, enabled: bool = CACHE_ENABLED,
+                 coalesce: bool = CACHE_COALESCE_LOADS):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.enabled = enabled and max_entries > 0
+        self.coalesce = coalesce
+        self.entries = OrderedDict()  # key -> (expires_at, value)
+        self.loading = {}  # key -> {variant: task}, loads in flight
+        self.invalidations = 0  # Bumped on every invalidation; guards against stale fills
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.coalesced = 0
+
+    def lookup(self, key):
+        """
+        Returns the cached value for 'key', or MISSING.
+        """
+        entry = self.entries.get(key)
+        if entry is None:
+            self.misses += 1
+            return MISSING
+        expires_at, value = entry
+        if expires_at <= time.monotonic():
+            del self.entries[key]
+            self.misses += 1
+            return MISSING
+        self.entries.move_to_end(key)
+        self.hits += 1
+        return value
+
+    def store(self, key, value, stamp: Optional[int], ttl: Optional[float] = None):
+        """
+        Caches 'value' unless something was invalidated after 'stamp' was taken,
+        in which case the value may already be stale and is dropped.
+        A None stamp skips that check, for entries only the TTL expires.
+        'ttl' overrides the default lifetime for this entry.
+        """
+        if stamp is not None and stamp != self.invalidations:
+            return
+        self.entries[key] = (time.monotonic() + (self.ttl_seconds if ttl is None else ttl), value)
+        self.entries.move_to_end(key)
+        while len(self.entries) > self.max_entries:
+            self.entries.popitem(last=False)
+            self.evictions += 1
+
+    async def get_or_load(self, key, loader, cacheable=None, ttl: Optional[float] = None, ttl_only: bool = False):
+        """
+        Returns the cached value for 'key', calling the async 'loader' on a miss.
+        'cacheable' can veto caching a loaded value (e.g. very large lists);
+        'ttl' overrides the default lifetime. 'ttl_only' marks keys that writes
+        never invalidate, so a load that overlaps a write is still cached.
+        """
+        if self.enabled:
+            value = self.lookup(key)
+            if value is not MISSING:
+                return value
+        return await self.share_load(key, partial(self.fill, key, loader, cacheable, ttl, ttl_only))
+
+    async def fill(self, key, loader, cacheable=None, ttl: Optional[float] = None, ttl_only: bool = False):
+        """
+        Loads a value and caches it, unless 'cacheable' vetoes it.
+        """
+        stamp = None if ttl_only else self.invalidations
+        value = await loader()
+        if self.enabled and (cacheable is None or cacheable(value)):
+            self.store(key, value, stamp, ttl)
+        return value
+
+    async def share_load(self, key, loader, variant=None):
+        """
+        Runs the async 'loader', or joins the identical load already in flight,
+        so a burst of requests for one key costs a single database call.
+        'variant' tells apart different loads of the same key (e.g. other fields).
+        The shared load is shielded: a caller that disconnects does not cancel
+        it for the others. Invalidating the key detaches it, so a read that
+        starts after a write never receives a result loaded before it.
+        """
+        if not self.coalesce:
+            return await loader()
+        loads = self.loading.setdefault(key, {})
+        task = loads.get(variant)
+        if task is None:
+            task = loads[variant] = asyncio.ensure_future(loader())
+            task.add_done_callback(partial(self.load_done, key, variant))
+        else:
+            self.coalesced += 1
+        return await asyncio.shield(task)
+
+    def load_done(self, key, variant, task):
+        loads = self.loading.get(key)
+        if loads is not None and loads.get(variant) is task:
+            del loads[variant]
+            if not loads:
+                del self.loading[key]
+        if not task.cancelled():
+            task.exception()  # Retrieved here, in case every waiter has gone
+
+    def invalidate(self, *keys):
+        """
+        Drops the given keys after a write.
+        """
+        self.invalidations += 1
+        for key in keys:
+            self.entries.pop(key, None)
+            self.loading.pop(key, None)
+
+    def clear(self):
+        """
+        Drops every entry.
+        """
+        self.invalidations += 1
+        self.entries.clear()
+        self.loading.clear()
+
+    def stats(self) -> dict:
+        """
+        Returns the cache configuration and hit/miss/eviction counters.
+        """
+        return {
+            "enabled": self.enabled,
+            "size": len(self.entries),
+            "max_entries": self.max_entries,
+            "ttl_seconds": self.ttl_seconds,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "coalesced": self.coalesced,
+            "loads_in_flight": sum(len(loads) for loads in self.loading.values()),
+        }
+
+# Shared cache for employee reads
+read_cache = ReadCache()
+
+# -----------------------------
+# Cache Keys
+# -----------------------------
+
+def employee_key(employee_id: str):
+    """
+    Cache key for a single employee lookup.
+    """
+    return ("employee", employee_id)
+
+def department_key(department: str):
+    """
+    Cache key for a department listing.
+    """
+    return ("department", department)
+
+AVG_SALARY_KEY = ("avg_salary",)
+
+def analytics_key(department, joined_from, joined_to, bucket_width):
+    """
+    Cache key for department analytics with the given filters.
+    """
+    return ("analytics", department, joined_from, joined_to, bucket_width)
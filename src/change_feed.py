@@ -0,0 +1,352 @@
+from collections import deque
+from dotenv import load_dotenv
+from fastapi import HTTPException, status
+from itertools import islice
+from typing import AsyncIterator, Deque, Dict, List, Optional, Set, Tuple
+import asyncio
+import contextlib
+import logging
+import os
+
+import orjson
+
+import crud
+import storage
+from storage import ChangeHistoryLost, ChangeStreamUnavailable
+
+# Load environment variables from .env file
+load_dotenv()
+
+logger = logging.getLogger(__name__)
+
+# -----------------------------
+# Configuration Constants
+# -----------------------------
+CHANGE_FEED_BUFFER_SIZE = int(os.getenv("CHANGE_FEED_BUFFER_SIZE", "10000"))  # Recent events kept per worker for resuming clients
+CHANGE_FEED_QUEUE_SIZE = int(os.getenv("CHANGE_FEED_QUEUE_SIZE", "1000"))  # Events a client may fall behind before it is disconnected
+CHANGE_FEED_MAX_SUBSCRIBERS = int(os.getenv("CHANGE_FEED_MAX_SUBSCRIBERS", "1000"))  # Open streams per worker; more are refused
+CHANGE_FEED_HEARTBEAT_SECONDS = float(os.getenv("CHANGE_FEED_HEARTBEAT_SECONDS", "15"))  # Keepalive interval on idle streams
+CHANGE_FEED_CONNECT_TIMEOUT_SECONDS = 10  # How long a new stream waits for the upstream watch to open
+CHANGE_FEED_MAX_BACKOFF_SECONDS = 30  # Longest wait between upstream reconnects
+CHANGE_FEED_RETRY_MS = 2000  # Reconnect delay suggested to clients
+
+# Event type published for each store operation
+EVENT_TYPES = {"insert": "create", "update": "update", "replace": "update", "delete": "delete"}
+
+# An event as buffered and queued: (sequence, token, event).
+# Sequences number the events this worker published; the token is the
+# store's change token (the SSE event ID), or None for reset notices.
+Entry = Tuple[int, Optional[str], dict]
+
+# -----------------------------
+# Events
+# -----------------------------
+
+def change_event(change: dict) -> dict:
+    """
+    Builds the public event for a store change: its type, the employee ID, the
+    department (before a delete, after any other change), the department it
+    moved from if it moved, and the employee as the API returns it (None after a delete).
+    """
+    document, previous = change["document"], change["previous"]
+    source = document or previous or {}
+    moved = document is not None and previous is not None and previous.get("department") != document.get("department")
+    return {
+        "type": EVENT_TYPES[change["operation"]],
+        "employee_id": source.get("employee_id"),
+        "department": source.get("department"),
+        "previous_department": previous.get("department") if moved else None,
+        "employee": crud.employee_helper(document) if document is not None else None,
+    }
+
+def reset_event(reason: str) -> dict:
+    """
+    Builds the notice sent when events may have been missed: clients should
+    reload what they show and carry on from the events that follow.
+    """
+    return {"type": "reset", "reason": reason}
+
+def sse_frame(token: Optional[str], event: dict) -> bytes:
+    """
+    Encodes one Server-Sent Events message; the token becomes the event ID
+    that browsers send back as Last-Event-ID when they reconnect.
+    """
+    head = f"id: {token}\n" if token else ""
+    return f"{head}event: {event['type']}\n".encode() + b"data: " + orjson.dumps(event) + b"\n\n"
+
+# -----------------------------
+# Subscriptions
+# -----------------------------
+
+class Subscription:
+    """
+    One client's queue of events, optionally limited to one department.
+    A department subscriber also gets moves out of the department, deletes
+    whose department is unknown (no pre-image) and reset notices.
+    """
+
+    def __init__(self, department: Optional[str], queue_size: int):
+        self.department = department
+        self.queue_size = queue_size
+        # One slot beyond 'queue_size' is kept for the None that ends the stream
+        self.queue: asyncio.Queue = asyncio.Queue(maxsize=queue_size + 1)
+        self.closed = False
+
+    def wants(self, event: dict) -> bool:
+        if self.department is None or event["type"] == "reset" or event["department"] is None:
+            return True
+        return self.department in (event["department"], event["previous_department"])
+
+    def offer(self, entry: Entry) -> bool:
+        """
+        Queues an entry. Returns False, and ends the stream, if the client has
+        fallen 'queue_size' events behind; it resumes from the buffer on reconnect.
+        """
+        if self.queue.qsize() >= self.queue_size:
+            self.close()
+            return False
+        self.queue.put_nowait(entry)
+        return True
+
+    def close(self):
+        if not self.closed:
+            self.closed = True
+            self.queue.put_nowait(None)
+
+# -----------------------------
+# Change Feed
+# -----------------------------
+
+class ChangeFeed:
+    """
+    Fans one upstream watch of the employee store out to every SSE client of
+    this worker, so the database sees a single change stream per process no
+    matter how many clients are connected. The upstream starts with the first
+    client and then keeps running, resuming from its last token after errors.
+
+    Recent events stay in a replay buffer. A client reconnecting with the ID of
+    a buffered event gets the events after it from there; an older ID is caught
+    up with a short-lived stream resumed from that token, which hands over to
+    the shared feed as soon as it reaches the buffer. When neither can cover the
+    gap (history past the oplog, or the memory store), the client gets a 'reset'.
+    """
+
+    def __init__(self, buffer_size: int = CHANGE_FEED_BUFFER_SIZE, queue_size: int = CHANGE_FEED_QUEUE_SIZE,
+                 max_subscribers: int = CHANGE_FEED_MAX_SUBSCRIBERS):
+        self.queue_size = queue_size
+        self.max_subscribers = max_subscribers
+        self.buffer: Deque[Entry] = deque(maxlen=buffer_size)
+        self.positions: Dict[str, int] = {}  # token -> sequence, for buffered events
+        self.sequence = 0
+        self.last_token: Optional[str] = None
+        self.subscribers: Set[Subscription] = set()
+        self.upstream: Optional[asyncio.Task] = None
+        self.connected = asyncio.Event()
+        self.unavailable: Optional[str] = None
+        self.published = 0
+        self.overflows = 0
+        self.resets = 0
+        self.catch_ups = 0
+
+    # --- Upstream ---
+
+    async def follow(self):
+        """
+        Publishes every change from the store, reconnecting with backoff after
+        errors. Stops for good if the store cannot watch at all.
+        """
+        delay = 1.0
+        while True:
+            try:
+                async with contextlib.aclosing(storage.store.watch_changes(self.last_token)) as changes:
+                    async for change in changes:
+                        self.connected.set()
+                        delay = 1.0
+                        if change is not None:
+                            self.publish(change)
+            except ChangeStreamUnavailable as e:
+                logger.error("Change feed unavailable: %s", e)
+                self.unavailable = str(e)
+                self.connected.set()
+                for subscription in list(self.subscribers):
+                    subscription.close()
+                return
+            except ChangeHistoryLost as e:
+                logger.warning("Change feed could not resume, continuing from now: %s", e)
+                self.last_token = None
+                self.append(None, reset_event("The change feed missed changes while reconnecting"))
+                self.resets += 1
+            except Exception:
+                logger.exception("Change feed upstream failed; reconnecting in %.0fs", delay)
+                if self.last_token is None and self.connected.is_set():
+                    # Nothing to resume from, so changes made until the reconnect are lost
+                    self.append(None, reset_event("The change feed missed changes while reconnecting"))
+                    self.resets += 1
+                await asyncio.sleep(delay)
+                delay = min(delay * 2, CHANGE_FEED_MAX_BACKOFF_SECONDS)
+
+    def publish(self, change: dict):
+        self.last_token = change["token"]
+        self.published += 1
+        self.append(change["token"], change_event(change))
+
+    def append(self, token: Optional[str], event: dict):
+        """
+        Numbers an event, buffers it and offers it to every interested subscriber.
+        """
+        self.sequence += 1
+        entry = (self.sequence, token, event)
+        if self.buffer.maxlen:
+            if len(self.buffer) == self.buffer.maxlen:
+                self.positions.pop(self.buffer[0][1], None)
+            self.buffer.append(entry)
+            if token is not None:
+                self.positions[token] = self.sequence
+        for subscription in list(self.subscribers):
+            if subscription.wants(event) and not subscription.offer(entry):
+                self.subscribers.discard(subscription)
+                self.overflows += 1
+
+    def buffered_after(self, sequence: int) -> List[Entry]:
+        """
+        Returns the buffered entries numbered after 'sequence'.
+        """
+        if not self.buffer:
+            return []
+        start = max(0, sequence - self.buffer[0][0] + 1)
+        return list(islice(self.buffer, start, None))
+
+    async def catch_up(self, token: str) -> AsyncIterator[Entry]:
+        """
+        Yields the changes after 'token' from a stream of its own, with the
+        sequence of the first one that is also buffered (None before that);
+        it stops there. Yields (None, None, None) and stops if it goes idle first.
+        Raises ChangeHistoryLost if the store cannot resume from 'token'.
+        """
+        self.catch_ups += 1
+        async with contextlib.aclosing(storage.store.watch_changes(token)) as changes:
+            async for change in changes:
+                if change is None:
+                    yield None, None, None
+                    return
+                sequence = self.positions.get(change["token"])
+                yield sequence, change["token"], change_event(change)
+                if sequence is not None:
+                    return
+
+    # --- Clients ---
+
+    async def ensure_open(self):
+        """
+        Starts the upstream if needed and checks that another client can be
+        served; raises 503 otherwise.
+        """
+        if len(self.subscribers) >= self.max_subscribers:
+            raise HTTPException(
+                status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+                detail="Too many open change streams on this worker; try again later",
+                headers={"Retry-After": "30"},
+            )
+        if self.unavailable is None and (self.upstream is None or self.upstream.done()):
+            self.upstream = asyncio.get_running_loop().create_task(self.follow())
+        try:
+            await asyncio.wait_for(self.connected.wait(), timeout=CHANGE_FEED_CONNECT_TIMEOUT_SECONDS)
+        except asyncio.TimeoutError:
+            raise HTTPException(
+                status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+                detail="The change feed is not connected yet",
+                headers={"Retry-After": "5"},
+            )
+        if self.unavailable is not None:
+            raise HTTPException(
+                status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+                detail=f"Change feed unavailable; it needs MongoDB running as a replica set ({self.unavailable})",
+            )
+
+    async def stream(self, department: Optional[str] = None, last_event_id: Optional[str] = None) -> AsyncIterator[bytes]:
+        """
+        Yields SSE messages for one client: the events after 'last_event_id'
+        (if given), then live events, with keepalive comments while idle.
+        Ends when the client falls too far behind or the feed stops.
+        """
+        subscription = Subscription(department, self.queue_size)
+        self.subscribers.add(subscription)
+        subscribed_at = self.sequence
+        try:
+            yield f"retry: {CHANGE_FEED_RETRY_MS}\n\n".encode()
+            last_sequence = subscribed_at
+            # Tokens sent during a catch-up that the live queue may repeat
+            caught_up: Dict[str, None] = {}
+            if last_event_id:
+                last_sequence = self.positions.get(last_event_id)
+                if last_sequence is None:
+                    last_sequence = subscribed_at
+                    try:
+                        async with contextlib.aclosing(self.catch_up(last_event_id)) as changes:
+                            async for sequence, token, event in changes:
+                                if event is not None and subscription.wants(event):
+                                    yield sse_frame(token, event)
+                                if sequence is not None:
+                                    last_sequence = sequence
+                                elif token is not None:
+                                    caught_up[token] = None
+                                    if len(caught_up) > self.queue_size:
+                                        del caught_up[next(iter(caught_up))]
+                    except ChangeHistoryLost:
+                        yield sse_frame(None, reset_event(f"Cannot resume after event {last_event_id}"))
+
+            if last_sequence < subscribed_at and self.buffer and self.buffer[0][0] > last_sequence + 1:
+                # The buffer moved past the client while it caught up
+                yield sse_frame(None, reset_event(f"Cannot resume after event {last_event_id}"))
+            for sequence, token, event in self.buffered_after(last_sequence):
+                if sequence > subscribed_at:
+                    break  # Queued live from here on
+                if subscription.wants(event):
+                    yield sse_frame(token, event)
+                last_sequence = sequence
+
+            while True:
+                try:
+                    entry = await asyncio.wait_for(subscription.queue.get(), timeout=CHANGE_FEED_HEARTBEAT_SECONDS)
+                except asyncio.TimeoutError:
+                    yield b": keepalive\n\n"
+                    continue
+                if entry is None:
+                    break
+                sequence, token, event = entry
+                if sequence > last_sequence and token not in caught_up:
+                    last_sequence = sequence
+                    yield sse_frame(token, event)
+        finally:
+            self.subscribers.discard(subscription)
+
+    # --- Lifecycle ---
+
+    async def stop(self):
+        """
+        Ends every open stream and the upstream watch.
+        """
+        for subscription in list(self.subscribers):
+            subscription.close()
+        self.subscribers.clear()
+        if self.upstream is not None:
+            self.upstream.cancel()
+            with contextlib.suppress(asyncio.CancelledError):
+                await self.upstream
+            self.upstream = None
+        self.connected = asyncio.Event()
+
+    def stats(self) -> dict:
+        return {
+            "subscribers": len(self.subscribers),
+            "buffered": len(self.buffer),
+            "published": self.published,
+            "catch_ups": self.catch_ups,
+            "overflows": self.overflows,
+            "resets": self.resets,
+            "connected": self.connected.is_set() and self.unavailable is None,
+            "unavailable": self.unavailable,
+        }
+
+# Shared change feed for this worker
+change_feed = ChangeFeed()
@@ -1,8 +1,34 @@
 from bson import ObjectId
-from database import employees_collection
+import storage
+from search import SEARCH_MAX_RESULTS, SEARCH_MAX_TERMS, relevance, search_vocabulary
+from cache import read_cache, employee_key, department_key, analytics_key, AVG_SALARY_KEY, CACHE_MAX_LIST_SIZE, MISSING
 from models import Employee, UpdateEmployee
 from fastapi import HTTPException
+from pydantic import ValidationError
+from storage import AnalyticsUnavailable, DuplicateEmployeeError, SortKey
+from typing import AsyncIterable, List, Optional, Tuple, Union
 from datetime import datetime, date  
+import base64
+import binascii
+import json
+import math
+import os
+import re
+
+# -----------------------------
+# Configuration Constants
+# -----------------------------
+BULK_BATCH_SIZE = int(os.getenv("BULK_BATCH_SIZE", "1000"))  # Default rows per insert_many batch
+BULK_MAX_BATCH_SIZE = 10000  # Upper bound for a client-supplied batch size
+BATCH_LOOKUP_MAX_IDS = int(os.getenv("BATCH_LOOKUP_MAX_IDS", "100"))  # IDs accepted by one batch lookup
+ANALYTICS_BUCKET_WIDTH = float(os.getenv("ANALYTICS_BUCKET_WIDTH", "10000"))  # Default salary histogram bucket width
+ANALYTICS_MAX_BUCKETS = max(2, int(os.getenv("ANALYTICS_MAX_BUCKETS", "1000")))  # Histogram buckets per department; wider buckets beyond
+ANALYTICS_CACHE_TTL_SECONDS = float(os.getenv("ANALYTICS_CACHE_TTL_SECONDS", "10"))  # Analytics are not invalidated by writes
+STREAM_BATCH_SIZE = int(os.getenv("STREAM_BATCH_SIZE", "500"))  # Documents per cursor batch when streaming
+SALARY_RECOUNT_ATTEMPTS = 5  # Min/max recounts retried under concurrent writes before leaving them to verify-stats
+
+# Longest run of words indexed from a single skill (e.g. "machine learning" is 2)
+SKILL_PHRASE_MAX_WORDS = 5
 
 # -----------------------------
 # Helper Function
@@ -22,6 +48,144 @@ def employee_helper(employee) -> dict:
         "skills": employee["skills"],
     }
 
+# A word keeps '+', '#' and inner dots, so "C++", "C#" and "Node.js" stay distinct from "C" and "Node"
+WORD_PATTERN = re.compile(r"[\w+#]+(?:\.[\w+#]+)*")
+
+def skill_words(skill: str) -> List[str]:
+    """
+    Splits a skill into lowercase words, dropping other punctuation.
+    """
+    return WORD_PATTERN.findall(skill.casefold())
+
+def normalize_skill(skill: str) -> str:
+    """
+    Normalizes a skill search term the same way skills are indexed.
+    """
+    return " ".join(skill_words(skill))
+
+def skill_tokens(skills: List[str]) -> List[str]:
+    """
+    Builds the indexed 'skill_tokens' values for a list of skills.
+    Every contiguous run of words in a skill becomes one token, so a search
+    for "learning" or "machine learning" both match "Machine Learning",
+    mirroring the old case-insensitive whole-word regex with an exact index lookup.
+    """
+    tokens = set()
+    for skill in skills:
+        words = skill_words(skill)
+        if words:
+            tokens.add(" ".join(words))
+        for start in range(len(words)):
+            for end in range(start + 1, min(start + SKILL_PHRASE_MAX_WORDS, len(words)) + 1):
+                tokens.add(" ".join(words[start:end]))
+    return sorted(tokens)
+
+def name_tokens(name: str) -> List[str]:
+    """
+    Builds the indexed 'name_tokens' values: the distinct words of a name.
+    """
+    return sorted(set(skill_words(name)))
+
+# Fields returned by the API; reads project to these so the store never returns internal fields.
+# 'version' is only returned when selected with 'fields='; single reads send it as the ETag.
+EMPLOYEE_PROJECTION = {
+    "_id": 0, "employee_id": 1, "name": 1, "department": 1,
+    "salary": 1, "joining_date": 1, "skills": 1,
+}
+DEFAULT_FIELDS = [field for field in EMPLOYEE_PROJECTION if field != "_id"]
+
+# Cached single employees also hold the version, for the ETag
+VERSIONED_PROJECTION = {**EMPLOYEE_PROJECTION, "version": 1}
+
+def employee_projection(fields: Optional[List[str]] = None, required: Tuple[str, ...] = ()) -> dict:
+    """
+    Builds the MongoDB projection for a sparse fieldset.
+    'fields' are the API fields the client asked for (None means all);
+    'required' are extra fields the query itself needs, e.g. for cursors.
+    """
+    if fields is None:
+        return EMPLOYEE_PROJECTION
+    projection = {"_id": 0}
+    for field in (*fields, *required):
+        projection[field] = 1
+    return projection
+
+def employee_from_projection(employee, fields: Optional[List[str]] = None) -> dict:
+    """
+    Fast path of employee_helper for documents read with employee_projection().
+    Converts 'joining_date' in place instead of building a new dict;
+    with the full projection the output is identical to employee_helper's.
+    """
+    joining_date = employee.get("joining_date")
+    if joining_date is not None:
+        employee["joining_date"] = joining_date.date() if isinstance(joining_date, datetime) else str(joining_date)
+    if fields is not None and "version" in fields:
+        employee.setdefault("version", 0)
+    return employee
+
+def versioned_employee(employee: dict) -> dict:
+    """
+    Converts a document read with VERSIONED_PROJECTION; legacy documents count as version 0.
+    """
+    employee = employee_from_projection(employee)
+    employee.setdefault("version", 0)
+    return employee
+
+def select_fields(employee: dict, fields: Optional[List[str]]) -> dict:
+    """
+    Narrows an API-shaped employee dict to a sparse fieldset.
+    """
+    if fields is None:
+        return employee
+    return {field: employee[field] for field in fields if field in employee}
+
+def parse_joining_date(value: str) -> Optional[datetime]:
+    """
+    Parses a legacy string joining date ("2025-09-12" or a full ISO timestamp)
+    into the midnight datetime the API stores. Returns None if it is not a date.
+    """
+    try:
+        parsed = datetime.fromisoformat(value.strip())
+    except ValueError:
+        return None
+    return datetime.combine(parsed.date(), datetime.min.time())
+
+def employee_to_document(employee: Employee) -> dict:
+    """
+    Converts an Employee model into a MongoDB document.
+    Stores 'joining_date' as a datetime, since BSON has no plain date type,
+    adds the indexed 'name_tokens' and 'skill_tokens' fields and starts the document at version 1.
+    """
+    document = employee.model_dump()
+    if isinstance(document["joining_date"], date):
+        document["joining_date"] = datetime.combine(document["joining_date"], datetime.min.time())
+    document["name_tokens"] = name_tokens(document["name"])
+    document["skill_tokens"] = skill_tokens(document["skills"])
+    document["version"] = 1
+    return document
+
+def invalidate_reads(*documents):
+    """
+    Drops cached reads affected by a write: the employees themselves,
+    their departments' listings and the salary averages.
+    Call after the write (and its aggregate update) has completed.
+    """
+    keys = [AVG_SALARY_KEY]
+    for document in documents:
+        if document:
+            keys.append(employee_key(document["employee_id"]))
+            keys.append(department_key(document["department"]))
+    read_cache.invalidate(*keys)
+
+async def raise_write_conflict(employee_id: str, versions: Optional[List[int]] = None):
+    """
+    Called when a write matched nothing.
+    For conditional writes, distinguishes a missing employee (404) from a stale version (412).
+    """
+    if versions is None or not await storage.store.exists(employee_id):
+        raise HTTPException(status_code=404, detail="Employee not found")
+    raise HTTPException(status_code=412, detail="Employee has been modified by another request")
+
 # -----------------------------
 # 1. Create New Employee
 # -----------------------------
@@ -29,43 +193,90 @@ def employee_helper(employee) -> dict:
 async def create_employee(employee: Employee):
     """
     Inserts a new employee into the database.
-    Validates that the employee_id is unique.
+    The store's unique 'employee_id' constraint rejects duplicates, so the insert
+    is the only round trip; the written document is returned as-is.
     """
-    existing = await employees_collection.find_one({"employee_id": employee.employee_id})
-    if existing:
-        raise HTTPException(status_code=400, detail="Employee ID already exists")
-
-    new_employee = employee.model_dump()
+    new_employee = employee_to_document(employee)
 
-    # Convert date to datetime for MongoDB
-    if isinstance(new_employee["joining_date"], date):
-        new_employee["joining_date"] = datetime.combine(new_employee["joining_date"], datetime.min.time())
-
-    await employees_collection.insert_one(new_employee)
-    created = await employees_collection.find_one({"employee_id": employee.employee_id})
-    return employee_helper(created)
+    try:
+        await storage.store.insert_one(new_employee)
+    except DuplicateEmployeeError:
+        raise HTTPException(status_code=400, detail="Employee ID already exists")
+    await record_salary_change(None, new_employee)
+    invalidate_reads(new_employee)
+    # The route sends the version as the ETag; the response model leaves it out of the body
+    return {**employee_helper(new_employee), "version": new_employee["version"]}
 
 # -----------------------------
 # 2. Retrieve Employee by ID
 # -----------------------------
 
-async def get_employee(employee_id: str):
+async def get_employee(employee_id: str, fields: Optional[List[str]] = None):
     """
     Retrieves an employee document based on the provided employee_id.
+    Served from the read cache when possible. With a sparse fieldset,
+    a cache miss fetches only the requested fields and is not cached.
+    Concurrent misses for the same employee (and fields) share one lookup.
+    Without 'fields', the result also carries the version.
     """
-    employee = await employees_collection.find_one({"employee_id": employee_id})
-    if not employee:
-        raise HTTPException(status_code=404, detail="Employee not found")
-    return employee_helper(employee)
+    async def load(projection=VERSIONED_PROJECTION):
+        employee = await storage.store.find_one(employee_id, projection)
+        if not employee:
+            raise HTTPException(status_code=404, detail="Employee not found")
+        return versioned_employee(employee) if fields is None else employee_from_projection(employee, fields)
+
+    if fields is None:
+        return await read_cache.get_or_load(employee_key(employee_id), load)
+
+    cached = read_cache.lookup(employee_key(employee_id)) if read_cache.enabled else MISSING
+    if cached is not MISSING:
+        return select_fields(cached, fields)
+    return await read_cache.share_load(
+        employee_key(employee_id), lambda: load(employee_projection(fields)), variant=tuple(fields)
+    )
+
+async def get_employees(employee_ids: List[str], fields: Optional[List[str]] = None) -> dict:
+    """
+    Retrieves several employees at once, in the requested order.
+    Cached employees are served from the read cache; the rest come from a
+    single store lookup and are cached like get_employee() results.
+    Repeated IDs are returned once. Returns {"employees": [...], "missing": [ids]}.
+    """
+    requested = list(dict.fromkeys(employee_ids))
+    found = {}
+    if read_cache.enabled:
+        for employee_id in requested:
+            cached = read_cache.lookup(employee_key(employee_id))
+            if cached is not MISSING:
+                found[employee_id] = cached
+
+    wanted = [employee_id for employee_id in requested if employee_id not in found]
+    if wanted:
+        stamp = read_cache.invalidations
+        projection = VERSIONED_PROJECTION if fields is None else employee_projection(fields, required=("employee_id",))
+        for employee in await storage.store.find_many(wanted, projection):
+            employee = versioned_employee(employee) if fields is None else employee_from_projection(employee, fields)
+            found[employee["employee_id"]] = employee
+            if fields is None and read_cache.enabled:
+                read_cache.store(employee_key(employee["employee_id"]), employee, stamp)
+
+    # Cached employees carry the version, which is only returned when selected
+    return {
+        "employees": [select_fields(found[employee_id], fields or DEFAULT_FIELDS) for employee_id in requested if employee_id in found],
+        "missing": [employee_id for employee_id in requested if employee_id not in found],
+    }
 
 # -----------------------------
 # 3. Update Existing Employee
 # -----------------------------
 
-async def update_employee(employee_id: str, updates: UpdateEmployee):
+async def update_employee(employee_id: str, updates: UpdateEmployee, if_match: Optional[List[int]] = None):
     """
     Updates fields for an existing employee.
     Only updates fields that are provided (non-null).
+    Bumps the document version in one round trip; the post-image is built from
+    the returned pre-image, which also feeds the department salary aggregates.
+    If 'if_match' is given, the update only applies to one of those versions.
     """
     update_data = {k: v for k, v in updates.model_dump().items() if v is not None}
 
@@ -76,27 +287,37 @@ async def update_employee(employee_id: str, updates: UpdateEmployee):
     if not update_data:
         raise HTTPException(status_code=400, detail="No fields provided for update")
 
-    result = await employees_collection.update_one(
-        {"employee_id": employee_id}, {"$set": update_data}
-    )
+    # Keep the search tokens in sync with the name and skills list
+    if "name" in update_data:
+        update_data["name_tokens"] = name_tokens(update_data["name"])
+    if "skills" in update_data:
+        update_data["skill_tokens"] = skill_tokens(update_data["skills"])
 
-    if result.matched_count == 0:
-        raise HTTPException(status_code=404, detail="Employee not found")
+    previous_employee = await storage.store.update_one(employee_id, update_data, versions=if_match)
 
-    updated_employee = await employees_collection.find_one({"employee_id": employee_id})
-    return employee_helper(updated_employee)
+    if previous_employee is None:
+        await raise_write_conflict(employee_id, if_match)
+
+    # Only the changed fields and the version were written, so the post-image is exact
+    updated_employee = {**previous_employee, **update_data, "version": previous_employee.get("version", 0) + 1}
+    await record_salary_change(previous_employee, updated_employee)
+    invalidate_reads(previous_employee, updated_employee)
+    return {**employee_helper(updated_employee), "version": updated_employee["version"]}
 
 # -----------------------------
 # 4. Delete Employee
 # -----------------------------
 
-async def delete_employee(employee_id: str):
+async def delete_employee(employee_id: str, if_match: Optional[List[int]] = None):
     """
     Deletes an employee based on the provided employee_id.
+    If 'if_match' is given, the delete only applies to one of those versions.
     """
-    result = await employees_collection.delete_one({"employee_id": employee_id})
-    if result.deleted_count == 0:
-        raise HTTPException(status_code=404, detail="Employee not found")
+    deleted_employee = await storage.store.delete_one(employee_id, versions=if_match)
+    if deleted_employee is None:
+        await raise_write_conflict(employee_id, if_match)
+    await record_salary_change(deleted_employee, None)
+    invalidate_reads(deleted_employee)
     return {"message": "Employee deleted successfully"}
 
 # -----------------------------
@@ -107,29 +328,48 @@ async def list_employees():
     """
     Returns a list of all employees in the database.
     """
-    employees_cursor = employees_collection.find()
     employees = []
-    async for emp in employees_cursor:
-        employees.append(employee_helper(emp))
+    async for emp in storage.store.find_all(EMPLOYEE_PROJECTION):
+        employees.append(employee_from_projection(emp))
     return employees
 
 # -----------------------------
 # 6. List Employees by Department
 # -----------------------------
 
-async def list_employees_by_department(department: str):
+async def list_employees_by_department(department: str, fields: Optional[List[str]] = None):
     """
     Returns employees from a specific department,
     sorted by joining date (newest first).
+    Departments up to CACHE_MAX_LIST_SIZE employees are served from the read cache.
+    With a sparse fieldset, a cache miss fetches only the requested fields and is not cached.
     """
-    employees_cursor = employees_collection.find(
-        {"department": department}
-    ).sort("joining_date", -1)
-
-    employees = []
-    async for emp in employees_cursor:
-        employees.append(employee_helper(emp))
-    return employees
+    async def load(projection=EMPLOYEE_PROJECTION):
+        employees = []
+        async for emp in storage.store.find_by_department(department, projection):
+            employees.append(employee_from_projection(emp, fields))
+        return employees
+
+    if fields is None:
+        return await read_cache.get_or_load(
+            department_key(department), load, cacheable=lambda employees: len(employees) <= CACHE_MAX_LIST_SIZE
+        )
+
+    # Cached listings have no version, so selecting it always reads the store
+    cached = read_cache.lookup(department_key(department)) if read_cache.enabled and "version" not in fields else MISSING
+    if cached is not MISSING:
+        return [select_fields(employee, fields) for employee in cached]
+    return await load(employee_projection(fields))
+
+async def stream_employees_by_department(department: str, batch_size: int = STREAM_BATCH_SIZE, fields: Optional[List[str]] = None):
+    """
+    Yields employees from a department one at a time, newest first.
+    The store fetches 'batch_size' documents per round trip, so memory stays
+    bounded regardless of department size. The sort is served by the
+    (department, joining_date, employee_id) index, so the first rows arrive immediately.
+    """
+    async for emp in storage.store.find_by_department(department, employee_projection(fields), batch_size=batch_size):
+        yield employee_from_projection(emp, fields)
 
 # -----------------------------
 # 7. Average Salary by Department
@@ -137,58 +377,183 @@ async def list_employees_by_department(department: str):
 
 async def average_salary_by_department():
     """
-    Uses MongoDB aggregation to calculate average salary per department.
-    Returns results sorted by department name.
-    """
-    pipeline = [
-        {"$group": {
-            "_id": "$department",
-            "avg_salary": {"$avg": "$salary"}
-        }},
-        {"$project": {
-            "department": "$_id",
-            "avg_salary": {"$round": ["$avg_salary", 2]},
-            "_id": 0
-        }},
-        {"$sort": {"department": 1}}  # Sort by department name (ascending)
-    ]
-
-    result = await employees_collection.aggregate(pipeline).to_list(length=100)
-    return result
+    Returns the average salary per department from the maintained
+    'department_stats' aggregates, so the cost is O(departments).
+    Results are sorted by department name and served from the read cache.
+    """
+    async def load():
+        result = []
+        for stats in await storage.store.list_salary_stats():
+            result.append({
+                "department": stats["_id"],
+                "avg_salary": round(stats["sum"] / stats["count"], 2),
+            })
+        return result
+
+    return await read_cache.get_or_load(AVG_SALARY_KEY, load)
 
 # -----------------------------
-# 8. Search Employees by Skill
+# 7b. Department Salary Analytics
 # -----------------------------
 
-async def search_employees_by_skill(skill: str):
+async def analytics_bucket_width(department: Optional[str], bucket_width: float) -> float:
+    """
+    Returns the smallest multiple of 'bucket_width' that keeps every department's
+    histogram within ANALYTICS_MAX_BUCKETS buckets, judged by the salary ranges in
+    the maintained aggregates. This bounds the size of the single document
+    the MongoDB aggregation returns.
     """
-    Finds employees who have a skill matching the given term (case-insensitive, whole word match).
+    widest = 0
+    for stats in await storage.store.list_salary_stats():
+        if department is None or stats["_id"] == department:
+            widest = max(widest, stats["max"] - stats["min"])
+    # A range spans at most range / width + 1 buckets, since buckets start at multiples of the width
+    if widest / bucket_width + 1 <= ANALYTICS_MAX_BUCKETS:
+        return bucket_width
+    return bucket_width * math.ceil(widest / (bucket_width * (ANALYTICS_MAX_BUCKETS - 1)))
+
+async def department_analytics(department: Optional[str] = None, joined_from: Optional[date] = None,
+                               joined_to: Optional[date] = None, bucket_width: float = ANALYTICS_BUCKET_WIDTH):
     """
-    regex_pattern = fr"\b{skill}\b"  # whole word, case-insensitive
+    Returns each department's salary distribution: headcount, min, max,
+    average, median, p90 and a fixed-width histogram, sorted by department.
+    The store computes everything in one pass over the matching employees.
+    'bucket_width' is widened if a department would otherwise get more than
+    ANALYTICS_MAX_BUCKETS buckets. Results are cached for ANALYTICS_CACHE_TTL_SECONDS and writes do not
+    invalidate them, so they may lag behind by up to that long.
+    """
+    async def load():
+        width = await analytics_bucket_width(department, bucket_width)
+        try:
+            analytics = await storage.store.compute_salary_analytics(
+                department,
+                datetime.combine(joined_from, datetime.min.time()) if joined_from else None,
+                datetime.combine(joined_to, datetime.min.time()) if joined_to else None,
+                width,
+            )
+        except AnalyticsUnavailable:
+            raise HTTPException(status_code=501, detail="Salary analytics need MongoDB 7.0 or newer")
+        result = []
+        for name in sorted(analytics):
+            stats = analytics[name]
+            result.append({
+                "department": name,
+                "headcount": stats["headcount"],
+                "min_salary": stats["min"],
+                "max_salary": stats["max"],
+                "avg_salary": round(stats["avg"], 2),
+                "median_salary": stats["median"],
+                "p90_salary": stats["p90"],
+                "histogram": [
+                    {"from": bucket, "to": bucket + width, "count": count}
+                    for bucket, count in sorted(stats["histogram"].items())
+                ],
+            })
+        return result
+
+    return await read_cache.get_or_load(
+        analytics_key(department, joined_from, joined_to, bucket_width), load, ttl=ANALYTICS_CACHE_TTL_SECONDS, ttl_only=True
+    )
 
-    employees_cursor = employees_collection.find({
-        "skills": {
-            "$elemMatch": {
-                "$regex": regex_pattern,
-                "$options": "i"  # case-insensitive
-            }
-        }
-    })
+# -----------------------------
+# 8. Search Employees by Skills
+# -----------------------------
 
-    employees = []
-    async for emp in employees_cursor:
-        employees.append(employee_helper(emp))
-    return employees
+async def search_employees_by_skills(skills: List[str], match: str = "any", page: int = 1, limit: Optional[int] = None,
+                                     fields: Optional[List[str]] = None):
+    """
+    Finds employees with skills matching the given terms (case-insensitive, whole word match).
+    'match' is "any" (OR) or "all" (AND). Terms are normalized and looked up
+    in the 'skill_tokens' index, so cost scales with the number of matches.
+    Results are sorted by employee_id; 'limit' enables page-based pagination.
+    """
+    terms = {normalize_skill(skill) for skill in skills}
+    if match == "all" and "" in terms:
+        return []  # A term without words can never match
+    terms.discard("")
+    if not terms:
+        return []
+
+    skip = (max(page, 1) - 1) * limit if limit is not None else 0
+    documents = await storage.store.find_by_skill_tokens(
+        sorted(terms), match == "all", employee_projection(fields), skip=skip, limit=limit
+    )
+    return [employee_from_projection(emp, fields) for emp in documents]
+
+async def backfill_skill_tokens(batch_size: int = 1000, retokenize: bool = False):
+    """
+    Adds 'skill_tokens' to documents written before the field existed, or with
+    'retokenize' recomputes it everywhere (after the tokenizer changes).
+    Processes documents in batches of bulk updates; safe to re-run.
+    Returns the number of documents updated.
+    """
+    return await storage.store.backfill_tokens("skill_tokens", "skills", skill_tokens, batch_size=batch_size, retokenize=retokenize)
 
+async def backfill_name_tokens(batch_size: int = 1000, retokenize: bool = False):
+    """
+    Adds 'name_tokens' to documents written before ranked search existed.
+    Same batching and 'retokenize' option as backfill_skill_tokens(); safe to re-run.
+    Returns the number of documents updated.
+    """
+    return await storage.store.backfill_tokens("name_tokens", "name", name_tokens, batch_size=batch_size, retokenize=retokenize)
+
+# -----------------------------
+# 8b. Ranked Search by Name and Skills
+# -----------------------------
+
+async def ranked_search(query: str, page: int = 1, limit: int = 20, fields: Optional[List[str]] = None) -> dict:
+    """
+    Searches names and skills for every word of 'query', tolerating unfinished
+    words (prefixes) and single typos, and returns the matches best first.
+    Each word is expanded against the cached vocabulary of indexed words and
+    looked up in the 'name_tokens' / 'skill_tokens' indexes: exact matches are
+    fetched first, expansions only if there is room left under SEARCH_MAX_RESULTS.
+    At most that many matches are ranked; 'capped' says whether more may exist.
+    Results carry a relevance 'score'; ties are ordered by employee_id.
+    """
+    terms = list(dict.fromkeys(skill_words(query)))[:SEARCH_MAX_TERMS]
+    result = {"query": query, "terms": terms, "total": 0, "capped": False, "page": page, "limit": limit, "results": []}
+    if not terms:
+        return result
+
+    vocabulary = await search_vocabulary.get(storage.store.search_vocabulary)
+    expansions = [vocabulary.expand(term) for term in terms]
+
+    candidates = {}
+    exact = [[term] for term in terms]
+    for document in await storage.store.find_by_search_tokens(exact, SEARCH_MAX_RESULTS):
+        candidates[document["employee_id"]] = document
+    expanded = [list(matches) for matches in expansions]
+    if len(candidates) < SEARCH_MAX_RESULTS and expanded != exact:
+        # The expanded lookup also finds the exact matches again; those are already held
+        for document in await storage.store.find_by_search_tokens(expanded, SEARCH_MAX_RESULTS):
+            candidates.setdefault(document["employee_id"], document)
+
+    ranked = sorted(
+        ((relevance(document, expansions), employee_id) for employee_id, document in candidates.items()),
+        key=lambda match: (-match[0], match[1]),
+    )[:SEARCH_MAX_RESULTS]
+    result["total"] = len(ranked)
+    result["capped"] = len(candidates) >= SEARCH_MAX_RESULTS
+
+    selected = ranked[(page - 1) * limit:page * limit]
+    found = await get_employees([employee_id for _, employee_id in selected], fields=fields)
+    missing = set(found["missing"])  # Deleted since the candidates were read
+    scores = [round(score, 3) for score, employee_id in selected if employee_id not in missing]
+    result["results"] = [{**employee, "score": score} for employee, score in zip(found["employees"], scores)]
+    return result
 
 # -----------------------------
 # 9. Paginated List of Employees
 # -----------------------------
 
-async def list_employees_paginated(page: int = 1, limit: int = 20):
+async def list_employees_paginated(page: int = 1, limit: int = 20, total: Optional[str] = "exact",
+                                   fields: Optional[List[str]] = None):
     """
     Returns a paginated list of employees, sorted by joining date (newest first).
     Limits are capped at 100 records per page.
+    'total' selects how the count is computed ('exact' or 'estimate'); None omits it.
+    'fields' restricts the returned fields.
     """
     if page < 1:
         page = 1
@@ -199,16 +564,267 @@ async def list_employees_paginated(page: int = 1, limit: int = 20):
 
     skip = (page - 1) * limit
 
-    cursor = employees_collection.find().sort("joining_date", -1).skip(skip).limit(limit)
-
-    items = []
-    async for emp in cursor:
-        items.append(employee_helper(emp))
+    documents = await storage.store.find_newest(employee_projection(fields), skip=skip, limit=limit)
+    items = [employee_from_projection(emp, fields) for emp in documents]
 
-    total = await employees_collection.count_documents({})
-    return {
+    result = {
         "page": page,
         "limit": limit,
-        "total": total,
         "items": items
     }
+    if total is not None:
+        result["total"] = await count_employees(total)
+    return result
+
+# -----------------------------
+# 10. Keyset (Cursor) Pagination
+# -----------------------------
+
+async def count_employees(mode: str = "exact"):
+    """
+    Counts employees for paginated responses.
+    'exact' counts the documents; 'estimate' reads collection metadata
+    in constant time and may be slightly off.
+    """
+    return await storage.store.count(estimate=mode == "estimate")
+
+def encode_cursor(employee) -> str:
+    """
+    Encodes the sort key of the last document on a page as an opaque cursor.
+    Records the BSON type of 'joining_date' since legacy documents store it as a string.
+    """
+    joining_date = employee["joining_date"]
+    if isinstance(joining_date, datetime):
+        key = ["date", joining_date.isoformat(), employee["employee_id"]]
+    else:
+        key = ["string", str(joining_date), employee["employee_id"]]
+    raw = json.dumps(key, separators=(",", ":")).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+def decode_cursor(cursor: str) -> SortKey:
+    """
+    Turns a cursor back into the sort key to seek past.
+    Raises HTTP 400 if the cursor is malformed.
+    """
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        kind, value, employee_id = json.loads(raw)
+        if not isinstance(value, str) or not isinstance(employee_id, str):
+            raise TypeError(value, employee_id)
+        if kind == "date":
+            value = datetime.fromisoformat(value)
+            if value.tzinfo is not None:
+                raise ValueError(value)  # Stored dates are naive UTC, and encode_cursor() never adds an offset
+        elif kind != "string":
+            raise ValueError(kind)
+    except (binascii.Error, ValueError, TypeError):
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+    return kind, value, employee_id
+
+async def list_employees_by_cursor(cursor: Optional[str] = None, limit: int = 20, total: Optional[str] = None,
+                                   fields: Optional[List[str]] = None):
+    """
+    Returns a page of employees, newest first, using keyset pagination.
+    Seeks on the (joining_date, employee_id) index instead of skipping,
+    so every page costs the same regardless of depth.
+    'next_cursor' is None on the last page. 'fields' restricts the returned fields.
+    """
+    limit = max(1, min(limit, 100))
+    after = decode_cursor(cursor) if cursor else None
+
+    # Fetch one extra row to learn whether another page exists
+    # The sort keys are always fetched, since the next cursor is built from them
+    projection = employee_projection(fields, required=("joining_date", "employee_id"))
+    documents = await storage.store.find_newest(projection, limit=limit + 1, after=after)
+    has_more = len(documents) > limit
+    documents = documents[:limit]
+
+    # Encode the cursor before the documents' joining_date is converted
+    next_cursor = encode_cursor(documents[-1]) if has_more else None
+    result = {
+        "limit": limit,
+        "items": [select_fields(employee_from_projection(emp, fields), fields) for emp in documents],
+        "next_cursor": next_cursor,
+    }
+    if total is not None:
+        result["total"] = await count_employees(total)
+    return result
+
+# -----------------------------
+# 11. Bulk Insert Employees
+# -----------------------------
+
+def validate_employee_row(index: int, row: Union[dict, bytes, str]) -> Union[Employee, dict]:
+    """
+    Validates one bulk row (a parsed dict or a raw JSON line) against the Employee model.
+    Returns the Employee, or an "invalid" result row with the validation errors.
+    """
+    try:
+        if isinstance(row, (bytes, str)):
+            return Employee.model_validate_json(row)
+        return Employee.model_validate(row)
+    except ValidationError as e:
+        return {
+            "index": index,
+            "employee_id": row.get("employee_id") if isinstance(row, dict) else None,
+            "status": "invalid",
+            "detail": e.errors(include_url=False, include_context=False, include_input=False),
+        }
+
+async def insert_employee_batch(rows: List[Tuple[int, Employee]]) -> List[dict]:
+    """
+    Writes one batch of (index, Employee) pairs with an unordered insert_many.
+    Relies on the unique 'employee_id' constraint to reject duplicates, so no
+    pre-check query is needed. Returns one result per row.
+    """
+    if not rows:
+        return []
+
+    documents = [employee_to_document(employee) for _, employee in rows]
+    failures = await storage.store.insert_many(documents)
+
+    created = [doc for position, doc in enumerate(documents) if position not in failures]
+    await record_salaries_added(created)
+    invalidate_reads(*created)
+
+    results = []
+    for position, (index, employee) in enumerate(rows):
+        failure = failures.get(position)
+        if failure is None:
+            results.append({"index": index, "employee_id": employee.employee_id, "status": "created"})
+        else:
+            status, detail = failure
+            results.append({"index": index, "employee_id": employee.employee_id, "status": status, "detail": detail})
+    return results
+
+def summarize_bulk_results(results: List[dict]) -> dict:
+    """
+    Builds the bulk ingest response: per-status counts plus per-row results.
+    """
+    summary = {"created": 0, "duplicate": 0, "invalid": 0, "error": 0}
+    for row in results:
+        summary[row["status"]] += 1
+    return {**summary, "results": results}
+
+async def bulk_create_employees(rows: AsyncIterable[Tuple[int, Union[dict, bytes]]], batch_size: int = BULK_BATCH_SIZE):
+    """
+    Validates incoming rows and inserts them in batches of 'batch_size'.
+    Rows may be parsed dicts or raw JSON lines. Invalid rows are reported
+    without being sent to the store. Results are returned in input order.
+    """
+    results = []
+    batch = []
+
+    async for index, row in rows:
+        employee = validate_employee_row(index, row)
+        if isinstance(employee, dict):
+            results.append(employee)
+            continue
+
+        batch.append((index, employee))
+        if len(batch) >= batch_size:
+            results.extend(await insert_employee_batch(batch))
+            batch = []
+
+    results.extend(await insert_employee_batch(batch))
+    results.sort(key=lambda r: r["index"])
+    return summarize_bulk_results(results)
+
+# -----------------------------
+# 12. Department Salary Aggregates
+# -----------------------------
+
+async def record_salaries_added(documents: List[dict]):
+    """
+    Folds newly inserted employees into the per-department aggregates.
+    Rows are grouped first, so a batch costs one update per department.
+    """
+    groups = {}
+    for doc in documents:
+        stats = groups.setdefault(doc["department"], {"count": 0, "sum": 0, "min": doc["salary"], "max": doc["salary"]})
+        stats["count"] += 1
+        stats["sum"] += doc["salary"]
+        stats["min"] = min(stats["min"], doc["salary"])
+        stats["max"] = max(stats["max"], doc["salary"])
+
+    await storage.store.add_salary_stats(groups)
+
+async def refresh_department_stats(department: str, stats: Optional[dict]):
+    """
+    Recomputes one department's min and max from its employees.
+    Used when a removed salary was the department's min or max, which
+    cannot be undone incrementally. Served by the department index.
+    'count' and 'sum' stay incremental: the new bounds are only written if
+    no other write changed the aggregate ('stats', read before the recount)
+    in the meantime, otherwise the recount starts over from the newer version.
+    """
+    for _ in range(SALARY_RECOUNT_ATTEMPTS):
+        if stats is None:
+            return
+        computed = (await storage.store.compute_salary_stats(department)).get(department)
+        if await storage.store.reset_salary_bounds(department, computed, stats.get("version")):
+            return
+        stats = await storage.store.find_salary_stats(department)
+
+async def record_salary_change(before: Optional[dict], after: Optional[dict]):
+    """
+    Applies one employee write to the department aggregates.
+    'before' is the pre-image (None on create), 'after' the post-image (None on delete).
+    Handles salary changes and department moves.
+    """
+    if before and after and before["department"] == after["department"] and before["salary"] == after["salary"]:
+        return
+
+    if after:
+        await record_salaries_added([after])
+
+    if before:
+        stats = await storage.store.remove_salary(before["department"], before["salary"])
+        # Removing the min, the max or the last employee needs a recount
+        if stats is not None and (stats["count"] <= 0 or before["salary"] <= stats["min"] or before["salary"] >= stats["max"]):
+            await refresh_department_stats(before["department"], stats)
+
+async def compute_department_stats() -> dict:
+    """
+    Computes the aggregates for every department from scratch.
+    """
+    return await storage.store.compute_salary_stats()
+
+async def rebuild_department_stats() -> int:
+    """
+    Replaces the maintained aggregates with freshly computed ones.
+    Returns the number of departments.
+    """
+    expected = await compute_department_stats()
+    await storage.store.replace_salary_stats(expected)
+    read_cache.invalidate(AVG_SALARY_KEY)
+    return len(expected)
+
+async def verify_department_stats() -> List[dict]:
+    """
+    Compares the maintained aggregates against a fresh computation.
+    Returns one entry per department that differs; an empty list means they agree.
+    """
+    expected = await compute_department_stats()
+    actual = {stats["_id"]: stats for stats in await storage.store.list_salary_stats()}
+
+    mismatches = []
+    for department in sorted(set(expected) | set(actual)):
+        want = expected.get(department)
+        have = actual.get(department)
+        if want is None or have is None or any(
+            abs(want[field] - have[field]) > 1e-6 * max(1, abs(want[field]))  # Tolerate float drift in 'sum'
+            for field in ("count", "sum", "min", "max")
+        ):
+            mismatches.append({"department": department, "expected": want, "actual": have})
+    return mismatches
+
+async def ensure_department_stats() -> bool:
+    """
+    Builds the aggregates on first start against an existing employees collection.
+    Must run before any write is served (see main.lifespan). Returns True if it built them.
+    """
+    if not await storage.store.has_salary_stats() and await storage.store.count(estimate=True):
+        await rebuild_department_stats()
+        return True
+    return False
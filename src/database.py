@@ -1,6 +1,11 @@
 from motor.motor_asyncio import AsyncIOMotorClient
+from pymongo.errors import CollectionInvalid, OperationFailure
+from typing import Callable, Dict, List, Optional
+import asyncio
 import os 
 from dotenv import load_dotenv
+from metrics import METRICS_ENABLED, mongo_listeners
+from admission import ADMISSION_ENABLED, pool_saturation
 
 # Load environment variables from .env file
 load_dotenv()
@@ -8,25 +13,144 @@ load_dotenv()
 # MongoDB connection URL
 MONGO_URL = os.getenv("MONGO_URL")
 
-# Initialize MongoDB client
-client = AsyncIOMotorClient(MONGO_URL)
+# -----------------------------
+# Connection Pool Settings
+# -----------------------------
+# Each worker process owns one client, so the server sees up to
+# (workers x MONGO_MAX_POOL_SIZE) connections.
+MONGO_MAX_POOL_SIZE = int(os.getenv("MONGO_MAX_POOL_SIZE", "100"))
+MONGO_MIN_POOL_SIZE = int(os.getenv("MONGO_MIN_POOL_SIZE", "0"))
+MONGO_WAIT_QUEUE_TIMEOUT_MS = os.getenv("MONGO_WAIT_QUEUE_TIMEOUT_MS")  # Unset: wait indefinitely for a pooled connection
+MONGO_COMPRESSORS = os.getenv("MONGO_COMPRESSORS", "")  # e.g. "zstd,snappy,zlib" (zstd/snappy need extra packages)
+
+# Finished import jobs are removed by a TTL index after this many seconds
+IMPORT_JOB_RETENTION_SECONDS = int(os.getenv("IMPORT_JOB_RETENTION_SECONDS", str(7 * 24 * 3600)))
+
+# Record pre-images of employee writes, so change events for deletes and
+# department moves carry the old department (MongoDB 6.0+ replica sets)
+CHANGE_STREAM_PRE_IMAGES = os.getenv("CHANGE_STREAM_PRE_IMAGES", "true").lower() == "true"
+
+# -----------------------------
+# Client Lifecycle
+# -----------------------------
+# The client is created by connect() inside the application lifespan, so every
+# worker process gets its own client (and pool) after fork instead of sharing one.
+
+client: Optional[AsyncIOMotorClient] = None
 
 # Reference to the specific database
-db = client.assessment_db
+db = None
 
 # Reference to the 'employees' collection
-employees_collection = db.employees
+employees_collection = None
+
+# Reference to the 'department_stats' collection (running salary aggregates per department)
+department_stats_collection = None
+
+# Reference to the 'import_jobs' collection (status, progress and row errors of import jobs)
+import_jobs_collection = None
+
+def client_options() -> dict:
+    """
+    Builds the MongoClient keyword arguments from the pool settings.
+    Attaches the command and pool listeners that feed /metrics, and the
+    pool listener admission control watches for saturation.
+    """
+    options = {
+        "maxPoolSize": MONGO_MAX_POOL_SIZE,
+        "minPoolSize": MONGO_MIN_POOL_SIZE,
+    }
+    if MONGO_WAIT_QUEUE_TIMEOUT_MS:
+        options["waitQueueTimeoutMS"] = int(MONGO_WAIT_QUEUE_TIMEOUT_MS)
+    if MONGO_COMPRESSORS:
+        options["compressors"] = MONGO_COMPRESSORS
+    listeners = mongo_listeners(MONGO_MAX_POOL_SIZE) if METRICS_ENABLED else []
+    if ADMISSION_ENABLED:
+        listeners.append(pool_saturation)
+    if listeners:
+        options["event_listeners"] = listeners
+    return options
+
+def connect():
+    """
+    Creates the MongoDB client for this process and binds the collection references.
+    Does nothing if the process is already connected.
+    """
+    global client, db, employees_collection, department_stats_collection, import_jobs_collection
+    if client is not None:
+        return
+    client = AsyncIOMotorClient(MONGO_URL, **client_options())
+    db = client.assessment_db
+    employees_collection = db.employees
+    department_stats_collection = db.department_stats
+    import_jobs_collection = db.import_jobs
+
+def close():
+    """
+    Closes this process's MongoDB client and its pooled connections.
+    """
+    global client, db, employees_collection, department_stats_collection, import_jobs_collection
+    if client is not None:
+        client.close()
+    client = db = employees_collection = department_stats_collection = import_jobs_collection = None
 
 # -----------------------------
-# Index Creation
+# Index Registry
 # -----------------------------
 
-async def create_indexes():
+# Declarative registry of the indexes the query paths rely on; startup DDL and
+# 'manage.py indexes' reconcile the live collection against it.
+# 'critical' indexes enforce correctness and must exist before the app serves
+# traffic; the others only affect performance.
+EMPLOYEE_INDEXES = [
+    {"name": "employee_id_1", "keys": [("employee_id", 1)], "unique": True, "critical": True,
+     "purpose": "Unique employee IDs; lookups, writes and duplicate detection"},
+    {"name": "joining_date_employee_id", "keys": [("joining_date", -1), ("employee_id", -1)],
+     "purpose": "Newest-first pagination (page and cursor)"},
+    {"name": "department_joining_date", "keys": [("department", 1), ("joining_date", -1), ("employee_id", -1)],
+     "purpose": "Department listings sorted by joining date; per-department salary stats"},
+    {"name": "skill_tokens_employee_id", "keys": [("skill_tokens", 1), ("employee_id", 1)],
+     "purpose": "Multikey skill search sorted by employee ID"},
+    {"name": "name_tokens_employee_id", "keys": [("name_tokens", 1), ("employee_id", 1)],
+     "purpose": "Multikey name words for ranked search"},
+]
+
+def index_matches(existing: dict, spec: dict) -> bool:
+    """
+    Checks whether an index returned by index_information() matches a spec.
+    """
+    keys = [(field, int(direction)) for field, direction in existing["key"]]
+    return keys == spec["keys"] and existing.get("unique", False) == spec.get("unique", False)
+
+async def create_indexes(critical_only: bool = False) -> List[str]:
+    """
+    Creates the indexes in EMPLOYEE_INDEXES that are missing.
+    Existing indexes are read first, so a warm start sends no createIndexes commands.
+    Returns the names of the indexes that were created.
+    """
+    existing = await employees_collection.index_information()
+    created = []
+    for spec in EMPLOYEE_INDEXES:
+        if critical_only and not spec.get("critical"):
+            continue
+        if spec["name"] in existing and index_matches(existing[spec["name"]], spec):
+            continue
+        await employees_collection.create_index(spec["keys"], name=spec["name"], unique=spec.get("unique", False))
+        created.append(spec["name"])
+    return created
+
+async def create_import_job_indexes() -> List[str]:
     """
-    Creates a unique index on the 'employee_id' field
-    to ensure no duplicate employee IDs are inserted.
+    Creates the TTL index that expires finished import jobs, if it is missing.
+    Returns the names of the indexes that were created.
     """
-    await employees_collection.create_index("employee_id", unique=True)
+    existing = await import_jobs_collection.index_information()
+    if "finished_at_ttl" in existing:
+        return []
+    await import_jobs_collection.create_index(
+        [("finished_at", 1)], name="finished_at_ttl", expireAfterSeconds=IMPORT_JOB_RETENTION_SECONDS
+    )
+    return ["finished_at_ttl"]
 
 # -----------------------------
 # JSON Schema Validator for Employee Documents
@@ -41,11 +165,20 @@ employee_schema = {
         "name": {"bsonType": "string"},                 # Employee's full name
         "department": {"bsonType": "string"},           # Department name
         "salary": {"bsonType": "double"},               # Salary (must be a floating point number)
-        "joining_date": {"bsonType": ["date", "string"]},  # Joining date (date or ISO string)
+        "joining_date": {"bsonType": ["date", "string"]},  # Joining date (date, or a legacy ISO string until migrated)
         "skills": {                                     # List of skills
             "bsonType": "array",
             "items": {"bsonType": "string"}
-        }
+        },
+        "name_tokens": {                                # Lowercase name words for ranked search
+            "bsonType": "array",
+            "items": {"bsonType": "string"}
+        },
+        "skill_tokens": {                               # Normalized skill phrases for indexed search
+            "bsonType": "array",
+            "items": {"bsonType": "string"}
+        },
+        "version": {"bsonType": ["int", "long"]}        # Optimistic-concurrency version (absent on legacy documents)
     }
 }
 
@@ -53,19 +186,191 @@ employee_schema = {
 # Collection Validator Setup
 # -----------------------------
 
-async def ensure_collection_validator():
+EMPLOYEE_VALIDATOR = {"$jsonSchema": employee_schema}
+# Applied only once 'manage.py migrate-joining-dates' (or 'indexes apply') finds no string joining dates left
+STRICT_EMPLOYEE_VALIDATOR = {"$jsonSchema": {
+    **employee_schema,
+    "properties": {**employee_schema["properties"], "joining_date": {"bsonType": "date"}},
+}}
+VALIDATION_LEVEL = "moderate"  # Documents must conform to the schema if provided
+
+async def collection_options() -> Optional[dict]:
     """
-    Ensures that the 'employees' collection has a JSON schema validator.
-    If the collection already exists, attempts to modify it with the schema.
-    If it doesn't exist, creates the collection with the schema validator.
+    Returns the 'employees' collection options, or None if the collection does not exist.
     """
-    cmd = {
-        "collMod": "employees",  # Attempt to modify the existing collection
-        "validator": {"$jsonSchema": employee_schema},
-        "validationLevel": "moderate"  # Documents must conform to the schema if provided
-    }
+    cursor = await db.list_collections(filter={"name": "employees"})
+    collections = await cursor.to_list(length=1)
+    return collections[0].get("options", {}) if collections else None
+
+def validator_in_sync(options: dict, strict: bool = False) -> bool:
+    """
+    Checks whether collection options carry the expected validator and level.
+    The strict validator always counts as in sync, so startup never loosens it again.
+    """
+    validators = [STRICT_EMPLOYEE_VALIDATOR] if strict else [STRICT_EMPLOYEE_VALIDATOR, EMPLOYEE_VALIDATOR]
+    return options.get("validator") in validators and options.get("validationLevel", "strict") == VALIDATION_LEVEL
+
+async def ensure_collection_validator(strict: bool = False) -> str:
+    """
+    Ensures that the 'employees' collection has the JSON schema validator.
+    'strict' applies the dates-only validator; callers must first check that
+    no string joining dates remain.
+    Reads the current collection options first and only issues DDL on drift:
+    creates the collection if it is missing, or runs collMod if the validator differs.
+    Returns "created", "updated" or "unchanged".
+    """
+    validator = STRICT_EMPLOYEE_VALIDATOR if strict else EMPLOYEE_VALIDATOR
+    options = await collection_options()
+
+    if options is None:
+        try:
+            await db.create_collection("employees", validator=validator, validationLevel=VALIDATION_LEVEL)
+            return "created"
+        except CollectionInvalid:
+            # Another worker created it first; fall through to the drift check
+            return await ensure_collection_validator(strict)
+
+    if validator_in_sync(options, strict):
+        return "unchanged"
+
+    await db.command({
+        "collMod": "employees",
+        "validator": validator,
+        "validationLevel": VALIDATION_LEVEL
+    })
+    return "updated"
+
+async def ensure_change_stream_pre_images() -> str:
+    """
+    Turns on pre-image recording for the 'employees' collection when
+    CHANGE_STREAM_PRE_IMAGES is set and it is off.
+    Returns "enabled", "unchanged", "disabled" or "unsupported" (the server refused,
+    e.g. a standalone server or one older than 6.0).
+    """
+    if not CHANGE_STREAM_PRE_IMAGES:
+        return "disabled"
+    options = await collection_options() or {}
+    if options.get("changeStreamPreAndPostImages", {}).get("enabled"):
+        return "unchanged"
+    try:
+        await db.command({"collMod": "employees", "changeStreamPreAndPostImages": {"enabled": True}})
+    except OperationFailure:
+        return "unsupported"
+    return "enabled"
+
+# -----------------------------
+# Index Reconciliation
+# -----------------------------
+# Used by 'manage.py indexes' to roll out index changes without blocking startup.
+
+async def index_status() -> List[dict]:
+    """
+    Diffs EMPLOYEE_INDEXES against the live collection.
+    Returns one row per index with its status:
+    "ok", "missing", "differs" (same name, other definition), "hidden",
+    "extra" (not in the registry) or "extra, hidden"; "_id_" is "builtin".
+    'hidden' tells whether the live index is hidden from the query planner.
+    """
+    existing = await employees_collection.index_information()
+    registry = {spec["name"]: spec for spec in EMPLOYEE_INDEXES}
+    rows = []
+
+    for spec in EMPLOYEE_INDEXES:
+        live = existing.get(spec["name"])
+        if live is None:
+            status = "missing"
+        elif not index_matches(live, spec):
+            status = "differs"
+        elif live.get("hidden"):
+            status = "hidden"
+        else:
+            status = "ok"
+        rows.append({
+            "name": spec["name"], "keys": spec["keys"], "status": status,
+            "hidden": bool(live and live.get("hidden")), "purpose": spec.get("purpose", ""),
+        })
+
+    for name, live in existing.items():
+        if name in registry:
+            continue
+        if name == "_id_":
+            status = "builtin"
+        else:
+            status = "extra, hidden" if live.get("hidden") else "extra"
+        rows.append({
+            "name": name, "keys": [(field, direction) for field, direction in live["key"]], "status": status,
+            "hidden": bool(live.get("hidden")), "purpose": "",
+        })
+    return rows
+
+async def index_sizes() -> Dict[str, int]:
+    """
+    Returns the on-disk size in bytes of each index (summed across shards).
+    """
+    sizes = {}
+    async for stats in employees_collection.aggregate([{"$collStats": {"storageStats": {}}}]):
+        for name, size in stats["storageStats"].get("indexSizes", {}).items():
+            sizes[name] = sizes.get(name, 0) + size
+    return sizes
+
+async def index_usage() -> Dict[str, dict]:
+    """
+    Returns how often each index was used since the server started tracking it:
+    {name: {"ops": count, "since": datetime}}.
+    """
+    usage = {}
+    async for stats in employees_collection.aggregate([{"$indexStats": {}}]):
+        entry = usage.setdefault(stats["name"], {"ops": 0, "since": stats["accesses"]["since"]})
+        entry["ops"] += stats["accesses"]["ops"]
+        entry["since"] = min(entry["since"], stats["accesses"]["since"])
+    return usage
+
+async def index_build_progress() -> Optional[dict]:
+    """
+    Reads the progress of an index build on the employees collection from $currentOp.
+    Returns {"message", "done", "total"}, or None if no progress is reported
+    (or the user may not run $currentOp).
+    """
+    namespace = f"{db.name}.{employees_collection.name}"
+    pipeline = [
+        {"$currentOp": {"allUsers": True}},
+        {"$match": {"ns": namespace, "progress": {"$exists": True}}},
+    ]
     try:
-        await db.command(cmd)
-    except Exception:
-        # If the collection doesn't exist, create it with the schema validator
-        await db.create_collection("employees", validator={"$jsonSchema": employee_schema})
+        async for op in client.admin.aggregate(pipeline):
+            return {"message": op.get("msg", ""), "done": op["progress"].get("done"), "total": op["progress"].get("total")}
+    except OperationFailure:
+        pass
+    return None
+
+async def build_index(spec: dict, on_progress: Optional[Callable[[Optional[dict]], None]] = None,
+                      interval: float = 5.0):
+    """
+    Creates one registry index and waits for the build to finish.
+    The server builds it without blocking reads and writes (locks are only
+    taken briefly at the start and end); 'on_progress' receives
+    index_build_progress() every 'interval' seconds meanwhile.
+    """
+    build = asyncio.ensure_future(
+        employees_collection.create_index(spec["keys"], name=spec["name"], unique=spec.get("unique", False))
+    )
+    while True:
+        done, _ = await asyncio.wait({build}, timeout=interval)
+        if done:
+            return build.result()
+        if on_progress is not None:
+            on_progress(await index_build_progress())
+
+async def set_index_hidden(name: str, hidden: bool = True):
+    """
+    Hides an index from the query planner (or unhides it). A hidden index is
+    still maintained on writes, so unhiding it is instant; hide an index before
+    dropping it to confirm that nothing depends on it.
+    """
+    await db.command({"collMod": employees_collection.name, "index": {"name": name, "hidden": hidden}})
+
+async def drop_index(name: str):
+    """
+    Drops an index from the employees collection.
+    """
+    await employees_collection.drop_index(name)
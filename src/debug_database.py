@@ -1,7 +1,12 @@
 import asyncio
-from database import employees_collection  # Assume Motor collection instance
+import crud
+import database
+import storage
+from models import Employee
 
 async def test_connection():
+    storage.open_store("mongo")
+    employees_collection = database.employees_collection  # Motor collection instance
     try:
         # Try finding one document to check connection
         employee = await employees_collection.find_one()
@@ -252,11 +257,19 @@ async def test_connection():
         ]
 
 
-        result = await employees_collection.insert_many(employees)
+        # Build the documents the API would store (BSON dates, double salaries, search tokens, version)
+        documents = [crud.employee_to_document(Employee(**employee)) for employee in employees]
+        result = await employees_collection.insert_many(documents)
         print(f"Inserted document IDs: {result.inserted_ids}")
 
+        # The raw insert bypasses the maintained aggregates, so recompute them
+        departments = await crud.rebuild_department_stats()
+        print(f"Rebuilt salary aggregates for {departments} departments")
+
     except Exception as e:
         print("Error during MongoDB operation:", e)
+    finally:
+        storage.close_store()
 
 if __name__ == "__main__":
     asyncio.run(test_connection())
@@ -0,0 +1,384 @@
+from bson import ObjectId
+from datetime import datetime, timezone
+from dotenv import load_dotenv
+from fastapi import HTTPException, status
+from typing import AsyncIterable, Iterator, List, Optional, Tuple, Union
+import asyncio
+import csv
+import logging
+import os
+import tempfile
+import time
+
+import crud
+import storage
+from models import Employee
+
+# Load environment variables from .env file
+load_dotenv()
+
+logger = logging.getLogger(__name__)
+
+# -----------------------------
+# Configuration Constants
+# -----------------------------
+IMPORT_WORKERS = int(os.getenv("IMPORT_WORKERS", "1"))  # Jobs run at once per worker process
+IMPORT_QUEUE_SIZE = int(os.getenv("IMPORT_QUEUE_SIZE", "8"))  # Jobs allowed to wait per process; more are refused
+IMPORT_BATCH_SIZE = int(os.getenv("IMPORT_BATCH_SIZE", "500"))  # Rows validated and inserted per step
+IMPORT_ROWS_PER_SECOND = float(os.getenv("IMPORT_ROWS_PER_SECOND", "0"))  # Per-job pacing (0 = unlimited)
+IMPORT_MAX_BYTES = int(os.getenv("IMPORT_MAX_BYTES", str(100 * 1024 * 1024)))  # Largest accepted upload
+IMPORT_MAX_ERRORS = int(os.getenv("IMPORT_MAX_ERRORS", "1000"))  # Row errors kept per job (all are counted)
+IMPORT_SPOOL_DIR = os.getenv("IMPORT_SPOOL_DIR") or None  # Where uploads wait for a worker (default: system temp dir)
+
+# Upload content types and the format each one selects
+IMPORT_FORMATS = {
+    "text/csv": "csv",
+    "application/x-ndjson": "ndjson",
+    "application/ndjson": "ndjson",
+    "application/jsonl": "ndjson",
+}
+
+# CSV columns read into the Employee model; others (e.g. 'version' in exports) are ignored
+IMPORT_FIELDS = list(Employee.model_fields)
+
+# Timestamps reported for a job
+JOB_TIMES = ("created_at", "started_at", "finished_at", "updated_at")
+
+class ImportFormatError(Exception):
+    """
+    Raised when an upload cannot be read as the declared format at all.
+    """
+
+# -----------------------------
+# Row Readers
+# -----------------------------
+# Both run in a worker thread and yield (line, row) pairs, where 'line' is the
+# row's line number in the file (1-based) so errors point at the right place.
+
+class CountingFile:
+    """
+    Iterates over a binary file's lines, counting the bytes consumed.
+    """
+
+    def __init__(self, file):
+        self.file = file
+        self.bytes_read = 0
+
+    def __iter__(self) -> Iterator[bytes]:
+        for line in self.file:
+            self.bytes_read += len(line)
+            yield line
+
+def ndjson_rows(lines: Iterator[bytes]) -> Iterator[Tuple[int, bytes]]:
+    """
+    Yields each non-blank line as a raw JSON document.
+    """
+    for number, line in enumerate(lines, start=1):
+        if number == 1:
+            line = line.removeprefix(b"\xef\xbb\xbf")  # UTF-8 byte order mark
+        if line.strip():
+            yield number, line
+
+def csv_rows(lines: Iterator[bytes]) -> Iterator[Tuple[int, dict]]:
+    """
+    Yields each CSV record as an Employee-shaped dict, in the layout of the
+    CSV export: a header row, and skills joined with ';'. Empty cells are left
+    out, so the model reports them as missing. Quoted cells may span lines.
+    """
+    text = (line.decode("utf-8-sig" if number == 0 else "utf-8") for number, line in enumerate(lines))
+    reader = csv.DictReader(text)
+    missing = [field for field in IMPORT_FIELDS if field not in (reader.fieldnames or ())]
+    if missing:
+        raise ImportFormatError(f"CSV header is missing columns: {', '.join(missing)}")
+
+    start = reader.line_num + 1
+    for record in reader:
+        row = {}
+        for field in IMPORT_FIELDS:
+            value = (record.get(field) or "").strip()
+            if field == "skills":
+                row[field] = [skill.strip() for skill in value.split(";") if skill.strip()]
+            elif value:
+                row[field] = value
+        yield start, row
+        start = reader.line_num + 1
+
+def read_chunk(rows: Iterator[Tuple[int, Union[dict, bytes]]], size: int) -> Tuple[List[Tuple[int, Employee]], List[dict], bool]:
+    """
+    Reads and validates up to 'size' rows.
+    Returns the valid (line, Employee) pairs, the invalid rows' results and
+    whether the file is exhausted.
+    """
+    valid, invalid = [], []
+    for line, row in rows:
+        employee = crud.validate_employee_row(line, row)
+        if isinstance(employee, Employee):
+            valid.append((line, employee))
+        else:
+            invalid.append(employee)
+        if len(valid) + len(invalid) >= size:
+            return valid, invalid, False
+    return valid, invalid, True
+
+def row_error(result: dict) -> dict:
+    """
+    Converts a bulk result row into a job error entry.
+    """
+    return {
+        "line": result["index"],
+        "employee_id": result.get("employee_id"),
+        "status": result["status"],
+        "detail": result.get("detail"),
+    }
+
+def utcnow() -> datetime:
+    """
+    Returns the current time in UTC, truncated to BSON's millisecond precision.
+    """
+    now = datetime.now(timezone.utc)
+    return now.replace(microsecond=now.microsecond // 1000 * 1000)
+
+def job_view(job: dict) -> dict:
+    """
+    Formats a stored job for the API, with timestamps as ISO strings in UTC.
+    MongoDB returns naive UTC datetimes, the memory store aware ones.
+    """
+    for field in JOB_TIMES:
+        value = job.get(field)
+        if isinstance(value, datetime):
+            value = value.replace(tzinfo=timezone.utc) if value.tzinfo is None else value.astimezone(timezone.utc)
+            job[field] = value.isoformat(timespec="milliseconds")
+    return job
+
+# -----------------------------
+# Upload Spooling
+# -----------------------------
+
+async def spool_upload(chunks: AsyncIterable[bytes], max_bytes: int = IMPORT_MAX_BYTES) -> Tuple[str, int]:
+    """
+    Writes an upload to a temporary file as it streams in, so the request
+    finishes as soon as the body is received. Raises HTTP 413 past 'max_bytes'.
+    Returns the file's path and size.
+    """
+    spool = tempfile.NamedTemporaryFile(prefix="employee-import-", dir=IMPORT_SPOOL_DIR, delete=False)
+    size = 0
+    try:
+        with spool:
+            async for chunk in chunks:
+                size += len(chunk)
+                if size > max_bytes:
+                    raise HTTPException(status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+                                        detail=f"Import files are limited to {max_bytes} bytes")
+                spool.write(chunk)
+    except BaseException:
+        os.unlink(spool.name)
+        raise
+    return spool.name, size
+
+def remove_spool(path: str):
+    """
+    Deletes a spooled upload, if it still exists.
+    """
+    try:
+        os.unlink(path)
+    except FileNotFoundError:
+        pass
+
+# -----------------------------
+# Import Runner
+# -----------------------------
+
+class ImportRunner:
+    """
+    Runs import jobs in the background of one worker process.
+    Jobs wait in a bounded queue and at most 'workers' run at once; each
+    reads its file in chunks of 'batch_size' rows, validates them in a thread
+    and writes them with one insert_many, so the event loop keeps serving
+    interactive requests between steps. Job state lives in the store, so any
+    worker process can answer progress polls. Jobs do not survive a restart:
+    on shutdown, running and queued jobs are marked "interrupted".
+    """
+
+    def __init__(self, workers: int = IMPORT_WORKERS, queue_size: int = IMPORT_QUEUE_SIZE,
+                 batch_size: int = IMPORT_BATCH_SIZE, rows_per_second: float = IMPORT_ROWS_PER_SECOND,
+                 max_errors: int = IMPORT_MAX_ERRORS):
+        self.workers = workers
+        self.queue_size = queue_size
+        self.batch_size = batch_size
+        self.rows_per_second = rows_per_second
+        self.max_errors = max_errors
+        self.queue: Optional[asyncio.Queue] = None
+        self.tasks: List[asyncio.Task] = []
+
+    def start(self):
+        """
+        Starts the worker tasks; called from the application lifespan.
+        """
+        if self.tasks:
+            return
+        self.queue = asyncio.Queue(maxsize=self.queue_size)
+        loop = asyncio.get_running_loop()
+        self.tasks = [loop.create_task(self.work()) for _ in range(self.workers)]
+
+    async def stop(self):
+        """
+        Cancels the workers and marks every unfinished job "interrupted".
+        """
+        for task in self.tasks:
+            task.cancel()
+        await asyncio.gather(*self.tasks, return_exceptions=True)
+        self.tasks = []
+        while self.queue is not None and not self.queue.empty():
+            job_id, path = self.queue.get_nowait()
+            remove_spool(path)
+            await self.finish(job_id, "interrupted", "The server shut down before the job started")
+
+    def ensure_capacity(self):
+        """
+        Raises HTTP 503 when the queue is full, so uploads can be refused before they are read.
+        """
+        if self.queue is None or self.queue.full():
+            raise HTTPException(
+                status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+                detail="Too many imports are waiting, try again later",
+                headers={"Retry-After": "30"},
+            )
+
+    async def submit(self, path: str, size: int, file_format: str, submitted_by: Optional[str] = None) -> dict:
+        """
+        Records a new job for a spooled upload and queues it.
+        Raises HTTP 503 when the queue is full; the upload is discarded then.
+        """
+        try:
+            self.ensure_capacity()
+        except HTTPException:
+            remove_spool(path)
+            raise
+        now = utcnow()
+        job = {
+            "job_id": str(ObjectId()),
+            "status": "queued",
+            "format": file_format,
+            "submitted_by": submitted_by,
+            "bytes_total": size,
+            "bytes_read": 0,
+            "progress": 0.0,
+            "rows": 0,
+            "created": 0,
+            "duplicate": 0,
+            "invalid": 0,
+            "error": 0,
+            "detail": None,
+            "created_at": now,
+            "started_at": None,
+            "finished_at": None,
+            "updated_at": now,
+        }
+        await storage.store.insert_import_job(dict(job))
+        self.queue.put_nowait((job["job_id"], path))
+        return job_view(job)
+
+    async def work(self):
+        """
+        Worker loop: runs queued jobs one at a time.
+        """
+        while True:
+            job_id, path = await self.queue.get()
+            try:
+                await self.run(job_id, path)
+            except Exception:
+                # The job's status could not be recorded (e.g. the store is down); keep serving the queue
+                logger.exception("Import job %s could not be recorded", job_id)
+            finally:
+                remove_spool(path)
+                self.queue.task_done()
+
+    async def finish(self, job_id: str, final_status: str, detail: Optional[str] = None, changes: Optional[dict] = None):
+        """
+        Records a job's final status.
+        """
+        now = utcnow()
+        await storage.store.update_import_job(job_id, {
+            **(changes or {}), "status": final_status, "detail": detail, "finished_at": now, "updated_at": now,
+        })
+
+    async def run(self, job_id: str, path: str):
+        """
+        Imports one spooled file, recording progress and row errors after every batch.
+        """
+        job = await storage.store.find_import_job(job_id)
+        if job is None:
+            return  # Expired or pruned while queued
+        started = time.monotonic()
+        counts = {"rows": 0, "created": 0, "duplicate": 0, "invalid": 0, "error": 0}
+        await storage.store.update_import_job(job_id, {"status": "running", "started_at": utcnow(), "updated_at": utcnow()})
+
+        try:
+            with open(path, "rb") as file:
+                counter = CountingFile(file)
+                rows = csv_rows(iter(counter)) if job["format"] == "csv" else ndjson_rows(iter(counter))
+                exhausted = False
+                while not exhausted:
+                    valid, invalid, exhausted = await asyncio.to_thread(read_chunk, rows, self.batch_size)
+                    results = invalid + await crud.insert_employee_batch(valid)
+                    results.sort(key=lambda result: result["index"])
+
+                    counts["rows"] += len(results)
+                    for result in results:
+                        counts[result["status"]] += 1
+                    errors = [row_error(result) for result in results if result["status"] != "created"]
+                    progress = round(counter.bytes_read / job["bytes_total"], 4) if job["bytes_total"] else 1.0
+                    await storage.store.update_import_job(job_id, {
+                        **counts, "bytes_read": counter.bytes_read, "progress": progress, "updated_at": utcnow(),
+                    }, errors=errors, max_errors=self.max_errors)
+
+                    if self.rows_per_second > 0:
+                        ahead = counts["rows"] / self.rows_per_second - (time.monotonic() - started)
+                        if ahead > 0:
+                            await asyncio.sleep(ahead)
+        except asyncio.CancelledError:
+            await self.finish(job_id, "interrupted", "The server shut down while the job was running")
+            raise
+        except (ImportFormatError, UnicodeDecodeError) as e:
+            await self.finish(job_id, "failed", f"Unreadable {job['format']} file: {e}")
+        except Exception as e:
+            logger.exception("Import job %s failed", job_id)
+            await self.finish(job_id, "failed", f"Import stopped after {counts['rows']} rows: {e}")
+        else:
+            await self.finish(job_id, "completed", changes={"progress": 1.0})
+
+# Shared runner for this worker process
+import_runner = ImportRunner()
+
+# -----------------------------
+# Job Queries
+# -----------------------------
+
+async def get_import_job(job_id: str) -> dict:
+    """
+    Returns a job's status and counters. Raises HTTP 404 if it does not exist.
+    """
+    job = await storage.store.find_import_job(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Import job not found")
+    return job_view(job)
+
+async def get_import_errors(job_id: str, skip: int = 0, limit: int = 100) -> dict:
+    """
+    Returns a page of a job's row errors, in file order.
+    At most IMPORT_MAX_ERRORS errors are kept; 'errors_total' counts them all.
+    """
+    job = await storage.store.find_import_job(job_id, errors=(skip, limit))
+    if job is None:
+        raise HTTPException(status_code=404, detail="Import job not found")
+    return {
+        "job_id": job_id,
+        "errors_total": job["duplicate"] + job["invalid"] + job["error"],
+        "errors": job.get("errors", []),
+    }
+
+async def list_import_jobs(limit: int = 20) -> List[dict]:
+    """
+    Returns the most recent jobs, newest first.
+    """
+    return [job_view(job) for job in await storage.store.list_import_jobs(limit)]
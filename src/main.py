@@ -1,12 +1,34 @@
-from fastapi import FastAPI, APIRouter, Depends, HTTPException
+from fastapi import FastAPI, APIRouter, Depends, HTTPException, Query, Response
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.security import OAuth2PasswordRequestForm
 from datetime import timedelta
 from contextlib import asynccontextmanager
+import asyncio
+import logging
+import os
 
-from routes import employees
-from database import create_indexes, ensure_collection_validator
-from auth import authenticate_user, create_access_token, ACCESS_TOKEN_EXPIRE_MINUTES
+from routes import employees, imports
+import storage
+from crud import ensure_department_stats
+from import_jobs import import_runner
+from change_feed import change_feed
+from cache import read_cache
+from admission import ADMISSION_ENABLED, AdmissionMiddleware, admission_controller
+from metrics import METRICS_ENABLED, MetricsMiddleware, mark_worker_stopped, render_metrics
+from profiler import query_profiler
+from auth import authenticate_user, create_access_token, get_current_user, shutdown_password_pool, ACCESS_TOKEN_EXPIRE_MINUTES
+
+logger = logging.getLogger(__name__)
+
+# --------------------------------
+# Startup Configuration
+# --------------------------------
+
+# Startup DDL mode (the memory backend maintains its indexes itself and ignores it):
+# - "deferred": ensure critical indexes and the validator, build the rest in the background
+# - "blocking": ensure everything before serving
+# - "skip": no DDL at startup (schema managed out of band, e.g. via manage.py)
+STARTUP_DDL = os.getenv("STARTUP_DDL", "deferred")
 
 # --------------------------------
 # Auth Router (for token endpoint)
@@ -19,7 +41,7 @@ async def login(form_data: OAuth2PasswordRequestForm = Depends()):
     OAuth2-compatible login endpoint.
     Accepts username and password, returns JWT access token if valid.
     """
-    user = authenticate_user(form_data.username, form_data.password)
+    user = await authenticate_user(form_data.username, form_data.password)
     if not user:
         raise HTTPException(status_code=400, detail="Incorrect username or password")
 
@@ -30,25 +52,113 @@ async def login(form_data: OAuth2PasswordRequestForm = Depends()):
     )
     return {"access_token": access_token, "token_type": "bearer"}
 
+@router.get("/cache/stats", summary="Read cache counters", tags=["Diagnostics"])
+async def cache_stats():
+    """
+    Returns the read cache size and its hit, miss and eviction counters.
+    """
+    return read_cache.stats()
+
+@router.get("/admission/stats", summary="Read admission control counters", tags=["Diagnostics"])
+async def admission_stats():
+    """
+    Returns this worker's admission slots, queue depths, service times and shed counts per route class.
+    """
+    return admission_controller.stats()
+
+@router.get("/change-feed/stats", summary="Read change feed counters", tags=["Diagnostics"])
+async def change_feed_stats():
+    """
+    Returns this worker's open change streams, buffered events and delivery counters.
+    """
+    return change_feed.stats()
+
+@router.get("/metrics", summary="Prometheus metrics", tags=["Diagnostics"])
+async def metrics():
+    """
+    Exposes request, MongoDB command and connection pool metrics in the Prometheus text format.
+    """
+    body, content_type = render_metrics()
+    return Response(body, media_type=content_type)
+
+@router.get("/debug/slow-queries", summary="Slow MongoDB queries with explain plans", tags=["Diagnostics"])
+async def slow_queries(limit: int = Query(50, ge=1, le=1000), user=Depends(get_current_user)):
+    """
+    Returns recent queries slower than QUERY_PROFILER_THRESHOLD_MS, newest first,
+    with their plan summary and flags (COLLSCAN, SORT, HIGH_EXAMINED_RATIO).
+    Requires authentication; the profiler is off unless QUERY_PROFILER_ENABLED is set.
+    """
+    return query_profiler.report(limit)
+
+@router.delete("/debug/slow-queries", summary="Clear recorded slow queries", tags=["Diagnostics"])
+async def clear_slow_queries(user=Depends(get_current_user)):
+    """
+    Drops the recorded findings and resets the profiler counters.
+    Requires authentication.
+    """
+    query_profiler.clear()
+    return {"message": "Slow query findings cleared"}
+
 # --------------------------------
 # Application Lifespan Events
 # --------------------------------
+async def run_deferred_startup():
+    """
+    Builds performance indexes after the app has started serving requests.
+    """
+    try:
+        created = await storage.store.ensure_schema()
+        if created:
+            logger.info("Created indexes: %s", ", ".join(created))
+    except Exception:
+        logger.exception("Deferred startup DDL failed")
+
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     """
     Async startup/shutdown lifecycle:
-    - Ensures MongoDB indexes and schema validation are in place.
+    - Opens this worker's store, per STORAGE_BACKEND (and closes it on shutdown).
+    - Ensures MongoDB indexes and schema validation are in place, only changing them on drift
+      (see STARTUP_DDL for which steps block startup).
+    - Builds the department salary aggregates if they do not exist yet, before serving in every mode.
+    - Starts this worker's import job runner, and interrupts unfinished jobs on shutdown.
+    - Ends open change feed streams on shutdown (the feed itself starts with its first client).
+    - Stops the password verification pool on shutdown.
     """
-    await create_indexes()
-    await ensure_collection_validator()
+    store = storage.open_store()
+    deferred = None
+    if STARTUP_DDL == "blocking":
+        await store.ensure_schema()
+    elif STARTUP_DDL == "deferred":
+        await store.ensure_schema(critical_only=True)
+        deferred = asyncio.create_task(run_deferred_startup())
+    # A write served before the aggregates exist would create a partial one and the rebuild would be skipped;
+    # when they already exist this is a single lookup
+    await ensure_department_stats()
+    import_runner.start()
+
     yield
-    # Optional: Cleanup logic here (e.g., closing DB connections)
+
+    if deferred is not None:
+        deferred.cancel()
+    await import_runner.stop()
+    await change_feed.stop()
+    shutdown_password_pool()
+    storage.close_store()
+    mark_worker_stopped()
 
 # --------------------------------
 # Initialize FastAPI App
 # --------------------------------
 app = FastAPI(lifespan=lifespan)
 
+# --------------------------------
+# Admission Control Middleware
+# --------------------------------
+# Added first so it runs innermost: CORS headers and metrics also cover shed requests
+if ADMISSION_ENABLED:
+    app.add_middleware(AdmissionMiddleware, router=app.router)
+
 # --------------------------------
 # CORS Middleware Configuration
 # --------------------------------
@@ -69,15 +179,24 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# --------------------------------
+# Metrics Middleware
+# --------------------------------
+# Added last so it wraps everything else and times the full request
+if METRICS_ENABLED:
+    app.add_middleware(MetricsMiddleware)
+
 # --------------------------------
 # Route Registrations
 # --------------------------------
 app.include_router(router, tags=["Auth"])  # /token route
 app.include_router(employees.router, prefix="/employees", tags=["Employees"])
+app.include_router(imports.router, prefix="/imports", tags=["Imports"])  # Outside /employees, so it never shadows an employee ID
 
 # --------------------------------
 # Server Startup
 # --------------------------------
 if __name__ == "__main__":
+    # Single-process development server; use serve.py for multi-worker production serving
     import uvicorn
     uvicorn.run(app, host="0.0.0.0", port=8000)
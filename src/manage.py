@@ -0,0 +1,300 @@
+import argparse
+import asyncio
+import time
+
+import crud
+import database
+import storage
+from benchmarks.common import print_table
+
+# -----------------------------
+# Maintenance Commands
+# -----------------------------
+
+async def ensure_schema(args):
+    """
+    Creates missing indexes, applies the collection validator if it has drifted,
+    turns on change stream pre-images and builds the department salary aggregates
+    if they are missing. Use this when the app runs with STARTUP_DDL=skip.
+    """
+    created = await database.create_indexes()
+    created += await database.create_import_job_indexes()
+    validator = await database.ensure_collection_validator()
+    pre_images = await database.ensure_change_stream_pre_images()
+    stats = "built" if await crud.ensure_department_stats() else "present"
+    print(f"Indexes created: {', '.join(created) or 'none'}; validator {validator}; change stream pre-images {pre_images}; "
+          f"salary aggregates {stats}")
+
+async def backfill_skills(args):
+    """
+    Adds the indexed 'skill_tokens' field to documents that predate it,
+    or with --all recomputes it on every document (after a tokenizer change).
+    """
+    updated = await crud.backfill_skill_tokens(batch_size=args.batch_size, retokenize=args.all)
+    print(f"Backfilled skill tokens on {updated} employees")
+
+async def backfill_names(args):
+    """
+    Adds the indexed 'name_tokens' field, used by ranked search, to documents that predate it,
+    or with --all recomputes it on every document.
+    """
+    updated = await crud.backfill_name_tokens(batch_size=args.batch_size, retokenize=args.all)
+    print(f"Backfilled name tokens on {updated} employees")
+
+async def rebuild_stats(args):
+    """
+    Recomputes the department salary aggregates from scratch.
+    """
+    departments = await crud.rebuild_department_stats()
+    print(f"Rebuilt salary aggregates for {departments} departments")
+
+async def migrate_joining_dates(args):
+    """
+    Converts legacy string joining dates to BSON dates in throttled bulk_write
+    batches, walking the joining_date index, so it can run while the app serves
+    traffic. Safe to interrupt and rerun: converted documents are no longer strings.
+    Once none are left, applies the strict validator, which only accepts dates.
+    """
+    total = await storage.store.count_string_joining_dates()
+    print(f"{total} employees have a string joining_date")
+
+    after = None
+    scanned = converted = 0
+    invalid = []
+    started = reported = time.monotonic()
+    while True:
+        batch = await storage.store.convert_joining_dates(crud.parse_joining_date, after, args.batch_size)
+        if not batch["scanned"]:
+            break
+        after = batch["after"]
+        scanned += batch["scanned"]
+        converted += batch["converted"]
+        invalid.extend(batch["invalid"])
+
+        now = time.monotonic()
+        if now - reported >= args.progress_interval:
+            reported = now
+            print(f"  {scanned}/{total} scanned, {converted} converted, {len(invalid)} invalid "
+                  f"({scanned / (now - started):.0f} docs/s)")
+        if args.rate:
+            delay = started + scanned / args.rate - now
+            if delay > 0:
+                await asyncio.sleep(delay)
+
+    print(f"Converted {converted} joining dates in {time.monotonic() - started:.1f}s")
+    if invalid:
+        print(f"Not a date: {', '.join(invalid[:20])}{' ...' if len(invalid) > 20 else ''}")
+        raise SystemExit(f"{len(invalid)} joining dates could not be parsed; fix them and run again")
+
+    remaining = await storage.store.count_string_joining_dates()
+    if remaining:
+        raise SystemExit(f"{remaining} string joining dates remain (written or changed meanwhile); run again")
+    validator = await database.ensure_collection_validator(strict=True)
+    print(f"No string joining dates left; dates-only validator {validator}")
+
+async def verify_stats(args):
+    """
+    Reports departments whose maintained aggregates have drifted.
+    Exits non-zero if any mismatch is found.
+    """
+    mismatches = await crud.verify_department_stats()
+    for mismatch in mismatches:
+        print(f"{mismatch['department']}: expected {mismatch['expected']}, found {mismatch['actual']}")
+    if mismatches:
+        raise SystemExit(f"{len(mismatches)} departments out of sync; run 'rebuild-stats'")
+    print("Department salary aggregates are in sync")
+
+# -----------------------------
+# Index Rollout Commands
+# -----------------------------
+# Reconcile the live collection against database.EMPLOYEE_INDEXES without
+# blocking the app: build missing indexes while it serves traffic, and retire
+# unused ones in two steps (hide, watch, then drop).
+
+def format_bytes(size: int) -> str:
+    for unit in ("B", "KiB", "MiB", "GiB"):
+        if size < 1024 or unit == "GiB":
+            return f"{size:.0f} {unit}" if unit == "B" else f"{size:.1f} {unit}"
+        size /= 1024
+
+async def indexes_status(args):
+    """
+    Shows every index with its registry status, size and usage, plus the validator state.
+    Exits non-zero if the collection has drifted from the registry.
+    """
+    rows = await database.index_status()
+    sizes = await database.index_sizes()
+    usage = await database.index_usage()
+
+    for row in rows:
+        row["keys"] = ", ".join(f"{field} {direction}" for field, direction in row["keys"])
+        row["size"] = format_bytes(sizes[row["name"]]) if row["name"] in sizes else "-"
+        if row["name"] in usage:
+            row["ops"] = usage[row["name"]]["ops"]
+            row["since"] = usage[row["name"]]["since"].strftime("%Y-%m-%d %H:%M")
+    print_table(rows, ["name", "status", "size", "ops", "since", "keys", "purpose"])
+    print(f"Total index size: {format_bytes(sum(sizes.values()))}")
+
+    options = await database.collection_options()
+    validator = "missing collection" if options is None else "ok" if database.validator_in_sync(options) else "differs"
+    dates_only = options is not None and database.validator_in_sync(options, strict=True)
+    print(f"Validator: {validator}{' (dates only)' if dates_only else ''}")
+
+    drifted = [row["name"] for row in rows if row["status"] not in ("ok", "builtin")]
+    if drifted or validator != "ok":
+        raise SystemExit("Collection differs from the registry; see 'indexes apply', 'hide' and 'drop'")
+
+async def indexes_apply(args):
+    """
+    Builds missing registry indexes one at a time, reporting build progress,
+    unhides hidden registry indexes and syncs the validator (the dates-only
+    one if no string joining dates remain).
+    Extra indexes are left alone; retire them with 'hide' and then 'drop'.
+    """
+    rows = await database.index_status()
+    registry = {spec["name"]: spec for spec in database.EMPLOYEE_INDEXES}
+
+    for row in rows:
+        if row["status"] == "missing":
+            print(f"Building {row['name']}...")
+            started = time.monotonic()
+
+            def report(progress, name=row["name"], started=started):
+                elapsed = time.monotonic() - started
+                if progress and progress["total"]:
+                    percent = 100 * progress["done"] / progress["total"]
+                    print(f"  {name}: {percent:.1f}% ({progress['done']}/{progress['total']}) after {elapsed:.0f}s")
+                else:
+                    print(f"  {name}: building for {elapsed:.0f}s")
+
+            await database.build_index(registry[row["name"]], on_progress=report, interval=args.progress_interval)
+            print(f"Built {row['name']} in {time.monotonic() - started:.1f}s")
+        elif row["status"] == "hidden":
+            await database.set_index_hidden(row["name"], hidden=False)
+            print(f"Unhid {row['name']}")
+        elif row["status"] == "differs":
+            print(f"Skipped {row['name']}: the live definition differs; hide and drop it, then run 'indexes apply' again")
+
+    strict = not await storage.store.count_string_joining_dates()
+    validator = await database.ensure_collection_validator(strict=strict)
+    print(f"{'Dates-only validator' if strict else 'Validator (string joining dates remain)'} {validator}")
+
+async def indexes_hide(args):
+    """
+    Hides indexes from the query planner; they are still maintained, so 'unhide'
+    restores them instantly. Without names, hides every index missing from the registry.
+    """
+    rows = {row["name"]: row for row in await database.index_status()}
+    names = args.names or [name for name, row in rows.items() if row["status"] == "extra"]
+    for name in names:
+        if name not in rows or rows[name]["status"] == "builtin":
+            raise SystemExit(f"No hideable index named {name}")
+        await database.set_index_hidden(name, hidden=True)
+        print(f"Hid {name}")
+    if not names:
+        print("No extra indexes to hide")
+
+async def indexes_unhide(args):
+    """
+    Makes hidden indexes visible to the query planner again.
+    """
+    for name in args.names:
+        await database.set_index_hidden(name, hidden=False)
+        print(f"Unhid {name}")
+
+async def indexes_drop(args):
+    """
+    Drops hidden indexes that are not in the registry, or whose live definition
+    differs from it. Only hidden indexes can be dropped, so an index is never
+    removed before the app has run without it.
+    Without names, drops every hidden extra index.
+    """
+    rows = {row["name"]: row for row in await database.index_status()}
+    names = args.names or [name for name, row in rows.items() if row["status"] == "extra, hidden"]
+    for name in names:
+        if name in rows and rows[name]["status"] in ("ok", "hidden", "missing"):
+            raise SystemExit(f"{name} is in the registry; remove it from database.EMPLOYEE_INDEXES first")
+        if name not in rows or not rows[name]["hidden"]:
+            raise SystemExit(f"{name} is not a hidden index; run 'indexes hide {name}' and watch the app first")
+    for name in names:
+        await database.drop_index(name)
+        print(f"Dropped {name}")
+    if not names:
+        print("No hidden extra indexes to drop")
+
+# -----------------------------
+# Command Line Interface
+# -----------------------------
+
+def build_parser() -> argparse.ArgumentParser:
+    """
+    Defines the available maintenance subcommands.
+    """
+    parser = argparse.ArgumentParser(description="Employee database maintenance commands")
+    subcommands = parser.add_subparsers(dest="command", required=True)
+
+    schema = subcommands.add_parser("ensure-schema", help="Create missing indexes, sync the validator, enable change stream pre-images and build missing salary aggregates")
+    schema.set_defaults(handler=ensure_schema)
+
+    backfill = subcommands.add_parser("backfill-skills", help="Populate skill_tokens on existing employees")
+    backfill.add_argument("--batch-size", type=int, default=1000)
+    backfill.add_argument("--all", action="store_true", help="Recompute the tokens of every employee, not just missing ones")
+    backfill.set_defaults(handler=backfill_skills)
+
+    names = subcommands.add_parser("backfill-names", help="Populate name_tokens on existing employees")
+    names.add_argument("--batch-size", type=int, default=1000)
+    names.add_argument("--all", action="store_true", help="Recompute the tokens of every employee, not just missing ones")
+    names.set_defaults(handler=backfill_names)
+
+    rebuild = subcommands.add_parser("rebuild-stats", help="Recompute department salary aggregates")
+    rebuild.set_defaults(handler=rebuild_stats)
+
+    verify = subcommands.add_parser("verify-stats", help="Check department salary aggregates against the data")
+    verify.set_defaults(handler=verify_stats)
+
+    dates = subcommands.add_parser("migrate-joining-dates", help="Convert string joining dates to BSON dates")
+    dates.add_argument("--batch-size", type=int, default=1000)
+    dates.add_argument("--rate", type=float, default=0, help="Documents per second (0 = unlimited)")
+    dates.add_argument("--progress-interval", type=float, default=5.0, help="Seconds between progress reports")
+    dates.set_defaults(handler=migrate_joining_dates)
+
+    indexes = subcommands.add_parser("indexes", help="Reconcile indexes with the registry in database.py")
+    actions = indexes.add_subparsers(dest="action", required=True)
+
+    status = actions.add_parser("status", help="Diff indexes and validator against the registry, with sizes and usage")
+    status.set_defaults(handler=indexes_status)
+
+    apply = actions.add_parser("apply", help="Build missing indexes (with progress) and sync the validator")
+    apply.add_argument("--progress-interval", type=float, default=5.0, help="Seconds between progress reports")
+    apply.set_defaults(handler=indexes_apply)
+
+    hide = actions.add_parser("hide", help="Hide indexes from the planner (default: all extra indexes)")
+    hide.add_argument("names", nargs="*")
+    hide.set_defaults(handler=indexes_hide)
+
+    unhide = actions.add_parser("unhide", help="Make hidden indexes visible to the planner again")
+    unhide.add_argument("names", nargs="+")
+    unhide.set_defaults(handler=indexes_unhide)
+
+    drop = actions.add_parser("drop", help="Drop hidden extra indexes (default: all of them)")
+    drop.add_argument("names", nargs="*")
+    drop.set_defaults(handler=indexes_drop)
+
+    return parser
+
+async def run(args):
+    """
+    Runs one subcommand with a MongoDB client for the duration.
+    The memory backend lives inside the API process, so there is nothing to maintain here.
+    """
+    if storage.STORAGE_BACKEND != "mongo":
+        raise SystemExit("Maintenance commands need STORAGE_BACKEND=mongo")
+    storage.open_store()
+    try:
+        await args.handler(args)
+    finally:
+        storage.close_store()
+
+if __name__ == "__main__":
+    args = build_parser().parse_args()
+    asyncio.run(run(args))
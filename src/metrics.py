@@ -0,0 +1,237 @@
+from dotenv import load_dotenv
+import os
+import time
+
+# Load environment variables before prometheus_client is imported:
+# it reads PROMETHEUS_MULTIPROC_DIR at import time to pick its storage
+load_dotenv()
+if not os.environ.get("PROMETHEUS_MULTIPROC_DIR"):
+    os.environ.pop("PROMETHEUS_MULTIPROC_DIR", None)  # Set but empty would still enable multiprocess mode
+
+from prometheus_client import CONTENT_TYPE_LATEST, REGISTRY, CollectorRegistry, Counter, Gauge, Histogram, generate_latest
+from prometheus_client import multiprocess
+from pymongo import monitoring
+
+# -----------------------------
+# Configuration Constants
+# -----------------------------
+METRICS_ENABLED = os.getenv("METRICS_ENABLED", "true").lower() in ("1", "true", "yes")
+PROMETHEUS_MULTIPROC_DIR = os.getenv("PROMETHEUS_MULTIPROC_DIR")  # Set to aggregate metrics across serve.py workers
+
+# Latency buckets in seconds, from sub-millisecond cache hits to slow queries
+LATENCY_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+# Methods reported as-is; anything else is grouped as OTHER to bound label cardinality
+KNOWN_METHODS = {"GET", "HEAD", "POST", "PUT", "PATCH", "DELETE", "OPTIONS"}
+
+# -----------------------------
+# Metric Definitions
+# -----------------------------
+
+HTTP_REQUESTS = Counter(
+    "http_requests_total", "HTTP requests by route template and status code", ["method", "route", "status"]
+)
+HTTP_LATENCY = Histogram(
+    "http_request_duration_seconds", "Time from request start until the response is fully sent",
+    ["method", "route"], buckets=LATENCY_BUCKETS,
+)
+HTTP_IN_FLIGHT = Gauge(
+    "http_requests_in_flight", "Requests currently being handled", ["method"], multiprocess_mode="livesum"
+)
+
+MONGO_COMMAND_LATENCY = Histogram(
+    "mongo_command_duration_seconds", "MongoDB command round-trip time by command name",
+    ["command"], buckets=LATENCY_BUCKETS,
+)
+MONGO_COMMAND_FAILURES = Counter(
+    "mongo_command_failures_total", "MongoDB commands that returned an error", ["command"]
+)
+MONGO_POOL_CHECKOUT_WAIT = Histogram(
+    "mongo_pool_checkout_wait_seconds", "Time spent waiting to check a connection out of the pool",
+    buckets=LATENCY_BUCKETS,
+)
+MONGO_POOL_CHECKOUT_FAILURES = Counter(
+    "mongo_pool_checkout_failures_total", "Connection checkouts that failed (e.g. wait queue timeout)", ["reason"]
+)
+MONGO_POOL_CONNECTIONS = Gauge(
+    "mongo_pool_connections", "Open pooled connections per server", ["address"], multiprocess_mode="livesum"
+)
+MONGO_POOL_CHECKED_OUT = Gauge(
+    "mongo_pool_checked_out", "Connections currently checked out per server", ["address"], multiprocess_mode="livesum"
+)
+MONGO_POOL_MAX_SIZE = Gauge(
+    "mongo_pool_max_size", "Pool size limit per server; saturation is checked_out / max_size",
+    ["address"], multiprocess_mode="livesum",
+)
+
+ADMISSION_IN_FLIGHT = Gauge(
+    "admission_in_flight", "Requests holding an admission slot, by route class", ["route_class"], multiprocess_mode="livesum"
+)
+ADMISSION_QUEUE_DEPTH = Gauge(
+    "admission_queue_depth", "Requests waiting for an admission slot, by route class", ["route_class"], multiprocess_mode="livesum"
+)
+ADMISSION_WAIT = Histogram(
+    "admission_wait_seconds", "Time admitted requests waited for a slot, by route class",
+    ["route_class"], buckets=LATENCY_BUCKETS,
+)
+ADMISSION_SHED = Counter(
+    "admission_shed_total", "Requests refused with 503 by admission control", ["route_class", "reason"]
+)
+
+# -----------------------------
+# HTTP Middleware
+# -----------------------------
+
+class MetricsMiddleware:
+    """
+    Pure ASGI middleware recording per-route latency, status codes and in-flight requests.
+    Routes are labelled by their template (e.g. /employees/{employee_id}), which the
+    router leaves in the scope, so label cardinality stays bounded.
+    Labelled children are cached, keeping the per-request cost to a few dict lookups.
+    """
+
+    def __init__(self, app):
+        self.app = app
+        self.in_flight = {}  # method -> gauge
+        self.latency = {}  # (method, route) -> histogram
+        self.requests = {}  # (method, route, status) -> counter
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        method = scope["method"] if scope["method"] in KNOWN_METHODS else "OTHER"
+        in_flight = self.in_flight.get(method)
+        if in_flight is None:
+            in_flight = self.in_flight[method] = HTTP_IN_FLIGHT.labels(method)
+        status = 500  # Reported if the app fails before starting a response
+
+        async def send_with_status(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        in_flight.inc()
+        started = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            elapsed = time.perf_counter() - started
+            in_flight.dec()
+            route = scope.get("route")
+            self.observe(method, route.path if route is not None else "unmatched", status, elapsed)
+
+    def observe(self, method: str, route: str, status: int, elapsed: float):
+        latency = self.latency.get((method, route))
+        if latency is None:
+            latency = self.latency[(method, route)] = HTTP_LATENCY.labels(method, route)
+        latency.observe(elapsed)
+
+        requests = self.requests.get((method, route, status))
+        if requests is None:
+            requests = self.requests[(method, route, status)] = HTTP_REQUESTS.labels(method, route, str(status))
+        requests.inc()
+
+# -----------------------------
+# MongoDB Driver Listeners
+# -----------------------------
+# Called synchronously by the driver, possibly from its worker threads;
+# prometheus_client metrics are thread-safe.
+
+def format_address(address) -> str:
+    host, port = address
+    return f"{host}:{port}"
+
+class CommandMetricsListener(monitoring.CommandListener):
+    """
+    Records the round-trip time of every MongoDB command, labelled by command name.
+    """
+
+    def started(self, event):
+        pass
+
+    def succeeded(self, event):
+        MONGO_COMMAND_LATENCY.labels(event.command_name).observe(event.duration_micros / 1e6)
+
+    def failed(self, event):
+        MONGO_COMMAND_LATENCY.labels(event.command_name).observe(event.duration_micros / 1e6)
+        MONGO_COMMAND_FAILURES.labels(event.command_name).inc()
+
+class PoolMetricsListener(monitoring.ConnectionPoolListener):
+    """
+    Tracks pool size, checked-out connections and checkout wait per server.
+    """
+
+    def __init__(self, max_pool_size: int):
+        self.max_pool_size = max_pool_size
+
+    def pool_created(self, event):
+        MONGO_POOL_MAX_SIZE.labels(format_address(event.address)).set(event.options.get("maxPoolSize", self.max_pool_size))
+
+    def pool_ready(self, event):
+        pass
+
+    def pool_cleared(self, event):
+        pass
+
+    def pool_closed(self, event):
+        address = format_address(event.address)
+        MONGO_POOL_CONNECTIONS.labels(address).set(0)
+        MONGO_POOL_CHECKED_OUT.labels(address).set(0)
+
+    def connection_created(self, event):
+        MONGO_POOL_CONNECTIONS.labels(format_address(event.address)).inc()
+
+    def connection_ready(self, event):
+        pass
+
+    def connection_closed(self, event):
+        MONGO_POOL_CONNECTIONS.labels(format_address(event.address)).dec()
+
+    def connection_check_out_started(self, event):
+        pass
+
+    def connection_check_out_failed(self, event):
+        MONGO_POOL_CHECKOUT_FAILURES.labels(event.reason).inc()
+        if event.duration is not None:
+            MONGO_POOL_CHECKOUT_WAIT.observe(event.duration)
+
+    def connection_checked_out(self, event):
+        MONGO_POOL_CHECKED_OUT.labels(format_address(event.address)).inc()
+        if event.duration is not None:
+            MONGO_POOL_CHECKOUT_WAIT.observe(event.duration)
+
+    def connection_checked_in(self, event):
+        MONGO_POOL_CHECKED_OUT.labels(format_address(event.address)).dec()
+
+def mongo_listeners(max_pool_size: int) -> list:
+    """
+    Returns the driver listeners to pass to the MongoDB client.
+    """
+    return [CommandMetricsListener(), PoolMetricsListener(max_pool_size)]
+
+# -----------------------------
+# Exposition
+# -----------------------------
+
+def render_metrics():
+    """
+    Renders all metrics in the Prometheus text format.
+    With PROMETHEUS_MULTIPROC_DIR set, combines the values of every worker process.
+    Returns (body, content type).
+    """
+    if PROMETHEUS_MULTIPROC_DIR:
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+    else:
+        registry = REGISTRY
+    return generate_latest(registry), CONTENT_TYPE_LATEST
+
+def mark_worker_stopped():
+    """
+    Drops this worker's live gauges from the multiprocess totals on shutdown.
+    """
+    if PROMETHEUS_MULTIPROC_DIR:
+        multiprocess.mark_process_dead(os.getpid())
@@ -31,3 +31,13 @@ class UpdateEmployee(BaseModel):
     salary: Optional[float] = None         # Updated salary
     joining_date: Optional[date] = None    # Updated joining date
     skills: Optional[List[str]] = None     # Updated list of skills
+
+# -----------------------------
+# Schema for Batch Lookups
+# -----------------------------
+
+class EmployeeIds(BaseModel):
+    """
+    Schema for looking up several employees by ID in one request.
+    """
+    ids: List[str]                         # Employee IDs, in the order results should follow
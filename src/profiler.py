@@ -0,0 +1,186 @@
+from collections import deque
+from datetime import datetime, timezone
+from dotenv import load_dotenv
+from typing import Awaitable, Callable, Iterator, List, Optional
+import asyncio
+import os
+import time
+
+# Load environment variables from .env file
+load_dotenv()
+
+# -----------------------------
+# Configuration Constants
+# -----------------------------
+QUERY_PROFILER_ENABLED = os.getenv("QUERY_PROFILER_ENABLED", "false").lower() in ("1", "true", "yes")
+QUERY_PROFILER_THRESHOLD_MS = float(os.getenv("QUERY_PROFILER_THRESHOLD_MS", "100"))  # Slower queries are recorded
+QUERY_PROFILER_BUFFER_SIZE = int(os.getenv("QUERY_PROFILER_BUFFER_SIZE", "200"))  # Findings kept (oldest dropped first)
+QUERY_PROFILER_EXAMINED_RATIO = float(os.getenv("QUERY_PROFILER_EXAMINED_RATIO", "10"))  # Docs examined per doc returned
+QUERY_PROFILER_EXPLAIN_INTERVAL = float(os.getenv("QUERY_PROFILER_EXPLAIN_INTERVAL", "60"))  # Seconds between explains per operation
+
+# -----------------------------
+# Explain Plan Analysis
+# -----------------------------
+
+def find_values(node, key: str) -> Iterator:
+    """
+    Yields every value stored under 'key' anywhere in a nested explain document.
+    """
+    if isinstance(node, dict):
+        for name, value in node.items():
+            if name == key:
+                yield value
+            yield from find_values(value, key)
+    elif isinstance(node, list):
+        for item in node:
+            yield from find_values(item, key)
+
+def summarize_plan(explain: dict, examined_ratio: float = QUERY_PROFILER_EXAMINED_RATIO) -> dict:
+    """
+    Condenses an executionStats explain into the winning plan's stages and
+    indexes, the work counters and any flags worth a look:
+    COLLSCAN, SORT (a blocking in-memory sort) and HIGH_EXAMINED_RATIO.
+    Handles find, findAndModify, count and aggregate explains, in both the
+    classic and the slot-based (SBE) formats.
+    """
+    winning_plans = [planner.get("winningPlan", {}) for planner in find_values(explain, "queryPlanner")]
+    stages = list(dict.fromkeys(stage for plan in winning_plans for stage in find_values(plan, "stage")))
+    indexes = list(dict.fromkeys(index for plan in winning_plans for index in find_values(plan, "indexName")))
+
+    stats = next(find_values(explain, "executionStats"), {})
+    examined = stats.get("totalDocsExamined", 0)
+    returned = stats.get("nReturned", 0)
+
+    flags = []
+    if "COLLSCAN" in stages:
+        flags.append("COLLSCAN")
+    if "SORT" in stages:
+        flags.append("SORT")
+    if examined > examined_ratio * max(returned, 1):
+        flags.append("HIGH_EXAMINED_RATIO")
+
+    return {
+        "stages": stages,
+        "indexes": indexes,
+        "docs_examined": examined,
+        "keys_examined": stats.get("totalKeysExamined", 0),
+        "returned": returned,
+        "execution_ms": stats.get("executionTimeMillis"),
+        "flags": flags,
+    }
+
+def query_shape(value):
+    """
+    Strips literal values from a command, keeping its structure.
+    Strings, floats and dates become "?", so findings never hold employee data;
+    integers, booleans (sort directions, projections, limits) and "$field" references are kept.
+    """
+    if isinstance(value, dict):
+        return {key: query_shape(item) for key, item in value.items()}
+    if isinstance(value, (list, tuple)):
+        if any(isinstance(item, (dict, list, tuple)) for item in value):
+            return [query_shape(item) for item in value]
+        return "?"
+    if value is None or isinstance(value, (bool, int)):
+        return value
+    if isinstance(value, str) and value.startswith("$"):
+        return value
+    return "?"
+
+def command_shape(command: dict) -> dict:
+    """
+    Applies query_shape() to a command, keeping the command's collection name.
+    """
+    name, collection = next(iter(command.items()))
+    return {name: collection, **query_shape({key: value for key, value in command.items() if key != name})}
+
+# -----------------------------
+# Query Profiler
+# -----------------------------
+
+class QueryProfiler:
+    """
+    Times storage queries and records the slow ones in a bounded ring buffer.
+    A slow query's explain plan is captured in the background, so the request
+    that was slow is not delayed further; each operation is explained at most
+    once per 'explain_interval' seconds to keep the extra load on MongoDB small.
+    """
+
+    def __init__(self, enabled: bool = QUERY_PROFILER_ENABLED, threshold_ms: float = QUERY_PROFILER_THRESHOLD_MS,
+                 buffer_size: int = QUERY_PROFILER_BUFFER_SIZE, examined_ratio: float = QUERY_PROFILER_EXAMINED_RATIO,
+                 explain_interval: float = QUERY_PROFILER_EXPLAIN_INTERVAL):
+        self.enabled = enabled
+        self.threshold_ms = threshold_ms
+        self.examined_ratio = examined_ratio
+        self.explain_interval = explain_interval
+        self.findings = deque(maxlen=buffer_size)
+        self.last_explained = {}  # operation -> monotonic time of its last explain
+        self.pending = set()  # Running explain tasks, referenced until they finish
+        self.timed = 0
+        self.slow = 0
+
+    def observe(self, operation: str, elapsed: float, command: Callable[[], dict],
+                explain: Callable[[dict], Awaitable[dict]]):
+        """
+        Records one query's duration. 'command' builds the equivalent database
+        command and 'explain' runs it through explain; both are only called for slow queries.
+        """
+        self.timed += 1
+        duration_ms = elapsed * 1000
+        if duration_ms < self.threshold_ms:
+            return
+
+        self.slow += 1
+        built = command()
+        finding = {
+            "at": datetime.now(timezone.utc).isoformat(timespec="milliseconds"),
+            "operation": operation,
+            "duration_ms": round(duration_ms, 3),
+            "query": command_shape(built),
+            "plan": None,
+        }
+        self.findings.append(finding)
+
+        now = time.monotonic()
+        last = self.last_explained.get(operation)
+        if last is not None and now - last < self.explain_interval:
+            finding["plan"] = "skipped: explained recently"
+            return
+        self.last_explained[operation] = now
+        task = asyncio.get_running_loop().create_task(self.capture_plan(finding, built, explain))
+        self.pending.add(task)
+        task.add_done_callback(self.pending.discard)
+
+    async def capture_plan(self, finding: dict, command: dict, explain: Callable[[dict], Awaitable[dict]]):
+        """
+        Runs the explain for a finding and stores the plan summary on it.
+        """
+        try:
+            finding["plan"] = summarize_plan(await explain(command), self.examined_ratio)
+        except Exception as e:
+            finding["plan"] = f"explain failed: {e}"
+
+    def report(self, limit: Optional[int] = None) -> dict:
+        """
+        Returns the settings, counters and findings (newest first).
+        """
+        findings: List[dict] = list(reversed(self.findings))
+        return {
+            "enabled": self.enabled,
+            "threshold_ms": self.threshold_ms,
+            "timed": self.timed,
+            "slow": self.slow,
+            "findings": findings[:limit] if limit is not None else findings,
+        }
+
+    def clear(self):
+        """
+        Drops every finding and resets the counters.
+        """
+        self.findings.clear()
+        self.last_explained.clear()
+        self.timed = 0
+        self.slow = 0
+
+# Shared profiler for MongoDB queries
+query_profiler = QueryProfiler()
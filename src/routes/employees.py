@@ -1,25 +1,212 @@
 # routes/employees.py
 
-from fastapi import APIRouter, Query, Depends
-from models import Employee, UpdateEmployee
+from fastapi import APIRouter, Query, Depends, Header, HTTPException, Request, Response
+from fastapi.responses import ORJSONResponse, StreamingResponse
+from models import Employee, EmployeeIds, UpdateEmployee
+from typing import List, Optional
+from datetime import date
 import crud
 from auth import get_current_user
+from change_feed import change_feed
+import csv
+import io
+import json
+import orjson
 
 # Create router instance for employee-related routes
 router = APIRouter()
 
+# Content types treated as newline-delimited JSON for bulk uploads
+NDJSON_CONTENT_TYPES = ("application/x-ndjson", "application/ndjson", "application/jsonl")
+
+# Fields of the single-employee response (the Employee model)
+EMPLOYEE_FIELDS = list(Employee.model_fields)
+
+# Fields a client may select with 'fields='
+SELECTABLE_FIELDS = [*EMPLOYEE_FIELDS, "version"]
+
+# Column order for CSV exports; 'version' only when selected
+CSV_COLUMNS = ["employee_id", "name", "department", "salary", "joining_date", "skills", "version"]
+
+# -----------------------------
+# Helpers: ETags and Conditional Requests
+# -----------------------------
+
+def make_etag(version: int) -> str:
+    """
+    Formats a document version as a strong ETag.
+    """
+    return f'"{version}"'
+
+def parse_etag_versions(header: Optional[str], weak: bool = False) -> Optional[List[int]]:
+    """
+    Parses an If-Match / If-None-Match header into a list of versions.
+    Returns None when the header is absent or '*' (any version).
+    Tags that are not versions issued by this API are ignored, so they never match.
+    Weak tags ('W/"3"') only count with 'weak' (If-None-Match); If-Match compares strongly.
+    """
+    if header is None or header.strip() == "*":
+        return None
+    versions = []
+    for tag in header.split(","):
+        tag = tag.strip()
+        if tag.startswith("W/"):
+            if not weak:
+                continue
+            tag = tag[2:]
+        tag = tag.strip('"')
+        if tag.isdigit():
+            versions.append(int(tag))
+    return versions
+
+# -----------------------------
+# Helper: Fast JSON Responses
+# -----------------------------
+
+def fast_json(content, headers: Optional[dict] = None) -> ORJSONResponse:
+    """
+    Encodes trusted database output with orjson and returns it directly,
+    skipping FastAPI's jsonable_encoder and response_model re-validation.
+    The bytes on the wire match the default JSON response.
+    """
+    return ORJSONResponse(content, headers=headers)
+
+# -----------------------------
+# Dependency: Sparse Fieldsets
+# -----------------------------
+
+async def field_selection(
+    fields: Optional[str] = Query(None, description="Comma-separated fields to return, e.g. employee_id,name,salary")
+) -> Optional[List[str]]:
+    """
+    Parses and validates the 'fields' query parameter against the Employee model.
+    Returns None (all fields) when the parameter is absent.
+    Async because it does no I/O: FastAPI runs sync dependencies in the threadpool.
+    """
+    if fields is None:
+        return None
+    requested = list(dict.fromkeys(field.strip() for field in fields.split(",") if field.strip()))
+    unknown = [field for field in requested if field not in SELECTABLE_FIELDS]
+    if not requested or unknown:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Invalid fields: {', '.join(unknown) or '(empty)'}; choose from {', '.join(SELECTABLE_FIELDS)}"
+        )
+    return requested
+
+# -----------------------------
+# Helpers: Streaming Response Formats
+# -----------------------------
+
+def preferred_stream_type(accept: Optional[str]) -> Optional[str]:
+    """
+    Returns the streaming media type requested in an Accept header,
+    or None if the client wants a regular JSON body.
+    """
+    if not accept:
+        return None
+    for media_type in accept.split(","):
+        media_type = media_type.split(";")[0].strip().lower()
+        if media_type in NDJSON_CONTENT_TYPES:
+            return "application/x-ndjson"
+        if media_type == "text/csv":
+            return "text/csv"
+    return None
+
+async def ndjson_rows(employees):
+    """
+    Encodes each employee as one JSON line.
+    """
+    async for employee in employees:
+        yield orjson.dumps(employee) + b"\n"
+
+async def csv_rows(employees, fields: Optional[List[str]] = None):
+    """
+    Encodes employees as CSV with a header row; skills are joined with ';'.
+    'fields' selects the columns (the Employee fields by default).
+    """
+    columns = [column for column in CSV_COLUMNS if column in (fields or EMPLOYEE_FIELDS)]
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(columns)
+    async for employee in employees:
+        writer.writerow([
+            ";".join(employee[column]) if column == "skills" else employee.get(column)
+            for column in columns
+        ])
+        yield buffer.getvalue()
+        buffer.seek(0)
+        buffer.truncate()
+    # Header only, for an empty department
+    if buffer.tell():
+        yield buffer.getvalue()
+
+# -----------------------------
+# Helper: Read Bulk Request Body
+# -----------------------------
+
+async def read_bulk_rows(request: Request):
+    """
+    Yields (index, row) pairs from a bulk upload.
+    NDJSON bodies are consumed line by line as they stream in;
+    anything else is parsed as a single JSON array.
+    """
+    content_type = request.headers.get("content-type", "").split(";")[0].strip().lower()
+
+    if content_type in NDJSON_CONTENT_TYPES:
+        index = 0
+        buffer = b""
+        async for chunk in request.stream():
+            buffer += chunk
+            *lines, buffer = buffer.split(b"\n")
+            for line in lines:
+                if line.strip():
+                    yield index, line
+                    index += 1
+        if buffer.strip():
+            yield index, buffer
+        return
+
+    try:
+        body = await request.json()
+    except json.JSONDecodeError:
+        raise HTTPException(status_code=400, detail="Request body is not valid JSON")
+    if not isinstance(body, list):
+        raise HTTPException(status_code=400, detail="Expected a JSON array of employees")
+    for index, row in enumerate(body):
+        yield index, row
+
 # -----------------------------
 # 1. Create New Employee (Protected)
 # -----------------------------
 
 @router.post("/", response_model=Employee, summary="Create a new employee")
-async def create_employee(employee: Employee, user=Depends(get_current_user)):
+async def create_employee(employee: Employee, response: Response, user=Depends(get_current_user)):
     """
     Creates a new employee entry.
     Requires authentication.
     """
-    return await crud.create_employee(employee)
+    created = await crud.create_employee(employee)
+    response.headers["ETag"] = make_etag(created["version"])
+    return created
 
+# -----------------------------
+# 1b. Bulk Create Employees (Protected)
+# -----------------------------
+
+@router.post("/bulk", summary="Bulk create employees from a JSON array or NDJSON stream")
+async def bulk_create_employees(
+    request: Request,
+    batch_size: int = Query(crud.BULK_BATCH_SIZE, ge=1, le=crud.BULK_MAX_BATCH_SIZE),
+    user=Depends(get_current_user)
+):
+    """
+    Creates many employees in one request.
+    Rows are written with unordered insert_many batches; the response
+    reports per-row 'created', 'duplicate', 'invalid' or 'error' status.
+    Requires authentication.
+    """
+    return await crud.bulk_create_employees(read_bulk_rows(request), batch_size=batch_size)
 
 # -----------------------------
 # 5. List Employees (All, Filtered, or Paginated)
@@ -27,18 +214,36 @@ async def create_employee(employee: Employee, user=Depends(get_current_user)):
 
 @router.get("/", summary="List employees (all, by department, or paginated)")
 async def list_employees(
+    request: Request,
     department: str = None,
     page: int = Query(1, ge=1),
-    limit: int = Query(20, ge=1, le=100)
+    limit: int = Query(20, ge=1, le=100),
+    cursor: Optional[str] = Query(None, description="Opaque keyset cursor; pass an empty value for the first page"),
+    total: Optional[str] = Query(None, pattern="^(exact|estimate|none)$", description="How to compute the total count"),
+    fields: Optional[List[str]] = Depends(field_selection)
 ):
     """
     Lists employees:
-    - If 'department' is provided, filters by department.
+    - If 'department' is provided, filters by department
+      (streamed as NDJSON or CSV when the Accept header asks for it).
+    - If 'cursor' is provided, returns a keyset page with 'next_cursor' (no total by default).
     - Otherwise, returns paginated list (sorted by newest).
+    'fields' limits every mode to the listed fields.
     """
     if department:
-        return await crud.list_employees_by_department(department)
-    return await crud.list_employees_paginated(page=page, limit=limit)
+        stream_type = preferred_stream_type(request.headers.get("accept"))
+        if stream_type is not None:
+            employees = crud.stream_employees_by_department(department, fields=fields)
+            rows = csv_rows(employees, fields) if stream_type == "text/csv" else ndjson_rows(employees)
+            return StreamingResponse(rows, media_type=stream_type)
+        return fast_json(await crud.list_employees_by_department(department, fields=fields))
+    if cursor is not None:
+        return fast_json(await crud.list_employees_by_cursor(
+            cursor=cursor, limit=limit, total=None if total in (None, "none") else total, fields=fields
+        ))
+    return fast_json(await crud.list_employees_paginated(
+        page=page, limit=limit, total=None if total == "none" else (total or "exact"), fields=fields
+    ))
 
 # -----------------------------
 # 6. Average Salary by Department
@@ -49,50 +254,185 @@ async def avg_salary():
     """
     Returns the average salary for each department.
     """
-    return await crud.average_salary_by_department()
+    return fast_json(await crud.average_salary_by_department())
+
+# -----------------------------
+# 6b. Department Salary Analytics
+# -----------------------------
+
+@router.get("/analytics", summary="Salary distribution by department")
+async def salary_analytics(
+    department: Optional[str] = None,
+    joined_from: Optional[date] = Query(None, description="Only employees who joined on or after this date"),
+    joined_to: Optional[date] = Query(None, description="Only employees who joined on or before this date"),
+    bucket_width: float = Query(crud.ANALYTICS_BUCKET_WIDTH, ge=100, description="Width of the salary histogram buckets")
+):
+    """
+    Returns headcount, min/max/average, median and p90 salary and a salary
+    histogram for each department (or just 'department'), computed server-side
+    in a single aggregation. Briefly cached, so it may lag recent writes.
+    """
+    if joined_from and joined_to and joined_from > joined_to:
+        raise HTTPException(status_code=400, detail="joined_from must not be after joined_to")
+    return fast_json(await crud.department_analytics(department, joined_from, joined_to, bucket_width))
 
 # -----------------------------
 # 7. Search Employees by Skill
 # -----------------------------
 
 @router.get("/search", summary="Search employees by skill")
-async def search_employees(skill: str):
+async def search_employees(
+    skill: List[str] = Query(..., description="Skill to match; repeat for multi-skill queries"),
+    match: str = Query("any", pattern="^(any|all)$", description="Match any (OR) or all (AND) of the skills"),
+    page: int = Query(1, ge=1),
+    limit: Optional[int] = Query(None, ge=1, le=100, description="Page size; omit to return every match"),
+    fields: Optional[List[str]] = Depends(field_selection)
+):
+    """
+    Searches for employees who have the given skill(s).
+    """
+    return fast_json(await crud.search_employees_by_skills(skill, match=match, page=page, limit=limit, fields=fields))
+
+# -----------------------------
+# 7b. Ranked Search by Name and Skills
+# -----------------------------
+
+@router.get("/search/ranked", summary="Search employees by name and skills, best matches first")
+async def ranked_search(
+    q: str = Query(..., min_length=1, max_length=200, description="Words to find in names and skills, e.g. 'john pyth'"),
+    page: int = Query(1, ge=1),
+    limit: int = Query(20, ge=1, le=100),
+    fields: Optional[List[str]] = Depends(field_selection)
+):
     """
-    Searches for employees who have a given skill.
+    Finds employees whose name or skills contain every word of 'q'.
+    Unfinished words and single typos still match, at a lower score;
+    name matches score above skill matches. At most SEARCH_MAX_RESULTS
+    matches are ranked ('capped' is true when there may be more).
     """
-    return await crud.search_employees_by_skill(skill)
+    return fast_json(await crud.ranked_search(q, page=page, limit=limit, fields=fields))
+
+# -----------------------------
+# 7c. Change Feed (Server-Sent Events)
+# -----------------------------
+
+@router.get("/changes", summary="Stream employee changes as Server-Sent Events")
+async def stream_changes(
+    department: Optional[str] = Query(None, description="Only changes in (or moving out of) this department"),
+    last_event_id: Optional[str] = Header(None, description="ID of the last event received; sent by EventSource on reconnect"),
+    resume_after: Optional[str] = Query(None, description="Same as Last-Event-ID, for clients that cannot set headers"),
+):
+    """
+    Streams 'create', 'update' and 'delete' events for employees as they happen,
+    each with the event ID to resume from. Reconnecting with Last-Event-ID (or
+    'resume_after') replays what was missed; a 'reset' event means that was not
+    possible and the client should reload. Needs MongoDB running as a replica set.
+    """
+    await change_feed.ensure_open()
+    return StreamingResponse(
+        change_feed.stream(department, last_event_id=resume_after or last_event_id),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+# -----------------------------
+# 2b. Batch Lookup by IDs
+# -----------------------------
+
+def lookup_batch(ids: List[str], fields: Optional[List[str]]):
+    """
+    Validates a batch of IDs and looks them up with one store query.
+    """
+    if not ids:
+        raise HTTPException(status_code=400, detail="No employee IDs given")
+    if len(ids) > crud.BATCH_LOOKUP_MAX_IDS:
+        raise HTTPException(status_code=400, detail=f"At most {crud.BATCH_LOOKUP_MAX_IDS} employee IDs per request")
+    return crud.get_employees(ids, fields=fields)
+
+@router.get("/batch", summary="Get several employees by ID")
+async def get_employees_batch(
+    ids: List[str] = Query(..., description="Employee IDs, comma-separated or repeated"),
+    fields: Optional[List[str]] = Depends(field_selection)
+):
+    """
+    Retrieves several employees in one request, in the order requested.
+    IDs that do not exist are listed under 'missing'.
+    """
+    requested = [employee_id.strip() for value in ids for employee_id in value.split(",") if employee_id.strip()]
+    return fast_json(await lookup_batch(requested, fields))
+
+@router.post("/batch", summary="Get several employees by ID (IDs in the body)")
+async def post_employees_batch(
+    body: EmployeeIds,
+    fields: Optional[List[str]] = Depends(field_selection)
+):
+    """
+    Same as GET /employees/batch, for ID lists too long for a URL.
+    """
+    return fast_json(await lookup_batch(body.ids, fields))
 
 # -----------------------------
 # 2. Get Employee by ID
 # -----------------------------
 
 @router.get("/{employee_id}", response_model=Employee, summary="Get employee by ID")
-async def get_employee(employee_id: str):
+async def get_employee(
+    employee_id: str,
+    if_none_match: Optional[str] = Header(None),
+    fields: Optional[List[str]] = Depends(field_selection)
+):
     """
     Retrieves an employee by their employee_id.
+    Sends the document version as an ETag and answers 304 Not Modified
+    when the client's If-None-Match already names the current version.
+    The body is encoded directly; 'response_model' only documents the full shape,
+    and 'fields' narrows it.
     """
-    return await crud.get_employee(employee_id)
+    # The version is always fetched for the ETag
+    employee = await crud.get_employee(employee_id, fields=fields and list(dict.fromkeys([*fields, "version"])))
+    etag = make_etag(employee["version"])
+
+    if if_none_match is not None:
+        versions = parse_etag_versions(if_none_match, weak=True)
+        if versions is None or employee["version"] in versions:
+            return Response(status_code=304, headers={"ETag": etag})
+
+    return fast_json({field: employee[field] for field in fields or EMPLOYEE_FIELDS}, headers={"ETag": etag})
 
 # -----------------------------
 # 3. Update Employee (Protected)
 # -----------------------------
 
 @router.put("/{employee_id}", response_model=Employee, summary="Update an existing employee")
-async def update_employee(employee_id: str, updates: UpdateEmployee, user=Depends(get_current_user)):
+async def update_employee(
+    employee_id: str,
+    updates: UpdateEmployee,
+    response: Response,
+    if_match: Optional[str] = Header(None),
+    user=Depends(get_current_user)
+):
     """
     Updates fields of an existing employee.
+    An If-Match header makes the update conditional on the current version (412 otherwise).
     Requires authentication.
     """
-    return await crud.update_employee(employee_id, updates)
+    employee = await crud.update_employee(employee_id, updates, if_match=parse_etag_versions(if_match))
+    response.headers["ETag"] = make_etag(employee["version"])
+    return employee
 
 # -----------------------------
 # 4. Delete Employee (Protected)
 # -----------------------------
 
 @router.delete("/{employee_id}", summary="Delete an employee")
-async def delete_employee(employee_id: str, user=Depends(get_current_user)):
+async def delete_employee(
+    employee_id: str,
+    if_match: Optional[str] = Header(None),
+    user=Depends(get_current_user)
+):
     """
     Deletes an employee by their employee_id.
+    An If-Match header makes the delete conditional on the current version (412 otherwise).
     Requires authentication.
     """
-    return await crud.delete_employee(employee_id)
+    return await crud.delete_employee(employee_id, if_match=parse_etag_versions(if_match))
@@ -0,0 +1,80 @@
+# routes/imports.py
+
+from fastapi import APIRouter, Query, Depends, HTTPException, Request, status
+from fastapi.responses import ORJSONResponse
+from auth import get_current_user
+import import_jobs
+
+# Create router instance for import job routes
+router = APIRouter()
+
+# -----------------------------
+# 1. Start an Import (Protected)
+# -----------------------------
+
+@router.post("", status_code=status.HTTP_202_ACCEPTED, summary="Upload a CSV or NDJSON file to import in the background")
+async def create_import(request: Request, user=Depends(get_current_user)):
+    """
+    Stores the uploaded file and queues an import job for it, returning the
+    job right away (202 with a Location header to poll). Send the file as the
+    raw body with Content-Type text/csv (header row, skills joined with ';',
+    as in the CSV export) or application/x-ndjson (one employee per line).
+    Responds 503 with Retry-After when this worker's import queue is full.
+    Requires authentication.
+    """
+    content_type = request.headers.get("content-type", "").split(";")[0].strip().lower()
+    file_format = import_jobs.IMPORT_FORMATS.get(content_type)
+    if file_format is None:
+        raise HTTPException(
+            status_code=status.HTTP_415_UNSUPPORTED_MEDIA_TYPE,
+            detail=f"Upload a file as one of: {', '.join(import_jobs.IMPORT_FORMATS)}",
+        )
+    import_jobs.import_runner.ensure_capacity()  # Refuse before reading what could be a large body
+
+    path, size = await import_jobs.spool_upload(request.stream())
+    job = await import_jobs.import_runner.submit(path, size, file_format, submitted_by=user["username"])
+    location = f"{request.url.path.rstrip('/')}/{job['job_id']}"
+    return ORJSONResponse(job, status_code=status.HTTP_202_ACCEPTED, headers={"Location": location})
+
+# -----------------------------
+# 2. List Recent Imports (Protected)
+# -----------------------------
+
+@router.get("", summary="List recent import jobs")
+async def list_imports(limit: int = Query(20, ge=1, le=100), user=Depends(get_current_user)):
+    """
+    Returns the most recent import jobs, newest first, without their row errors.
+    Requires authentication.
+    """
+    return ORJSONResponse(await import_jobs.list_import_jobs(limit))
+
+# -----------------------------
+# 3. Poll an Import (Protected)
+# -----------------------------
+
+@router.get("/{job_id}", summary="Get an import job's status and progress")
+async def get_import(job_id: str, user=Depends(get_current_user)):
+    """
+    Returns a job's status ('queued', 'running', 'completed', 'failed' or
+    'interrupted'), its progress through the file (0 to 1) and per-status
+    row counts. Requires authentication.
+    """
+    return ORJSONResponse(await import_jobs.get_import_job(job_id))
+
+# -----------------------------
+# 4. Row Errors of an Import (Protected)
+# -----------------------------
+
+@router.get("/{job_id}/errors", summary="Get the rows an import job could not insert")
+async def get_import_errors(
+    job_id: str,
+    offset: int = Query(0, ge=0),
+    limit: int = Query(100, ge=1, le=1000),
+    user=Depends(get_current_user)
+):
+    """
+    Returns a page of the job's failed rows in file order: line number,
+    employee_id, status ('invalid', 'duplicate' or 'error') and detail.
+    Requires authentication.
+    """
+    return ORJSONResponse(await import_jobs.get_import_errors(job_id, skip=offset, limit=limit))
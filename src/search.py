@@ -0,0 +1,194 @@
+from dotenv import load_dotenv
+from typing import Awaitable, Callable, Dict, Iterable, List, Optional
+import asyncio
+import bisect
+import os
+import time
+
+# Load environment variables from .env file
+load_dotenv()
+
+# -----------------------------
+# Configuration Constants
+# -----------------------------
+SEARCH_MAX_RESULTS = int(os.getenv("SEARCH_MAX_RESULTS", "500"))  # Matches ranked per query; the rest are not returned
+SEARCH_MAX_EXPANSIONS = int(os.getenv("SEARCH_MAX_EXPANSIONS", "50"))  # Prefix and typo variants looked up per term
+SEARCH_VOCABULARY_TTL_SECONDS = float(os.getenv("SEARCH_VOCABULARY_TTL_SECONDS", "300"))  # Refresh interval of the term list
+SEARCH_MAX_TERMS = 8  # Words of a query that are searched; the rest are ignored
+SEARCH_PREFIX_MIN_LENGTH = 2  # Shorter terms only match whole words
+SEARCH_TYPO_MIN_LENGTH = 4  # Shorter terms are not corrected
+
+# Relevance weights: how a term matched, times where it matched
+EXACT_WEIGHT = 1.0
+TYPO_WEIGHT = 0.6
+NAME_BOOST = 2.0
+SKILL_BOOST = 1.0
+
+# -----------------------------
+# Term Matching
+# -----------------------------
+
+def deletions(word: str) -> List[str]:
+    """
+    Returns every string made by deleting one character from 'word'.
+    """
+    return [word[:position] + word[position + 1:] for position in range(len(word))]
+
+def within_one_edit(a: str, b: str) -> bool:
+    """
+    Checks whether two words differ by at most one insertion, deletion,
+    substitution or swap of adjacent characters.
+    """
+    if a == b:
+        return True
+    if abs(len(a) - len(b)) > 1:
+        return False
+    if len(a) == len(b):
+        differences = [position for position in range(len(a)) if a[position] != b[position]]
+        if len(differences) == 1:
+            return True
+        first, second = differences[0], differences[-1]
+        return len(differences) == 2 and second == first + 1 and a[first] == b[second] and a[second] == b[first]
+    shorter, longer = (a, b) if len(a) < len(b) else (b, a)
+    position = next((i for i in range(len(shorter)) if shorter[i] != longer[i]), len(shorter))
+    return shorter[position:] == longer[position + 1:]
+
+def prefix_weight(term: str, word: str) -> float:
+    """
+    Weight of 'word' completing the prefix 'term'; closer completions rank higher.
+    """
+    return 0.5 + 0.4 * len(term) / len(word)
+
+class Vocabulary:
+    """
+    The distinct indexed words, with the lookups that expand a search term:
+    a sorted list for prefix ranges and a deletion index for typos, where every
+    word is filed under itself and each one-character deletion of it. Two words
+    within one edit share at least one of those keys, so a term's typo
+    candidates are found without comparing it against every word.
+    """
+
+    def __init__(self, words: Iterable[str]):
+        self.words = sorted(set(words))
+        self.variants: Dict[str, List[str]] = {}
+        for word in self.words:
+            if len(word) >= SEARCH_TYPO_MIN_LENGTH - 1:
+                for key in (word, *deletions(word)):
+                    self.variants.setdefault(key, []).append(word)
+
+    def completions(self, term: str) -> List[str]:
+        """
+        Returns the words that start with 'term' (other than 'term' itself).
+        """
+        found = []
+        position = bisect.bisect_left(self.words, term)
+        while position < len(self.words) and self.words[position].startswith(term):
+            if self.words[position] != term:
+                found.append(self.words[position])
+            position += 1
+        return found
+
+    def corrections(self, term: str) -> List[str]:
+        """
+        Returns the words within one edit of 'term' (other than 'term' itself).
+        """
+        candidates = set()
+        for key in (term, *deletions(term)):
+            candidates.update(self.variants.get(key, ()))
+        candidates.discard(term)
+        return [word for word in candidates if within_one_edit(term, word)]
+
+    def expand(self, term: str, max_expansions: int = SEARCH_MAX_EXPANSIONS) -> Dict[str, float]:
+        """
+        Returns {word: weight} for the words a query term matches: itself,
+        then its shortest completions and its typo corrections, at most
+        'max_expansions' of those two combined.
+        """
+        matches = {term: EXACT_WEIGHT}
+        expansions = []
+        if len(term) >= SEARCH_PREFIX_MIN_LENGTH:
+            expansions.extend((prefix_weight(term, word), word) for word in self.completions(term))
+        if len(term) >= SEARCH_TYPO_MIN_LENGTH:
+            expansions.extend((TYPO_WEIGHT, word) for word in self.corrections(term))
+        expansions.sort(key=lambda expansion: (-expansion[0], expansion[1]))
+        for weight, word in expansions:
+            if len(matches) > max_expansions:
+                break
+            matches.setdefault(word, weight)
+        return matches
+
+def relevance(document: dict, expansions: List[Dict[str, float]]) -> float:
+    """
+    Scores a document with 'name_tokens' and 'skill_tokens' against expanded
+    query terms: each term adds its best match, with name matches boosted.
+    """
+    names = document.get("name_tokens") or ()
+    skills = document.get("skill_tokens") or ()
+    score = 0.0
+    for matches in expansions:
+        best = 0.0
+        for token in names:
+            if token in matches and matches[token] * NAME_BOOST > best:
+                best = matches[token] * NAME_BOOST
+        for token in skills:
+            if token in matches and matches[token] * SKILL_BOOST > best:
+                best = matches[token] * SKILL_BOOST
+        score += best
+    return score
+
+# -----------------------------
+# Vocabulary Cache
+# -----------------------------
+
+class VocabularyCache:
+    """
+    Holds the process's Vocabulary and refreshes it every 'ttl_seconds'.
+    Only the first query waits for a load; later refreshes run in the
+    background while queries keep using the previous vocabulary, and the
+    index is built in a thread so a large vocabulary does not stall the event loop.
+    """
+
+    def __init__(self, ttl_seconds: float = SEARCH_VOCABULARY_TTL_SECONDS):
+        self.ttl_seconds = ttl_seconds
+        self.vocabulary: Optional[Vocabulary] = None
+        self.loaded_at = 0.0
+        self.refreshing: Optional[asyncio.Task] = None
+        self.refreshes = 0
+
+    async def get(self, load: Callable[[], Awaitable[List[str]]]) -> Vocabulary:
+        """
+        Returns the current vocabulary, loading the word list with 'load' when needed.
+        """
+        stale = self.vocabulary is None or time.monotonic() - self.loaded_at >= self.ttl_seconds
+        if stale and self.refreshing is None:
+            self.refreshing = asyncio.get_running_loop().create_task(self.refresh(load))
+        if self.vocabulary is None:
+            await asyncio.shield(self.refreshing)
+        return self.vocabulary
+
+    async def refresh(self, load: Callable[[], Awaitable[List[str]]]):
+        """
+        Loads the word list and swaps in a freshly built vocabulary.
+        If a background refresh fails, the previous vocabulary is kept for another interval.
+        """
+        try:
+            words = await load()
+            self.vocabulary = await asyncio.to_thread(Vocabulary, words)
+            self.loaded_at = time.monotonic()
+            self.refreshes += 1
+        except Exception:
+            if self.vocabulary is None:
+                raise
+            self.loaded_at = time.monotonic()
+        finally:
+            self.refreshing = None
+
+    def clear(self):
+        """
+        Forgets the vocabulary, so the next query loads it again.
+        """
+        self.vocabulary = None
+        self.loaded_at = 0.0
+
+# Shared vocabulary for ranked search
+search_vocabulary = VocabularyCache()
@@ -0,0 +1,69 @@
+"""
+Production entry point: serves the app with multiple uvicorn worker processes.
+
+Each worker imports the app on its own and opens its own MongoDB client
+in the lifespan, so no client or pool is shared across processes.
+The memory backend keeps its data inside one process, so it always runs a single worker.
+
+    python src/serve.py --workers 4
+"""
+import argparse
+import os
+
+import uvicorn
+from dotenv import load_dotenv
+
+# Load environment variables from .env file
+load_dotenv()
+
+# -----------------------------
+# Configuration Constants
+# -----------------------------
+HOST = os.getenv("HOST", "0.0.0.0")
+PORT = int(os.getenv("PORT", "8000"))
+WEB_CONCURRENCY = int(os.getenv("WEB_CONCURRENCY", str(os.cpu_count() or 1)))  # Worker processes
+STORAGE_BACKEND = os.getenv("STORAGE_BACKEND", "mongo")  # Same setting the workers read in storage
+PROMETHEUS_MULTIPROC_DIR = os.getenv("PROMETHEUS_MULTIPROC_DIR")  # Shared metrics files, read by every worker's /metrics
+# Open change feed streams never finish on their own; on shutdown they are cut
+# after this long, and clients reconnect with Last-Event-ID
+GRACEFUL_SHUTDOWN_SECONDS = float(os.getenv("GRACEFUL_SHUTDOWN_SECONDS", "5"))
+
+# -----------------------------
+# Entry Point
+# -----------------------------
+
+def reset_metrics_dir():
+    """
+    Empties the multiprocess metrics directory, so counters from a previous run are not merged in.
+    """
+    os.makedirs(PROMETHEUS_MULTIPROC_DIR, exist_ok=True)
+    for name in os.listdir(PROMETHEUS_MULTIPROC_DIR):
+        if name.endswith(".db"):
+            os.remove(os.path.join(PROMETHEUS_MULTIPROC_DIR, name))
+
+def main():
+    parser = argparse.ArgumentParser(description="Run the API with multiple worker processes")
+    parser.add_argument("--host", default=HOST)
+    parser.add_argument("--port", type=int, default=PORT)
+    parser.add_argument("--workers", type=int, default=WEB_CONCURRENCY)
+    args = parser.parse_args()
+
+    workers = args.workers
+    if STORAGE_BACKEND == "memory" and workers > 1:
+        print("STORAGE_BACKEND=memory keeps data per process; serving with 1 worker")
+        workers = 1
+    if PROMETHEUS_MULTIPROC_DIR:
+        reset_metrics_dir()
+
+    uvicorn.run(
+        "main:app",
+        app_dir=os.path.dirname(os.path.abspath(__file__)),
+        host=args.host,
+        port=args.port,
+        workers=workers,
+        access_log=False,  # Per-request logging costs more than the hot endpoints themselves
+        timeout_graceful_shutdown=GRACEFUL_SHUTDOWN_SECONDS,
+    )
+
+if __name__ == "__main__":
+    main()
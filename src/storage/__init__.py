@@ -0,0 +1,51 @@
+from dotenv import load_dotenv
+from typing import Optional
+import os
+
+import database
+from storage.base import AnalyticsUnavailable, ChangeHistoryLost, ChangeStreamUnavailable, DuplicateEmployeeError, EmployeeStore, SortKey
+from storage.memory import MemoryEmployeeStore
+from storage.mongo import MongoEmployeeStore
+
+# Load environment variables from .env file
+load_dotenv()
+
+# -----------------------------
+# Configuration Constants
+# -----------------------------
+STORAGE_BACKEND = os.getenv("STORAGE_BACKEND", "mongo")  # "mongo" or "memory"
+MEMORY_SNAPSHOT_PATH = os.getenv("MEMORY_SNAPSHOT_PATH")  # Memory backend only: load on start, save on shutdown
+
+# -----------------------------
+# Active Store
+# -----------------------------
+# Opened in the application lifespan, one per worker process, like the Motor client.
+
+store: Optional[EmployeeStore] = None
+
+def open_store(backend: Optional[str] = None) -> EmployeeStore:
+    """
+    Opens the configured storage backend for this process and returns it.
+    Does nothing if a store is already open.
+    """
+    global store
+    if store is not None:
+        return store
+    backend = backend or STORAGE_BACKEND
+    if backend == "mongo":
+        database.connect()
+        store = MongoEmployeeStore()
+    elif backend == "memory":
+        store = MemoryEmployeeStore(MEMORY_SNAPSHOT_PATH)
+    else:
+        raise ValueError(f"Unknown STORAGE_BACKEND {backend!r}; expected 'mongo' or 'memory'")
+    return store
+
+def close_store():
+    """
+    Closes this process's store (the MongoDB client, or the memory snapshot).
+    """
+    global store
+    if store is not None:
+        store.close()
+    store = None
@@ -0,0 +1,285 @@
+from datetime import datetime
+from typing import AsyncIterator, Callable, Dict, List, Optional, Tuple
+
+# Position in the newest-first order: (kind, joining_date, employee_id).
+# 'kind' is "date" or "string", since legacy documents store the date as a string.
+SortKey = Tuple[str, object, str]
+
+# Fields find_by_search_tokens() returns: what ranked search needs to score a candidate
+SEARCH_PROJECTION = {"_id": 0, "employee_id": 1, "name_tokens": 1, "skill_tokens": 1}
+
+# -----------------------------
+# Errors
+# -----------------------------
+
+class DuplicateEmployeeError(Exception):
+    """
+    Raised when an insert would break the unique 'employee_id' constraint.
+    """
+
+class AnalyticsUnavailable(Exception):
+    """
+    Raised when the backend cannot compute salary analytics (e.g. MongoDB older than 7.0).
+    """
+
+class ChangeStreamUnavailable(Exception):
+    """
+    Raised when the backend cannot watch for changes (e.g. MongoDB is not a replica set).
+    """
+
+class ChangeHistoryLost(Exception):
+    """
+    Raised when a change stream cannot resume from the given token any more.
+    """
+
+# -----------------------------
+# Storage Interface
+# -----------------------------
+
+class EmployeeStore:
+    """
+    Storage interface behind the CRUD functions.
+    Documents are dicts in the shape built by crud.employee_to_document();
+    projections use MongoDB inclusion syntax, e.g. {"_id": 0, "name": 1}.
+    Salary aggregates are documents of the form
+    {"_id": department, "count": ..., "sum": ..., "min": ..., "max": ..., "version": ...};
+    every incremental change bumps 'version' (missing until the first one).
+    """
+
+    name = "abstract"
+
+    # --- Lifecycle ---
+
+    async def ensure_schema(self, critical_only: bool = False) -> List[str]:
+        """
+        Creates missing indexes (only the critical ones if asked) and syncs any
+        schema validation. Returns the names of the indexes that were created.
+        """
+        raise NotImplementedError
+
+    def close(self):
+        """
+        Releases the backend's resources.
+        """
+        raise NotImplementedError
+
+    # --- Single-document writes ---
+
+    async def insert_one(self, document: dict):
+        """
+        Inserts one employee. Raises DuplicateEmployeeError if the ID exists.
+        """
+        raise NotImplementedError
+
+    async def insert_many(self, documents: List[dict]) -> Dict[int, Tuple[str, str]]:
+        """
+        Inserts every document it can, without stopping at the first failure.
+        Returns {position: (status, detail)} for the rows that failed,
+        where status is "duplicate" or "error".
+        """
+        raise NotImplementedError
+
+    async def update_one(self, employee_id: str, changes: dict, versions: Optional[List[int]] = None) -> Optional[dict]:
+        """
+        Sets 'changes' and bumps the version in one atomic step.
+        With 'versions', only applies if the current version is one of them
+        (a missing version counts as 0). Returns the pre-image, or None if nothing matched.
+        """
+        raise NotImplementedError
+
+    async def delete_one(self, employee_id: str, versions: Optional[List[int]] = None) -> Optional[dict]:
+        """
+        Deletes one employee, with the same version check as update_one().
+        Returns at least 'employee_id', 'department' and 'salary' of the
+        deleted document, or None if nothing matched.
+        """
+        raise NotImplementedError
+
+    # --- Reads ---
+
+    async def find_one(self, employee_id: str, projection: dict) -> Optional[dict]:
+        """
+        Returns one employee by ID, or None.
+        """
+        raise NotImplementedError
+
+    async def find_many(self, employee_ids: List[str], projection: dict) -> List[dict]:
+        """
+        Returns the employees with the given IDs in any order; unknown IDs are skipped.
+        The projection must include 'employee_id' so callers can match results up.
+        """
+        raise NotImplementedError
+
+    async def exists(self, employee_id: str) -> bool:
+        """
+        Checks whether an employee ID is taken.
+        """
+        raise NotImplementedError
+
+    def find_all(self, projection: dict) -> AsyncIterator[dict]:
+        """
+        Yields every employee in storage order.
+        """
+        raise NotImplementedError
+
+    def find_by_department(self, department: str, projection: dict, batch_size: Optional[int] = None) -> AsyncIterator[dict]:
+        """
+        Yields a department's employees, newest first.
+        'batch_size' is a hint for how many documents to fetch per round trip.
+        """
+        raise NotImplementedError
+
+    async def find_newest(self, projection: dict, skip: int = 0, limit: Optional[int] = None,
+                          after: Optional[SortKey] = None) -> List[dict]:
+        """
+        Returns employees newest first (joining_date, then employee_id, descending),
+        optionally starting strictly after the 'after' sort key.
+        """
+        raise NotImplementedError
+
+    async def find_by_skill_tokens(self, tokens: List[str], match_all: bool, projection: dict,
+                                   skip: int = 0, limit: Optional[int] = None) -> List[dict]:
+        """
+        Returns employees whose 'skill_tokens' contain any (or all) of 'tokens',
+        sorted by employee_id.
+        """
+        raise NotImplementedError
+
+    async def find_by_search_tokens(self, groups: List[List[str]], limit: int) -> List[dict]:
+        """
+        Returns up to 'limit' employees that, for every group, have one of the
+        group's words in 'name_tokens' or 'skill_tokens', in no particular order.
+        Only the SEARCH_PROJECTION fields ('employee_id', 'name_tokens', 'skill_tokens') are returned.
+        """
+        raise NotImplementedError
+
+    async def search_vocabulary(self) -> List[str]:
+        """
+        Returns the distinct single words in 'name_tokens' and 'skill_tokens'.
+        """
+        raise NotImplementedError
+
+    async def count(self, estimate: bool = False) -> int:
+        """
+        Counts employees; 'estimate' allows a cheaper, possibly stale answer.
+        """
+        raise NotImplementedError
+
+    async def backfill_tokens(self, field: str, source: str, tokenize: Callable[[object], List[str]],
+                              batch_size: int = 1000, retokenize: bool = False) -> int:
+        """
+        Sets 'field' to tokenize(document[source]) on documents that lack it,
+        e.g. ("skill_tokens", "skills", crud.skill_tokens); with 'retokenize', on
+        every document whose stored tokens differ. A document whose 'source'
+        changes meanwhile is left to the write that changed it. Returns the number updated.
+        """
+        raise NotImplementedError
+
+    # --- Salary analytics ---
+
+    async def compute_salary_analytics(self, department: Optional[str] = None, joined_from: Optional[datetime] = None,
+                                       joined_to: Optional[datetime] = None, bucket_width: float = 10000) -> Dict[str, dict]:
+        """
+        Computes each department's salary distribution in one pass over the matching employees:
+        {department: {"headcount", "min", "max", "avg", "median", "p90", "histogram": {bucket_start: count}}}.
+        'joined_from' and 'joined_to' bound the joining date (both inclusive).
+        Histogram buckets are 'bucket_width' wide and start at multiples of it; empty ones are left out.
+        """
+        raise NotImplementedError
+
+    # --- Department salary aggregates ---
+
+    async def compute_salary_stats(self, department: Optional[str] = None) -> Dict[str, dict]:
+        """
+        Computes the aggregates from the employees themselves (one department or all).
+        """
+        raise NotImplementedError
+
+    async def add_salary_stats(self, groups: Dict[str, dict]):
+        """
+        Folds per-department {count, sum, min, max} deltas into the aggregates.
+        """
+        raise NotImplementedError
+
+    async def remove_salary(self, department: str, salary: float) -> Optional[dict]:
+        """
+        Takes one salary out of a department's count and sum.
+        Returns the aggregate afterwards, or None if the department had none.
+        """
+        raise NotImplementedError
+
+    async def find_salary_stats(self, department: str) -> Optional[dict]:
+        """
+        Returns one department's aggregate, or None.
+        """
+        raise NotImplementedError
+
+    async def reset_salary_bounds(self, department: str, bounds: Optional[dict], version: Optional[int]) -> bool:
+        """
+        Sets one department's 'min' and 'max' from 'bounds' ({"min", "max"}),
+        leaving 'count' and 'sum' alone; None removes the aggregate instead.
+        Only applies while the aggregate is still at 'version'.
+        Returns False if it changed in between (or is gone).
+        """
+        raise NotImplementedError
+
+    async def replace_salary_stats(self, expected: Dict[str, dict]):
+        """
+        Replaces every aggregate with 'expected'.
+        """
+        raise NotImplementedError
+
+    async def list_salary_stats(self) -> List[dict]:
+        """
+        Returns the aggregates of non-empty departments, sorted by department.
+        """
+        raise NotImplementedError
+
+    async def has_salary_stats(self) -> bool:
+        """
+        Checks whether any aggregate exists yet.
+        """
+        raise NotImplementedError
+
+    # --- Change stream ---
+
+    def watch_changes(self, resume_after: Optional[str] = None) -> AsyncIterator[Optional[dict]]:
+        """
+        Yields employee writes in commit order as {"token", "operation", "document", "previous"}:
+        'operation' is "insert", "update", "replace" or "delete", 'document' the
+        post-image and 'previous' the pre-image (either may be None).
+        Yields None whenever it has caught up with the latest change and is idle;
+        a new stream does so as soon as it is open and caught up.
+        'resume_after' continues after the change with that token; raises
+        ChangeHistoryLost if that is no longer possible and ChangeStreamUnavailable
+        if the backend cannot watch at all.
+        """
+        raise NotImplementedError
+
+    # --- Import jobs ---
+
+    async def insert_import_job(self, job: dict):
+        """
+        Stores a new import job, identified by its 'job_id'.
+        """
+        raise NotImplementedError
+
+    async def update_import_job(self, job_id: str, changes: dict, errors: List[dict] = (), max_errors: int = 1000):
+        """
+        Sets 'changes' on a job and appends 'errors' to its 'errors' list,
+        keeping only the first 'max_errors' entries.
+        """
+        raise NotImplementedError
+
+    async def find_import_job(self, job_id: str, errors: Optional[Tuple[int, int]] = None) -> Optional[dict]:
+        """
+        Returns a job without its 'errors' list, or, given errors=(skip, limit),
+        with just that slice of it. Returns None if the job does not exist.
+        """
+        raise NotImplementedError
+
+    async def list_import_jobs(self, limit: int = 20) -> List[dict]:
+        """
+        Returns the most recent jobs, newest first, without their 'errors' lists.
+        """
+        raise NotImplementedError
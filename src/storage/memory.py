@@ -0,0 +1,471 @@
+from bson import json_util
+from datetime import datetime
+from typing import Callable, Dict, Iterable, List, Optional, Set, Tuple
+import asyncio
+import bisect
+import math
+import os
+
+from storage.base import SEARCH_PROJECTION, ChangeHistoryLost, DuplicateEmployeeError, EmployeeStore, SortKey
+
+# Import jobs kept in memory; older ones are dropped
+MEMORY_MAX_IMPORT_JOBS = 100
+
+# How long an idle change watcher waits before reporting that it is caught up
+MEMORY_CHANGE_POLL_SECONDS = 1.0
+
+# Fields whose changes move a document within the secondary indexes
+INDEXED_FIELDS = ("department", "joining_date", "name_tokens", "skill_tokens")
+
+# -----------------------------
+# Index Helpers
+# -----------------------------
+
+def index_key(document: dict) -> tuple:
+    """
+    Sort key of a document in ascending (joining_date, employee_id) order.
+    The leading rank mirrors BSON ordering, where strings sort before dates.
+    """
+    joining_date = document.get("joining_date")
+    if isinstance(joining_date, datetime):
+        return (1, joining_date, document["employee_id"])
+    return (0, str(joining_date), document["employee_id"])
+
+def seek_key(after: SortKey) -> tuple:
+    """
+    Converts a cursor sort key into an index key.
+    """
+    kind, value, employee_id = after
+    return (1 if kind == "date" else 0, value, employee_id)
+
+def remove_key(keys: List[tuple], key: tuple):
+    """
+    Removes one key from a sorted index list, if present.
+    """
+    position = bisect.bisect_left(keys, key)
+    if position < len(keys) and keys[position] == key:
+        del keys[position]
+
+def project(document: dict, projection: dict) -> dict:
+    """
+    Applies a MongoDB inclusion projection, keeping the document's field order.
+    Lists are copied so callers never share state with the store.
+    """
+    return {
+        field: list(value) if isinstance(value, list) else value
+        for field, value in document.items()
+        if projection.get(field)
+    }
+
+def salary_stats_for(documents: Iterable[dict]) -> Dict[str, dict]:
+    """
+    Computes count/sum/min/max salary per department, shaped like the Mongo aggregates.
+    """
+    groups = {}
+    for document in documents:
+        department, salary = document["department"], document["salary"]
+        stats = groups.get(department)
+        if stats is None:
+            groups[department] = {"_id": department, "count": 1, "sum": salary, "min": salary, "max": salary}
+        else:
+            stats["count"] += 1
+            stats["sum"] += salary
+            stats["min"] = min(stats["min"], salary)
+            stats["max"] = max(stats["max"], salary)
+    return groups
+
+def nearest_rank(ordered: List[float], fraction: float) -> float:
+    """
+    Returns the nearest-rank percentile of an ascending list (fraction in 0..1).
+    """
+    return ordered[min(len(ordered) - 1, max(0, math.ceil(fraction * len(ordered)) - 1))]
+
+def salary_analytics_for(documents: Iterable[dict], bucket_width: float) -> Dict[str, dict]:
+    """
+    Computes the salary distribution per department, shaped like the Mongo analytics.
+    Percentiles are exact here; MongoDB estimates them.
+    """
+    salaries = {}
+    for document in documents:
+        salaries.setdefault(document["department"], []).append(document["salary"])
+
+    analytics = {}
+    for department, values in salaries.items():
+        values.sort()
+        histogram = {}
+        for salary in values:
+            bucket = math.floor(salary / bucket_width) * bucket_width
+            histogram[bucket] = histogram.get(bucket, 0) + 1
+        analytics[department] = {
+            "headcount": len(values),
+            "min": values[0],
+            "max": values[-1],
+            "avg": sum(values) / len(values),
+            "median": nearest_rank(values, 0.5),
+            "p90": nearest_rank(values, 0.9),
+            "histogram": histogram,
+        }
+    return analytics
+
+# -----------------------------
+# In-Memory Storage
+# -----------------------------
+
+class MemoryEmployeeStore(EmployeeStore):
+    """
+    Keeps employees in process memory with the same semantics as the Mongo store.
+    Indexes are maintained on every write:
+    - a hash index on 'employee_id', which also enforces uniqueness,
+    - a hash index on 'department' holding each department's keys in sorted order,
+    - a sorted (joining_date, employee_id) index for newest-first listings,
+    - inverted indexes from name and skill tokens to employee IDs.
+    Every method runs without awaiting, so each call is atomic on the event loop.
+    Writes are numbered and handed to change watchers as they happen; no change
+    history is kept, so watchers can only resume from the latest change.
+    Data is private to the worker process; 'snapshot_path' optionally persists it
+    across restarts (loaded on start, written on close).
+    """
+
+    name = "memory"
+
+    def __init__(self, snapshot_path: Optional[str] = None):
+        self.snapshot_path = snapshot_path
+        self.documents: Dict[str, dict] = {}  # employee_id -> document
+        self.by_department: Dict[str, List[tuple]] = {}  # department -> sorted index keys
+        self.by_joining_date: List[tuple] = []  # sorted index keys
+        self.by_name_token: Dict[str, Set[str]] = {}  # name token -> employee IDs
+        self.by_skill_token: Dict[str, Set[str]] = {}  # skill token -> employee IDs
+        self.salary_stats: Dict[str, dict] = {}  # department -> aggregate
+        self.import_jobs: Dict[str, dict] = {}  # job_id -> job, oldest first
+        self.change_sequence = 0  # Number of the latest write, the change token
+        self.change_watchers: List[asyncio.Queue] = []
+        if snapshot_path and os.path.exists(snapshot_path):
+            self.load_snapshot()
+
+    # --- Index maintenance ---
+
+    def add_document(self, document: dict):
+        document.pop("_id", None)
+        self.documents[document["employee_id"]] = document
+        self.index_document(document)
+
+    def index_document(self, document: dict):
+        key = index_key(document)
+        bisect.insort(self.by_joining_date, key)
+        bisect.insort(self.by_department.setdefault(document["department"], []), key)
+        for field, postings in self.token_indexes():
+            for token in document.get(field) or ():
+                postings.setdefault(token, set()).add(document["employee_id"])
+
+    def unindex_document(self, document: dict):
+        key = index_key(document)
+        remove_key(self.by_joining_date, key)
+        keys = self.by_department.get(document["department"])
+        if keys is not None:
+            remove_key(keys, key)
+            if not keys:
+                del self.by_department[document["department"]]
+        for field, postings in self.token_indexes():
+            for token in document.get(field) or ():
+                ids = postings.get(token)
+                if ids is not None:
+                    ids.discard(document["employee_id"])
+                    if not ids:
+                        del postings[token]
+
+    def token_indexes(self) -> List[Tuple[str, Dict[str, Set[str]]]]:
+        return [("name_tokens", self.by_name_token), ("skill_tokens", self.by_skill_token)]
+
+    def record_change(self, operation: str, document: Optional[dict], previous: Optional[dict]):
+        """
+        Numbers a write and hands it to every change watcher, with copies of its images.
+        """
+        self.change_sequence += 1
+        if self.change_watchers:
+            change = {
+                "token": str(self.change_sequence),
+                "operation": operation,
+                "document": dict(document) if document is not None else None,
+                "previous": dict(previous) if previous is not None else None,
+            }
+            for queue in self.change_watchers:
+                queue.put_nowait(change)
+
+    def matching(self, employee_id: str, versions: Optional[List[int]]) -> Optional[dict]:
+        document = self.documents.get(employee_id)
+        if document is None or (versions is not None and document.get("version", 0) not in versions):
+            return None
+        return document
+
+    # --- Snapshot persistence ---
+
+    def load_snapshot(self):
+        """
+        Loads documents from an Extended JSON lines file and rebuilds the aggregates.
+        """
+        with open(self.snapshot_path, encoding="utf-8") as snapshot:
+            for line in snapshot:
+                if line.strip():
+                    self.add_document(json_util.loads(line))
+        self.salary_stats = salary_stats_for(self.documents.values())
+
+    def save_snapshot(self):
+        """
+        Writes every document to the snapshot file, replacing it atomically.
+        """
+        temporary = f"{self.snapshot_path}.tmp"
+        with open(temporary, "w", encoding="utf-8") as snapshot:
+            for document in self.documents.values():
+                snapshot.write(json_util.dumps(document) + "\n")
+        os.replace(temporary, self.snapshot_path)
+
+    # --- EmployeeStore ---
+
+    async def ensure_schema(self, critical_only: bool = False) -> List[str]:
+        return []  # Indexes are maintained on every write
+
+    def close(self):
+        if self.snapshot_path:
+            self.save_snapshot()
+
+    async def insert_one(self, document: dict):
+        if document["employee_id"] in self.documents:
+            raise DuplicateEmployeeError(document["employee_id"])
+        self.add_document(dict(document))
+        self.record_change("insert", document, None)
+
+    async def insert_many(self, documents: List[dict]) -> Dict[int, Tuple[str, str]]:
+        failures = {}
+        for position, document in enumerate(documents):
+            if document["employee_id"] in self.documents:
+                failures[position] = ("duplicate", "Employee ID already exists")
+            else:
+                self.add_document(dict(document))
+                self.record_change("insert", document, None)
+        return failures
+
+    async def update_one(self, employee_id: str, changes: dict, versions: Optional[List[int]] = None) -> Optional[dict]:
+        document = self.matching(employee_id, versions)
+        if document is None:
+            return None
+        before = dict(document)
+        reindex = any(field in changes for field in INDEXED_FIELDS)
+        if reindex:
+            self.unindex_document(document)
+        document.update(changes)
+        document["version"] = before.get("version", 0) + 1
+        if reindex:
+            self.index_document(document)
+        self.record_change("update", document, before)
+        return before
+
+    async def delete_one(self, employee_id: str, versions: Optional[List[int]] = None) -> Optional[dict]:
+        document = self.matching(employee_id, versions)
+        if document is None:
+            return None
+        del self.documents[employee_id]
+        self.unindex_document(document)
+        self.record_change("delete", None, document)
+        return document
+
+    async def find_one(self, employee_id: str, projection: dict) -> Optional[dict]:
+        document = self.documents.get(employee_id)
+        return project(document, projection) if document is not None else None
+
+    async def find_many(self, employee_ids: List[str], projection: dict) -> List[dict]:
+        documents = (self.documents.get(employee_id) for employee_id in employee_ids)
+        return [project(document, projection) for document in documents if document is not None]
+
+    async def exists(self, employee_id: str) -> bool:
+        return employee_id in self.documents
+
+    async def find_all(self, projection: dict):
+        for document in list(self.documents.values()):
+            yield project(document, projection)
+
+    async def find_by_department(self, department: str, projection: dict, batch_size: Optional[int] = None):
+        # Iterate over a copy of the keys, since writes can land between yields
+        for key in reversed(list(self.by_department.get(department, ()))):
+            document = self.documents.get(key[2])
+            if document is not None and document["department"] == department:
+                yield project(document, projection)
+
+    async def find_newest(self, projection: dict, skip: int = 0, limit: Optional[int] = None,
+                          after: Optional[SortKey] = None) -> List[dict]:
+        keys = self.by_joining_date
+        end = len(keys) if after is None else bisect.bisect_left(keys, seek_key(after))
+        end = max(end - skip, 0)
+        start = 0 if limit is None else max(end - limit, 0)
+        return [project(self.documents[key[2]], projection) for key in reversed(keys[start:end])]
+
+    async def find_by_skill_tokens(self, tokens: List[str], match_all: bool, projection: dict,
+                                   skip: int = 0, limit: Optional[int] = None) -> List[dict]:
+        postings = [self.by_skill_token.get(token, set()) for token in tokens]
+        if not postings:
+            return []
+        if match_all:
+            postings.sort(key=len)  # Intersect starting from the rarest token
+            ids = postings[0].intersection(*postings[1:])
+        else:
+            ids = set().union(*postings)
+        matched = sorted(ids)[skip:None if limit is None else skip + limit]
+        return [project(self.documents[employee_id], projection) for employee_id in matched]
+
+    async def find_by_search_tokens(self, groups: List[List[str]], limit: int) -> List[dict]:
+        # Walk the postings of the rarest group and probe the others, stopping after
+        # 'limit' matches like the Mongo cursor, instead of materializing every match
+        postings = [
+            [ids for word in words for ids in (self.by_name_token.get(word), self.by_skill_token.get(word)) if ids]
+            for words in groups
+        ]
+        postings.sort(key=lambda group: sum(map(len, group)))
+        rarest, others = postings[0], postings[1:]
+        matched = []
+        seen = set()
+        for ids in rarest:
+            for employee_id in ids:
+                if employee_id in seen:
+                    continue
+                seen.add(employee_id)
+                if all(any(employee_id in other for other in group) for group in others):
+                    matched.append(project(self.documents[employee_id], SEARCH_PROJECTION))
+                    if len(matched) >= limit:
+                        return matched
+        return matched
+
+    async def search_vocabulary(self) -> List[str]:
+        return sorted({token for token in (*self.by_name_token, *self.by_skill_token) if " " not in token})
+
+    async def count(self, estimate: bool = False) -> int:
+        return len(self.documents)
+
+    async def backfill_tokens(self, field: str, source: str, tokenize: Callable[[object], List[str]],
+                              batch_size: int = 1000, retokenize: bool = False) -> int:
+        postings = dict(self.token_indexes())[field]
+        updated = 0
+        for document in self.documents.values():
+            if field in document and not retokenize:
+                continue
+            tokens = tokenize(document.get(source) or [])
+            if document.get(field) == tokens:
+                continue
+            for token in document.get(field) or ():
+                ids = postings.get(token)
+                if ids is not None:
+                    ids.discard(document["employee_id"])
+                    if not ids:
+                        del postings[token]
+            document[field] = tokens
+            for token in tokens:
+                postings.setdefault(token, set()).add(document["employee_id"])
+            updated += 1
+        return updated
+
+    async def compute_salary_analytics(self, department: Optional[str] = None, joined_from: Optional[datetime] = None,
+                                       joined_to: Optional[datetime] = None, bucket_width: float = 10000) -> Dict[str, dict]:
+        if department is None:
+            documents = self.documents.values()
+        else:
+            documents = (self.documents[key[2]] for key in self.by_department.get(department, ()))
+        if joined_from is not None or joined_to is not None:
+            # Like a BSON date range, this never matches legacy string dates
+            documents = [
+                document for document in documents
+                if isinstance(document["joining_date"], datetime)
+                and (joined_from is None or document["joining_date"] >= joined_from)
+                and (joined_to is None or document["joining_date"] <= joined_to)
+            ]
+        return salary_analytics_for(documents, bucket_width)
+
+    async def compute_salary_stats(self, department: Optional[str] = None) -> Dict[str, dict]:
+        if department is None:
+            return salary_stats_for(self.documents.values())
+        return salary_stats_for(self.documents[key[2]] for key in self.by_department.get(department, ()))
+
+    async def add_salary_stats(self, groups: Dict[str, dict]):
+        for department, delta in groups.items():
+            stats = self.salary_stats.get(department)
+            if stats is None:
+                self.salary_stats[department] = {"_id": department, "count": delta["count"], "sum": delta["sum"],
+                                                 "min": delta["min"], "max": delta["max"], "version": 1}
+            else:
+                stats["count"] += delta["count"]
+                stats["sum"] += delta["sum"]
+                stats["min"] = min(stats["min"], delta["min"])
+                stats["max"] = max(stats["max"], delta["max"])
+                stats["version"] = stats.get("version", 0) + 1
+
+    async def remove_salary(self, department: str, salary: float) -> Optional[dict]:
+        stats = self.salary_stats.get(department)
+        if stats is None:
+            return None
+        stats["count"] -= 1
+        stats["sum"] -= salary
+        stats["version"] = stats.get("version", 0) + 1
+        return dict(stats)
+
+    async def find_salary_stats(self, department: str) -> Optional[dict]:
+        stats = self.salary_stats.get(department)
+        return dict(stats) if stats is not None else None
+
+    async def reset_salary_bounds(self, department: str, bounds: Optional[dict], version: Optional[int]) -> bool:
+        stats = self.salary_stats.get(department)
+        if stats is None or stats.get("version") != version:
+            return False
+        if bounds is None:
+            del self.salary_stats[department]
+        else:
+            stats["min"] = bounds["min"]
+            stats["max"] = bounds["max"]
+        return True
+
+    async def replace_salary_stats(self, expected: Dict[str, dict]):
+        self.salary_stats = {department: {**stats, "_id": department} for department, stats in expected.items()}
+
+    async def list_salary_stats(self) -> List[dict]:
+        return [dict(self.salary_stats[department]) for department in sorted(self.salary_stats)
+                if self.salary_stats[department]["count"] > 0]
+
+    async def has_salary_stats(self) -> bool:
+        return bool(self.salary_stats)
+
+    async def watch_changes(self, resume_after: Optional[str] = None):
+        if resume_after is not None and resume_after != str(self.change_sequence):
+            raise ChangeHistoryLost(f"Cannot resume after change {resume_after}; the memory store keeps no change history")
+        queue = asyncio.Queue()
+        self.change_watchers.append(queue)
+        try:
+            yield None
+            while True:
+                try:
+                    yield await asyncio.wait_for(queue.get(), timeout=MEMORY_CHANGE_POLL_SECONDS)
+                except asyncio.TimeoutError:
+                    yield None
+        finally:
+            self.change_watchers.remove(queue)
+
+    async def insert_import_job(self, job: dict):
+        self.import_jobs[job["job_id"]] = {**job, "errors": []}
+        # Jobs are not persisted; keep only the newest ones, like a TTL would
+        while len(self.import_jobs) > MEMORY_MAX_IMPORT_JOBS:
+            del self.import_jobs[next(iter(self.import_jobs))]
+
+    async def update_import_job(self, job_id: str, changes: dict, errors: List[dict] = (), max_errors: int = 1000):
+        job = self.import_jobs.get(job_id)
+        if job is not None:
+            job.update(changes)
+            job["errors"] = (job["errors"] + list(errors))[:max_errors]
+
+    async def find_import_job(self, job_id: str, errors: Optional[Tuple[int, int]] = None) -> Optional[dict]:
+        job = self.import_jobs.get(job_id)
+        if job is None:
+            return None
+        found = {field: value for field, value in job.items() if field != "errors"}
+        if errors is not None:
+            skip, limit = errors
+            found["errors"] = job["errors"][skip:skip + limit]
+        return found
+
+    async def list_import_jobs(self, limit: int = 20) -> List[dict]:
+        newest = list(self.import_jobs.values())[::-1][:limit]
+        return [{field: value for field, value in job.items() if field != "errors"} for job in newest]
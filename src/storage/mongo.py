@@ -0,0 +1,516 @@
+from pymongo import ReplaceOne, ReturnDocument, UpdateOne
+from pymongo.errors import BulkWriteError, DuplicateKeyError, OperationFailure
+from datetime import datetime
+from typing import Callable, Dict, List, Optional, Tuple
+import time
+
+import database
+from profiler import query_profiler
+from storage.base import SEARCH_PROJECTION, AnalyticsUnavailable, ChangeHistoryLost, ChangeStreamUnavailable, DuplicateEmployeeError, EmployeeStore, SortKey
+
+# MongoDB error code for a unique index violation
+DUPLICATE_KEY_ERROR = 11000
+
+# Sort order for newest-first listings; matches the (joining_date, employee_id) index
+NEWEST_FIRST = [("joining_date", -1), ("employee_id", -1)]
+
+# Fields delete_one() needs to return for the aggregates and cache invalidation
+DELETED_PROJECTION = {"employee_id": 1, "department": 1, "salary": 1}
+
+# Change stream events that are published; drops, renames and invalidations are not
+CHANGE_OPERATIONS = ["insert", "update", "replace", "delete"]
+
+# How long an idle change stream waits on the server before reporting that it is caught up
+CHANGE_STREAM_MAX_AWAIT_MS = 1000
+
+# MongoDB error codes for a server that cannot run change streams (not a replica set)
+# and for a resume token that is invalid or older than the oplog
+CHANGE_STREAM_UNSUPPORTED_ERRORS = {40573}
+CHANGE_HISTORY_LOST_ERRORS = {260, 280, 286}
+
+# MongoDB error codes for an unknown $percentile accumulator or expression
+# (servers older than 7.0, or a feature compatibility version below it)
+PERCENTILE_UNSUPPORTED_ERRORS = {15952, 168}
+
+# -----------------------------
+# Query Helpers
+# -----------------------------
+
+def version_filter(employee_id: str, versions: Optional[List[int]] = None) -> dict:
+    """
+    Builds the lookup filter for a conditional write.
+    Documents written before versioning have no 'version' field and count as version 0.
+    """
+    query = {"employee_id": employee_id}
+    if versions is not None:
+        allowed = list(versions)
+        if 0 in allowed:
+            allowed.append(None)  # Matches documents missing the field
+        query["version"] = {"$in": allowed}
+    return query
+
+def seek_filter(after: SortKey) -> dict:
+    """
+    Builds a filter that seeks past a sort key in newest-first order.
+    """
+    kind, value, employee_id = after
+    seek = [
+        {"joining_date": {"$lt": value}},
+        {"joining_date": value, "employee_id": {"$lt": employee_id}},
+    ]
+    if kind == "date":
+        # Descending order puts dates before strings; continue into string dates afterwards
+        seek.append({"joining_date": {"$type": "string"}})
+    return {"$or": seek}
+
+def find_command(query: dict, projection: dict, sort: Optional[list] = None, skip: int = 0,
+                 limit: Optional[int] = None) -> dict:
+    """
+    Builds the 'find' command equivalent to a cursor, for explain().
+    """
+    command = {"find": database.employees_collection.name, "filter": query, "projection": projection}
+    if sort:
+        command["sort"] = dict(sort)
+    if skip:
+        command["skip"] = skip
+    if limit is not None:
+        command["limit"] = limit
+    return command
+
+async def explain(command: dict) -> dict:
+    """
+    Runs a command through explain with execution statistics; nothing is written.
+    """
+    return await database.db.command({"explain": command, "verbosity": "executionStats"})
+
+def profile(operation: str, started: float, command: Callable[[], dict]):
+    """
+    Reports a query's duration to the slow-query profiler, if it is enabled.
+    """
+    if query_profiler.enabled:
+        query_profiler.observe(operation, time.perf_counter() - started, command, explain)
+
+async def profiled_iteration(operation: str, cursor, command: Callable[[], dict]):
+    """
+    Yields a cursor's documents, timing only the time spent fetching them
+    (not the time the consumer spends between documents).
+    """
+    elapsed = 0.0
+    while True:
+        started = time.perf_counter()
+        try:
+            document = await cursor.next()
+        except StopAsyncIteration:
+            elapsed += time.perf_counter() - started
+            break
+        elapsed += time.perf_counter() - started
+        yield document
+    if query_profiler.enabled:
+        query_profiler.observe(operation, elapsed, command, explain)
+
+def salary_analytics_pipeline(match: dict, bucket_width: float) -> List[dict]:
+    """
+    Aggregation pipeline that computes each department's salary distribution in
+    one pass: $facet feeds the same matched documents to a per-department summary
+    and to a per-(department, bucket) histogram. $percentile is approximate
+    (t-digest) and needs MongoDB 7.0 or newer. $facet returns one document,
+    which must stay under 16MB; callers bound the buckets per department.
+    """
+    return [
+        {"$match": match},
+        {"$facet": {
+            "summary": [{"$group": {
+                "_id": "$department",
+                "headcount": {"$sum": 1},
+                "min": {"$min": "$salary"},
+                "max": {"$max": "$salary"},
+                "avg": {"$avg": "$salary"},
+                "percentiles": {"$percentile": {"input": "$salary", "p": [0.5, 0.9], "method": "approximate"}},
+            }}],
+            "histogram": [{"$group": {
+                "_id": {
+                    "department": "$department",
+                    "bucket": {"$multiply": [{"$floor": {"$divide": ["$salary", bucket_width]}}, bucket_width]},
+                },
+                "count": {"$sum": 1},
+            }}],
+        }},
+    ]
+
+def salary_stats_pipeline(match: Optional[dict] = None) -> List[dict]:
+    """
+    Aggregation pipeline that computes count/sum/min/max salary per department
+    in the same shape as the 'department_stats' documents.
+    """
+    pipeline = [{"$match": match}] if match else []
+    pipeline.append({"$group": {
+        "_id": "$department",
+        "count": {"$sum": 1},
+        "sum": {"$sum": "$salary"},
+        "min": {"$min": "$salary"},
+        "max": {"$max": "$salary"},
+    }})
+    return pipeline
+
+# -----------------------------
+# MongoDB Storage
+# -----------------------------
+
+class MongoEmployeeStore(EmployeeStore):
+    """
+    Stores employees in MongoDB through this process's Motor client.
+    Collections are looked up on the 'database' module at call time,
+    so the store follows database.connect() and close().
+    Employee queries report to the slow-query profiler (see profiler.py).
+    """
+
+    name = "mongo"
+
+    async def ensure_schema(self, critical_only: bool = False) -> List[str]:
+        created = await database.create_indexes(critical_only=critical_only)
+        await database.ensure_collection_validator()
+        if not critical_only:
+            created += await database.create_import_job_indexes()
+            await database.ensure_change_stream_pre_images()
+        return created
+
+    def close(self):
+        database.close()
+
+    async def insert_one(self, document: dict):
+        try:
+            await database.employees_collection.insert_one(document)
+        except DuplicateKeyError:
+            raise DuplicateEmployeeError(document["employee_id"])
+
+    async def insert_many(self, documents: List[dict]) -> Dict[int, Tuple[str, str]]:
+        failures = {}
+        try:
+            await database.employees_collection.insert_many(documents, ordered=False)
+        except BulkWriteError as e:
+            # With ordered=False every row is attempted; collect the ones that failed
+            for error in e.details.get("writeErrors", []):
+                if error.get("code") == DUPLICATE_KEY_ERROR:
+                    failures[error["index"]] = ("duplicate", "Employee ID already exists")
+                else:
+                    failures[error["index"]] = ("error", error.get("errmsg", "Write failed"))
+        return failures
+
+    async def update_one(self, employee_id: str, changes: dict, versions: Optional[List[int]] = None) -> Optional[dict]:
+        query = version_filter(employee_id, versions)
+        update = {"$set": changes, "$inc": {"version": 1}}
+        started = time.perf_counter()
+        document = await database.employees_collection.find_one_and_update(query, update, return_document=ReturnDocument.BEFORE)
+        profile("update_one", started, lambda: {
+            "findAndModify": database.employees_collection.name, "query": query, "update": update,
+        })
+        return document
+
+    async def delete_one(self, employee_id: str, versions: Optional[List[int]] = None) -> Optional[dict]:
+        query = version_filter(employee_id, versions)
+        started = time.perf_counter()
+        document = await database.employees_collection.find_one_and_delete(query, projection=DELETED_PROJECTION)
+        profile("delete_one", started, lambda: {
+            "findAndModify": database.employees_collection.name, "query": query, "remove": True, "fields": DELETED_PROJECTION,
+        })
+        return document
+
+    async def find_one(self, employee_id: str, projection: dict) -> Optional[dict]:
+        query = {"employee_id": employee_id}
+        started = time.perf_counter()
+        document = await database.employees_collection.find_one(query, projection)
+        profile("find_one", started, lambda: find_command(query, projection, limit=1))
+        return document
+
+    async def find_many(self, employee_ids: List[str], projection: dict) -> List[dict]:
+        # One $in lookup on the unique employee_id index instead of a round trip per ID
+        query = {"employee_id": {"$in": employee_ids}}
+        started = time.perf_counter()
+        documents = await database.employees_collection.find(query, projection).to_list(length=len(employee_ids))
+        profile("find_many", started, lambda: find_command(query, projection))
+        return documents
+
+    async def exists(self, employee_id: str) -> bool:
+        return await database.employees_collection.find_one({"employee_id": employee_id}, {"_id": 1}) is not None
+
+    def find_all(self, projection: dict):
+        cursor = database.employees_collection.find({}, projection)
+        return profiled_iteration("find_all", cursor, lambda: find_command({}, projection))
+
+    def find_by_department(self, department: str, projection: dict, batch_size: Optional[int] = None):
+        # Served by the (department, joining_date, employee_id) index, so the first rows arrive immediately
+        query = {"department": department}
+        cursor = database.employees_collection.find(query, projection).sort(NEWEST_FIRST)
+        if batch_size is not None:
+            cursor = cursor.batch_size(batch_size)
+        return profiled_iteration("find_by_department", cursor, lambda: find_command(query, projection, NEWEST_FIRST))
+
+    async def find_newest(self, projection: dict, skip: int = 0, limit: Optional[int] = None,
+                          after: Optional[SortKey] = None) -> List[dict]:
+        query = seek_filter(after) if after is not None else {}
+        cursor = database.employees_collection.find(query, projection).sort(NEWEST_FIRST)
+        if skip:
+            cursor = cursor.skip(skip)
+        if limit is not None:
+            cursor = cursor.limit(limit)
+        started = time.perf_counter()
+        documents = await cursor.to_list(length=limit)
+        profile("find_newest", started, lambda: find_command(query, projection, NEWEST_FIRST, skip, limit))
+        return documents
+
+    async def find_by_skill_tokens(self, tokens: List[str], match_all: bool, projection: dict,
+                                   skip: int = 0, limit: Optional[int] = None) -> List[dict]:
+        # Served by the multikey 'skill_tokens' index, so cost scales with the number of matches
+        query = {"skill_tokens": {"$all" if match_all else "$in": tokens}}
+        cursor = database.employees_collection.find(query, projection).sort("employee_id", 1)
+        if skip:
+            cursor = cursor.skip(skip)
+        if limit is not None:
+            cursor = cursor.limit(limit)
+        started = time.perf_counter()
+        documents = await cursor.to_list(length=limit)
+        profile("find_by_skill_tokens", started, lambda: find_command(query, projection, [("employee_id", 1)], skip, limit))
+        return documents
+
+    async def find_by_search_tokens(self, groups: List[List[str]], limit: int) -> List[dict]:
+        # Each group is an $or over the multikey 'name_tokens' and 'skill_tokens' indexes;
+        # no sort, so the cursor stops after 'limit' matches instead of ranking them all
+        clauses = [{"$or": [{"name_tokens": {"$in": words}}, {"skill_tokens": {"$in": words}}]} for words in groups]
+        query = clauses[0] if len(clauses) == 1 else {"$and": clauses}
+        cursor = database.employees_collection.find(query, SEARCH_PROJECTION).limit(limit)
+        started = time.perf_counter()
+        documents = await cursor.to_list(length=limit)
+        profile("find_by_search_tokens", started, lambda: find_command(query, SEARCH_PROJECTION, limit=limit))
+        return documents
+
+    async def search_vocabulary(self) -> List[str]:
+        # distinct() walks each multikey index's keys rather than the documents
+        words = set()
+        for field in ("name_tokens", "skill_tokens"):
+            words.update(token for token in await database.employees_collection.distinct(field) if " " not in token)
+        return sorted(words)
+
+    async def count(self, estimate: bool = False) -> int:
+        if estimate:
+            return await database.employees_collection.estimated_document_count()
+        started = time.perf_counter()
+        total = await database.employees_collection.count_documents({})
+        profile("count", started, lambda: {"count": database.employees_collection.name, "query": {}})
+        return total
+
+    async def backfill_tokens(self, field: str, source: str, tokenize: Callable[[object], List[str]],
+                              batch_size: int = 1000, retokenize: bool = False) -> int:
+        updated = 0
+        batch = []
+        cursor = database.employees_collection.find(
+            {} if retokenize else {field: {"$exists": False}}, {source: 1, field: 1}
+        ).batch_size(batch_size)
+
+        async for emp in cursor:
+            tokens = tokenize(emp.get(source) or [])
+            if field in emp and emp[field] == tokens:
+                continue
+            # Matching the source value means a concurrent API write (which sets both) wins
+            batch.append(UpdateOne({"_id": emp["_id"], source: emp.get(source)}, {"$set": {field: tokens}}))
+            if len(batch) >= batch_size:
+                updated += (await database.employees_collection.bulk_write(batch, ordered=False)).modified_count
+                batch = []
+        if batch:
+            updated += (await database.employees_collection.bulk_write(batch, ordered=False)).modified_count
+        return updated
+
+    # MongoDB-only migration of legacy string joining dates (see 'manage.py migrate-joining-dates');
+    # the memory backend only ever stores what the API writes, which is always a datetime.
+
+    async def count_string_joining_dates(self) -> int:
+        # Served by the (joining_date, employee_id) index: strings sort in their own type bracket
+        return await database.employees_collection.count_documents({"joining_date": {"$type": "string"}})
+
+    async def convert_joining_dates(self, parse: Callable[[str], Optional[datetime]],
+                                    after: Optional[Tuple[str, str]] = None, limit: int = 1000) -> dict:
+        """
+        Converts the next 'limit' string joining dates, in (joining_date, employee_id)
+        order after 'after', with one unordered bulk_write. Each update matches the
+        old value, so a concurrent API write to the same employee wins.
+        Returns {"scanned", "converted", "invalid": [employee_id, ...], "after"};
+        pass "after" back in to continue. Unparseable strings are left as they are.
+        """
+        if after is None:
+            query = {"joining_date": {"$type": "string"}}
+        else:
+            value, employee_id = after
+            query = {"$or": [
+                {"joining_date": {"$type": "string", "$gt": value}},
+                {"joining_date": value, "employee_id": {"$gt": employee_id}},
+            ]}
+        cursor = database.employees_collection.find(query, {"joining_date": 1, "employee_id": 1})
+        documents = await cursor.sort([("joining_date", 1), ("employee_id", 1)]).limit(limit).to_list(length=limit)
+
+        updates, invalid = [], []
+        for document in documents:
+            parsed = parse(document["joining_date"])
+            if parsed is None:
+                invalid.append(document["employee_id"])
+            else:
+                updates.append(UpdateOne(
+                    {"_id": document["_id"], "joining_date": document["joining_date"]},
+                    {"$set": {"joining_date": parsed}},
+                ))
+
+        converted = 0
+        if updates:
+            converted = (await database.employees_collection.bulk_write(updates, ordered=False)).modified_count
+        last = documents[-1] if documents else None
+        return {
+            "scanned": len(documents),
+            "converted": converted,
+            "invalid": invalid,
+            "after": (last["joining_date"], last["employee_id"]) if last else after,
+        }
+
+    async def compute_salary_analytics(self, department: Optional[str] = None, joined_from: Optional[datetime] = None,
+                                       joined_to: Optional[datetime] = None, bucket_width: float = 10000) -> Dict[str, dict]:
+        match = {}
+        if department is not None:
+            match["department"] = department  # Served by the department index
+        if joined_from is not None or joined_to is not None:
+            match["joining_date"] = {}
+            if joined_from is not None:
+                match["joining_date"]["$gte"] = joined_from
+            if joined_to is not None:
+                match["joining_date"]["$lte"] = joined_to
+        pipeline = salary_analytics_pipeline(match, bucket_width)
+
+        # Large departments can exceed the in-memory aggregation limit
+        started = time.perf_counter()
+        try:
+            results = await database.employees_collection.aggregate(pipeline, allowDiskUse=True).to_list(length=1)
+        except OperationFailure as e:
+            if e.code in PERCENTILE_UNSUPPORTED_ERRORS:
+                raise AnalyticsUnavailable(str(e))
+            raise
+        profile("compute_salary_analytics", started, lambda: {
+            "aggregate": database.employees_collection.name, "pipeline": pipeline, "cursor": {}, "allowDiskUse": True,
+        })
+
+        facets = results[0] if results else {"summary": [], "histogram": []}
+        analytics = {}
+        for row in facets["summary"]:
+            median, p90 = row["percentiles"]
+            analytics[row["_id"]] = {
+                "headcount": row["headcount"], "min": row["min"], "max": row["max"], "avg": row["avg"],
+                "median": median, "p90": p90, "histogram": {},
+            }
+        for row in facets["histogram"]:
+            analytics[row["_id"]["department"]]["histogram"][row["_id"]["bucket"]] = row["count"]
+        return analytics
+
+    async def compute_salary_stats(self, department: Optional[str] = None) -> Dict[str, dict]:
+        pipeline = salary_stats_pipeline({"department": department} if department is not None else None)
+        if department is not None:
+            # Served by the department index
+            cursor = database.employees_collection.aggregate(pipeline)
+        else:
+            cursor = database.employees_collection.aggregate(pipeline, allowDiskUse=True)
+        started = time.perf_counter()
+        stats = {row["_id"]: row async for row in cursor}
+        profile("compute_salary_stats", started, lambda: {
+            "aggregate": database.employees_collection.name, "pipeline": pipeline, "cursor": {},
+        })
+        return stats
+
+    async def add_salary_stats(self, groups: Dict[str, dict]):
+        if not groups:
+            return
+        await database.department_stats_collection.bulk_write([
+            UpdateOne(
+                {"_id": department},
+                {"$inc": {"count": stats["count"], "sum": stats["sum"], "version": 1},
+                 "$min": {"min": stats["min"]}, "$max": {"max": stats["max"]}},
+                upsert=True,
+            )
+            for department, stats in groups.items()
+        ], ordered=False)
+
+    async def remove_salary(self, department: str, salary: float) -> Optional[dict]:
+        return await database.department_stats_collection.find_one_and_update(
+            {"_id": department},
+            {"$inc": {"count": -1, "sum": -salary, "version": 1}},
+            return_document=ReturnDocument.AFTER,
+        )
+
+    async def find_salary_stats(self, department: str) -> Optional[dict]:
+        return await database.department_stats_collection.find_one({"_id": department})
+
+    async def reset_salary_bounds(self, department: str, bounds: Optional[dict], version: Optional[int]) -> bool:
+        # {"version": None} also matches aggregates that were never changed incrementally
+        query = {"_id": department, "version": version}
+        if bounds is None:
+            result = await database.department_stats_collection.delete_one(query)
+            return result.deleted_count == 1
+        result = await database.department_stats_collection.update_one(
+            query, {"$set": {"min": bounds["min"], "max": bounds["max"]}}
+        )
+        return result.matched_count == 1
+
+    async def replace_salary_stats(self, expected: Dict[str, dict]):
+        await database.department_stats_collection.delete_many({"_id": {"$nin": list(expected)}})
+        if expected:
+            await database.department_stats_collection.bulk_write([
+                ReplaceOne({"_id": department}, stats, upsert=True)
+                for department, stats in expected.items()
+            ], ordered=False)
+
+    async def list_salary_stats(self) -> List[dict]:
+        cursor = database.department_stats_collection.find({"count": {"$gt": 0}}).sort("_id", 1)
+        return await cursor.to_list(length=None)
+
+    async def has_salary_stats(self) -> bool:
+        return await database.department_stats_collection.find_one() is not None
+
+    async def watch_changes(self, resume_after: Optional[str] = None):
+        stream = database.employees_collection.watch(
+            [{"$match": {"operationType": {"$in": CHANGE_OPERATIONS}}}],
+            full_document="updateLookup",
+            full_document_before_change="whenAvailable",
+            resume_after={"_data": resume_after} if resume_after else None,
+            max_await_time_ms=CHANGE_STREAM_MAX_AWAIT_MS,
+        )
+        try:
+            async with stream:
+                while True:
+                    # try_next() returns None once the server has nothing newer to report
+                    change = await stream.try_next()
+                    if change is None:
+                        yield None
+                        continue
+                    yield {
+                        "token": change["_id"]["_data"],
+                        "operation": change["operationType"],
+                        "document": change.get("fullDocument"),
+                        "previous": change.get("fullDocumentBeforeChange"),
+                    }
+        except OperationFailure as e:
+            if e.code in CHANGE_STREAM_UNSUPPORTED_ERRORS:
+                raise ChangeStreamUnavailable(str(e))
+            if e.code in CHANGE_HISTORY_LOST_ERRORS:
+                raise ChangeHistoryLost(str(e))
+            raise
+
+    async def insert_import_job(self, job: dict):
+        await database.import_jobs_collection.insert_one({"_id": job["job_id"], **job})
+
+    async def update_import_job(self, job_id: str, changes: dict, errors: List[dict] = (), max_errors: int = 1000):
+        update = {"$set": changes}
+        if errors:
+            update["$push"] = {"errors": {"$each": list(errors), "$slice": max_errors}}
+        await database.import_jobs_collection.update_one({"_id": job_id}, update)
+
+    async def find_import_job(self, job_id: str, errors: Optional[Tuple[int, int]] = None) -> Optional[dict]:
+        projection = {"_id": 0, "errors": 0} if errors is None else {"_id": 0, "errors": {"$slice": list(errors)}}
+        return await database.import_jobs_collection.find_one({"_id": job_id}, projection)
+
+    async def list_import_jobs(self, limit: int = 20) -> List[dict]:
+        # Job IDs are ObjectId strings, so _id order is creation order
+        cursor = database.import_jobs_collection.find({}, {"_id": 0, "errors": 0}).sort("_id", -1).limit(limit)
+        return await cursor.to_list(length=limit)